@@ -0,0 +1,138 @@
+"""Statistiques des parties et export des résultats pour l'administration.
+
+- `ResultsAnalytics` : taux de victoire, taux d'abandon et temps moyens par
+  mot caché. Le calcul est délégué au stockage (`word_stats`, un GROUP BY
+  avec SQLite) et son résultat gardé tant que les résultats n'ont pas changé.
+- `encode_csv` / `encode_ndjson` : mise en forme des pages de parties
+  envoyées en flux par GET /admin/export.
+"""
+import asyncio
+import csv
+import hashlib
+import io
+import json
+from typing import List, Optional
+
+from storage import RESULTS_HEADER
+
+# Formats d'export : type de contenu et extension du fichier proposé
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def _rate(count: int, total: int) -> float:
+    return round(count / total, 4) if total else 0.0
+
+
+def _average(total: int, count: int):
+    return round(total / count, 1) if count else None
+
+
+def summarize(rows: List[list]) -> dict:
+    """Met en forme les agrégats par mot (voir `ResultsStore.word_stats`).
+
+    Les taux sont calculés sur les parties terminées : une partie en cours
+    n'est ni gagnée ni abandonnée.
+    """
+    words = []
+    totals = [0, 0, 0, 0, 0]
+    for mot_cache, parties, victoires, abandons, temps_victoires, temps_total in rows:
+        terminees = victoires + abandons
+        words.append({
+            'mot_cache': mot_cache,
+            'parties': parties,
+            'victoires': victoires,
+            'abandons': abandons,
+            'en_cours': parties - terminees,
+            'taux_victoire': _rate(victoires, terminees),
+            'taux_abandon': _rate(abandons, terminees),
+            'temps_moyen_victoire': _average(temps_victoires, victoires),
+            'temps_moyen': _average(temps_total, terminees),
+        })
+        for i, value in enumerate((parties, victoires, abandons, temps_victoires, temps_total)):
+            totals[i] += value
+    parties, victoires, abandons, temps_victoires, temps_total = totals
+    terminees = victoires + abandons
+    # Mots les plus joués en tête
+    words.sort(key=lambda word: (-word['parties'], word['mot_cache']))
+    return {
+        'total': {
+            'parties': parties,
+            'victoires': victoires,
+            'abandons': abandons,
+            'en_cours': parties - terminees,
+            'taux_victoire': _rate(victoires, terminees),
+            'taux_abandon': _rate(abandons, terminees),
+            'temps_moyen_victoire': _average(temps_victoires, victoires),
+            'temps_moyen': _average(temps_total, terminees),
+        },
+        'mots': words,
+    }
+
+
+class ResultsAnalytics:
+    """Statistiques par mot, recalculées une fois par version des résultats.
+
+    `invalidate()` est appelé à chaque partie commencée ou terminée (y
+    compris celles des autres processus, via le journal des changements).
+    Tant que la version ne change pas, la réponse JSON et son ETag sont
+    resservis sans relire le stockage ; des requêtes simultanées sur une
+    version périmée partagent un même calcul.
+    """
+
+    def __init__(self, persistence, store):
+        self.persistence = persistence
+        self.store = store
+        self.version = 0
+        self.computations = 0
+        self._cached = None  # (version, corps, ETag)
+        self._pending = None  # (version, tâche de calcul)
+
+    def invalidate(self) -> None:
+        self.version += 1
+
+    async def render(self):
+        """Retourne (corps JSON, ETag) pour la version courante des résultats."""
+        version = self.version
+        if self._cached is not None and self._cached[0] == version:
+            return self._cached[1:]
+        if self._pending is None or self._pending[0] != version:
+            self._pending = (version, asyncio.ensure_future(self._compute(version)))
+        return await asyncio.shield(self._pending[1])
+
+    async def _compute(self, version: int):
+        try:
+            rows = await self.persistence.read(self.store.word_stats)
+            self.computations += 1
+            body = json.dumps(summarize(rows), ensure_ascii=False)
+            # ETag dérivé du contenu : identique d'un processus à l'autre
+            etag = '"' + hashlib.sha1(body.encode('utf-8')).hexdigest()[:20] + '"'
+            # Une invalidation pendant le calcul laisse la version suivante à recalculer
+            if self._cached is None or self._cached[0] < version:
+                self._cached = (version, body, etag)
+            return body, etag
+        finally:
+            if self._pending is not None and self._pending[0] == version:
+                self._pending = None
+
+
+def next_page(pages) -> Optional[List[dict]]:
+    """Lit la page suivante d'un export (voir `ResultsStore.games_pages`), ou None à la fin."""
+    return next(pages, None)
+
+
+def encode_csv(games: List[dict], header: bool = False) -> bytes:
+    """Page de parties au format CSV historique (colonnes de game_results.csv)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(RESULTS_HEADER)
+    writer.writerows([game[column] for column in RESULTS_HEADER] for game in games)
+    return buffer.getvalue().encode('utf-8')
+
+
+def encode_ndjson(games: List[dict], header: bool = False) -> bytes:
+    """Page de parties en JSON, un objet par ligne (identifiant compris)."""
+    return ''.join(json.dumps(game, ensure_ascii=False) + '\n' for game in games).encode('utf-8')
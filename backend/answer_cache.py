@@ -0,0 +1,104 @@
+"""Cache des réponses du modèle aux questions fréquentes, par mot caché."""
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from matcher import fold
+
+logger = logging.getLogger(__name__)
+
+# Une question ouverte commence par un mot interrogatif : sa réponse est une
+# phrase libre, on ne la met pas en cache
+_OPEN_QUESTION_WORDS = ('qui', 'que', 'qu', 'quoi', 'quel', 'quels', 'quelle', 'quelles',
+                        'comment', 'pourquoi', 'ou', 'combien', 'quand', 'lequel', 'laquelle',
+                        'decris', 'donne', 'dis')
+# Mots qui renvoient aux échanges précédents : la réponse dépend de l'historique
+_CONTEXT_WORDS = {'aussi', 'encore', 'autre', 'plutot', 'alors', 'donc', 'deja',
+                  'precedent', 'precedente', 'avant', 'sinon', 'meme', 'pareil'}
+
+
+def normalize_question(question: str) -> str:
+    """Forme canonique d'une question : "Est-ce un Animal ?" -> "est ce un animal"."""
+    return ' '.join(re.findall(r'\w+', fold(question)))
+
+
+def is_closed_question(normalized: str) -> bool:
+    words = normalized.split()
+    return bool(words) and words[0] not in _OPEN_QUESTION_WORDS
+
+
+def is_cacheable(normalized: str, first_turn: bool) -> bool:
+    """Seules les questions fermées indépendantes de l'historique sont mises en cache."""
+    if not is_closed_question(normalized):
+        return False
+    return first_turn or not _CONTEXT_WORDS.intersection(normalized.split())
+
+
+class AnswerCache:
+    """Cache LRU borné avec expiration, indexé par (mot caché, question normalisée).
+
+    Les réponses précalculées (`load`) n'expirent pas : elles ne vieillissent
+    pas avec le serveur et ne sont retirées que par l'éviction LRU.
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl: Optional[float] = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, word: str, normalized: str) -> Optional[str]:
+        key = (word, normalized)
+        entry = self._entries.get(key)
+        if entry is not None:
+            answer, stored_at = entry
+            if self._fresh(stored_at):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return answer
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def peek(self, word: str, normalized: str) -> bool:
+        """Indique si une réponse valide est en cache, sans la compter ni la rafraîchir."""
+        entry = self._entries.get((word, normalized))
+        return entry is not None and self._fresh(entry[1])
+
+    def _fresh(self, stored_at: Optional[float]) -> bool:
+        # stored_at vaut None pour une réponse précalculée, qui n'expire pas
+        return stored_at is None or self.ttl is None or time.monotonic() - stored_at <= self.ttl
+
+    def put(self, word: str, normalized: str, answer: str, expires: bool = True) -> None:
+        key = (word, normalized)
+        self._entries[key] = (answer, time.monotonic() if expires else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def load(self, path: Path) -> int:
+        """Charge des réponses précalculées (voir seed_answer_cache.py)."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for entry in data.get('entries', []):
+            self.put(entry['word'], normalize_question(entry['question']), entry['answer'], expires=False)
+        logger.info(f"{len(data.get('entries', []))} réponses précalculées chargées depuis {path}")
+        return len(self)
+
+    def to_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,142 @@
+"""Pages et fichiers statiques servis depuis la mémoire, précompressés.
+
+Au démarrage, tout le répertoire frontend est chargé et compressé une fois
+(gzip, et brotli si le module est installé). Chaque fichier est servi avec
+un ETag fort par encodage et `Vary: Accept-Encoding`. Les feuilles de style
+ont aussi une URL contenant l'empreinte de leur contenu
+(`/static/css/styles.<empreinte>.css`), mise en cache sans revalidation ;
+les pages HTML y font référence et sont revalidées à chaque chargement.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+from pathlib import Path
+from typing import Dict, Optional
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_PREFIX = '/static/'
+# Extensions dont l'URL porte l'empreinte du contenu
+HASHED_EXTENSIONS = ('.css',)
+# Types pour lesquels la compression est utile
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# Une variante compressée n'est gardée que si elle fait gagner au moins 10 %
+MIN_COMPRESSION_RATIO = 0.9
+
+REVALIDATE = 'no-cache'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class Asset:
+    """Un fichier et ses variantes compressées, chacune avec son ETag."""
+
+    def __init__(self, body: bytes, content_type: str):
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()
+        # Encodage -> (contenu, ETag)
+        self.variants: Dict[str, tuple] = {'identity': (body, f'"{self.digest[:20]}"')}
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            self._add_variant('br', brotli.compress(body) if brotli else None, len(body))
+            self._add_variant('gzip', gzip.compress(body, compresslevel=9, mtime=0), len(body))
+
+    def _add_variant(self, encoding: str, body: Optional[bytes], size: int) -> None:
+        if body is not None and len(body) < size * MIN_COMPRESSION_RATIO:
+            self.variants[encoding] = (body, f'"{self.digest[:20]}-{encoding}"')
+
+    def choose(self, accept_encoding: str) -> str:
+        """Meilleur encodage accepté par le client, parmi les variantes disponibles."""
+        accepted = set()
+        for part in accept_encoding.lower().split(','):
+            coding, _, params = part.strip().partition(';')
+            if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                accepted.add(coding.strip())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                return encoding
+        return 'identity'
+
+    def response(self, request: web.Request, cache_control: str) -> web.Response:
+        encoding = self.choose(request.headers.get('Accept-Encoding', ''))
+        body, etag = self.variants[encoding]
+        headers = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match.strip() == '*' or etag in if_none_match:
+            return web.Response(status=304, headers=headers)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        charset = 'utf-8' if self.content_type.startswith('text/') else None
+        return web.Response(body=body, headers=headers, content_type=self.content_type, charset=charset)
+
+
+class StaticAssets:
+    """Contenu du répertoire frontend, chargé une fois au démarrage.
+
+    Une modification des fichiers n'est prise en compte qu'au redémarrage.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._files: Dict[str, Asset] = {}
+        # Chemin public (/static/...) -> (fichier, Cache-Control)
+        self._static: Dict[str, tuple] = {}
+        # Chemin d'origine -> chemin avec empreinte, à substituer dans les pages
+        self.hashed_urls: Dict[str, str] = {}
+        self._load()
+
+    def _load(self) -> None:
+        paths = sorted(path for path in self.root.rglob('*') if path.is_file())
+        pages = []
+        for path in paths:
+            name = path.relative_to(self.root).as_posix()
+            if path.suffix == '.html':
+                pages.append((name, path))
+                continue
+            asset = Asset(path.read_bytes(), _content_type(path))
+            self._files[name] = asset
+            url = STATIC_PREFIX + name
+            self._static[url] = (asset, REVALIDATE)
+            if path.suffix in HASHED_EXTENSIONS:
+                hashed = f"{STATIC_PREFIX}{path.with_suffix('').relative_to(self.root).as_posix()}" \
+                         f".{asset.digest[:12]}{path.suffix}"
+                self._static[hashed] = (asset, IMMUTABLE)
+                self.hashed_urls[url] = hashed
+
+        # Les pages référencent les feuilles de style par leur URL avec empreinte
+        for name, path in pages:
+            html = path.read_text(encoding='utf-8')
+            for url, hashed in self.hashed_urls.items():
+                html = html.replace(f'"{url}"', f'"{hashed}"')
+            asset = Asset(html.encode('utf-8'), 'text/html')
+            self._files[name] = asset
+            self._static[STATIC_PREFIX + name] = (asset, REVALIDATE)
+
+        total = sum(len(asset.variants['identity'][0]) for asset in self._files.values())
+        logger.info("%s fichiers statiques chargés (%s octets, brotli %s)", len(self._files), total,
+                    'activé' if brotli else 'indisponible')
+
+    def response(self, request: web.Request, name: str) -> web.Response:
+        """Réponse pour une page du répertoire frontend (ex. 'game.html')."""
+        return self._files[name].response(request, REVALIDATE)
+
+    async def handle_static(self, request: web.Request) -> web.Response:
+        entry = self._static.get(STATIC_PREFIX + request.match_info['path'])
+        if entry is None:
+            raise web.HTTPNotFound()
+        asset, cache_control = entry
+        return asset.response(request, cache_control)
+
+
+def _content_type(path: Path) -> str:
+    content_type, _ = mimetypes.guess_type(path.name)
+    return content_type or 'application/octet-stream'
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Microbenchmark de la détection du mot caché (WordMatcher).
+
+Les formes reconnues sont vérifiées avant la mesure (voir FORMS).
+
+Usage :
+    python backend/benchmarks/bench_matcher.py [--words-file data/mots.txt] [--iterations 20000]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from matcher import WordMatcher, inflections  # noqa: E402
+
+MESSAGES = [
+    "Est-ce un animal ?",
+    "Est-ce que ça se trouve dans une maison, près de la fenêtre ou dans la cuisine ?",
+    "Je pense que c'est une partie d'un véhicule, peut-être une roue ou un moteur électrique",
+    "OUI",
+    "Non, ce n'est pas un objet que l'on utilise tous les jours. Il est plutôt grand et "
+    "se trouve souvent à l'extérieur, dans un parc ou au bord d'une rivière.",
+]
+
+# Mot caché : (formes reconnues, formes refusées)
+FORMS = {
+    'chanteur': ({'chanteuse', 'chanteurs'}, set()),
+    'facteur': ({'factrice'}, set()),
+    'boulanger': ({'boulangere'}, set()),
+    'fleur': ({'fleurs'}, {'fleuse'}),
+    'cahier': ({'cahiers'}, {'cahiere'}),
+    'escalier': (set(), {'escaliere'}),
+    'ordinateur': (set(), {'ordinatrice'}),
+    'mer': (set(), {'mere'}),
+    'tapis': (set(), {'tapi'}),
+    'tennis': (set(), {'tenni'}),
+    'ciseaux': ({'ciseau'}, set()),
+    'lunettes': ({'lunette'}, set()),
+    'cheval': ({'chevaux'}, set()),
+    'pommes de terre': ({'pomme de terre'}, {'pommes de terres'}),
+    'grand-pere': ({'grands-peres', 'grand pere'}, set()),
+}
+
+
+def check_forms() -> None:
+    for word, (accepted, rejected) in FORMS.items():
+        forms = inflections(word)
+        matcher = WordMatcher(word)
+        assert all(matcher.matches(form) for form in accepted), (word, accepted - forms)
+        assert not forms & rejected, (word, forms & rejected)
+    assert not WordMatcher('art').matches('une partie')
+    print(f"Formes vérifiées : {len(FORMS)} mots")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark de WordMatcher')
+    parser.add_argument('--words-file', default='data/mots.txt', help='Liste de mots à tester')
+    parser.add_argument('--iterations', type=int, default=20000, help='Appels mesurés par message')
+    args = parser.parse_args()
+
+    check_forms()
+    words = [line.strip() for line in open(args.words_file, encoding='utf-8') if line.strip()]
+
+    build = timeit.timeit(lambda: [WordMatcher(word) for word in words], number=1)
+    print(f"Compilation : {build / len(words) * 1e6:.1f} µs par mot ({len(words)} mots)")
+
+    matcher = WordMatcher(words[len(words) // 2])
+    print(f"Mot testé : {matcher.word}")
+    for message in MESSAGES:
+        elapsed = timeit.timeit(lambda: matcher.matches(message), number=args.iterations)
+        print(f"{elapsed / args.iterations * 1e6:7.2f} µs  ({len(message):3d} car.)  {message[:50]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Évolution du coût des opérations de stockage avec la taille de l'historique.
+
+Pour chaque taille demandée, un historique fictif est généré (voir
+generate_dataset.py) puis les opérations suivantes sont mesurées sur chaque
+stockage :
+- démarrage : reconstruction du classement et de l'index d'éligibilité ;
+- GET /leaderboard : rendu du classement après une nouvelle victoire ;
+- fin de partie : enregistrement puis mise à jour du résultat (commit compris),
+  comme `_update_game_result` ;
+- sélection des gagnants d'une distribution ;
+- historique des distributions : dernière distribution et pages.
+
+Usage :
+    python backend/benchmarks/bench_storage.py --sizes 10000,100000,1000000 [--stores csv,sqlite]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from eligibility import EligibilityIndex  # noqa: E402
+from leaderboard import Leaderboard  # noqa: E402
+from storage import create_store  # noqa: E402
+from benchmarks.generate_dataset import (CADEAUX_FILE, DATABASE_FILE, DISTRIBUTIONS_FILE,  # noqa: E402
+                                         RESULTS_FILE, generate, import_sqlite)
+
+
+def timed(fn, repeat: int = 1) -> float:
+    """Durée moyenne d'un appel, en millisecondes."""
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started_at) / repeat * 1000
+
+
+def bench_store(store, updates: int) -> dict:
+    results = {}
+    last = store.last_distribution()
+    leaderboard = Leaderboard(k=10)
+    eligibility = EligibilityIndex()
+    results['démarrage: classement'] = timed(
+        lambda: leaderboard.rebuild(store.iter_victories(), last[0] if last else None))
+    results['démarrage: éligibilité'] = timed(
+        lambda: eligibility.rebuild(store.iter_games(), store.gift_recipients(), last[0] if last else None))
+
+    def leaderboard_after_victory():
+        leaderboard.record_victory('bench', 1, datetime.now().isoformat())
+        leaderboard.render('all')
+    results['GET /leaderboard (après victoire)'] = timed(leaderboard_after_victory, 100)
+    results['GET /leaderboard (en cache)'] = timed(lambda: leaderboard.render('all'), 1000)
+
+    def end_game():
+        game_id = store.add_game(datetime.now().isoformat(), 'bench', '0600000000', 'chat')
+        store.commit()
+        store.update_game(game_id, 'victoire', 42)
+        store.commit()
+    results['fin de partie (écriture + commit)'] = timed(end_game, updates)
+
+    results['sélection des gagnants'] = timed(eligibility.select_winners, 100)
+    results['dernière distribution'] = timed(store.last_distribution, 100)
+    results['historique, page 1'] = timed(lambda: store.distributions_page(10), 100)
+    count = store.count_distributions()
+    results['historique, page du milieu'] = timed(lambda: store.distributions_page(10, count // 2), 100)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coût du stockage selon la taille de l'historique")
+    parser.add_argument('--sizes', default='10000,100000', help='Tailles en nombre de parties (par défaut: 10000,100000)')
+    parser.add_argument('--stores', default='csv,sqlite', help='Stockages mesurés (par défaut: csv,sqlite)')
+    parser.add_argument('--updates', type=int, default=20, help='Fins de partie mesurées (par défaut: 20)')
+    parser.add_argument('--keep', help='Conserver les historiques générés dans ce répertoire')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    stores = args.stores.split(',')
+    base_dir = Path(args.keep) if args.keep else Path(tempfile.mkdtemp(prefix='bench-storage-'))
+
+    table = {}
+    for size in sizes:
+        dataset = base_dir / str(size)
+        started_at = time.perf_counter()
+        generate(dataset, size)
+        if 'sqlite' in stores:
+            import_sqlite(dataset)
+        print(f"Historique de {size} parties généré en {time.perf_counter() - started_at:.1f}s", file=sys.stderr)
+        for kind in stores:
+            store = create_store(kind, dataset / RESULTS_FILE, dataset / DISTRIBUTIONS_FILE,
+                                 dataset / CADEAUX_FILE, dataset / DATABASE_FILE)
+            try:
+                for operation, ms in bench_store(store, args.updates).items():
+                    table.setdefault((kind, operation), {})[size] = ms
+            finally:
+                store.close()
+
+    header = f"{'Stockage':<8} {'Opération':<36}" + ''.join(f"{size:>12}" for size in sizes)
+    print(header + '   (ms)')
+    for (kind, operation), by_size in table.items():
+        print(f"{kind:<8} {operation:<36}" + ''.join(f"{by_size.get(size, 0):>12.3f}" for size in sizes))
+
+
+if __name__ == '__main__':
+    main()
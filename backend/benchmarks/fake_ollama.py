@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Faux serveur Ollama pour les tests de charge, sans réseau ni modèle.
+
+Implémente les routes utilisées par le jeu (/api/tags, /api/ps, /api/pull,
+/api/generate, /api/chat en streaming) avec une latence configurable : délai
+avant le premier token (évaluation du prompt) puis délai par token généré.
+Les réponses ne contiennent jamais le mot caché.
+
+Usage :
+    python backend/benchmarks/fake_ollama.py [--port 11435] [--token-latency 0.02]
+    OLLAMA_HOST=http://localhost:11435 python backend/main.py --skip-pull
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+ANSWER_WORDS = ['Oui', 'Non', ',', " c'est", ' plutôt', ' souvent', ' dans', ' une', ' maison',
+                ' assez', ' grand', ' petit', ' utile', ' pas', ' vraiment', ' parfois', '.']
+
+
+class FakeOllama:
+    """Simule un serveur Ollama traitant `parallel` requêtes à la fois."""
+
+    def __init__(self, model: str = 'llama3.2:3b', prompt_latency: float = 0.05,
+                 token_latency: float = 0.02, tokens: int = 12, parallel: int = 1):
+        self.model = model if ':' in model else f"{model}:latest"
+        self.prompt_latency = prompt_latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+        self.requests = 0
+        self.cancelled = 0
+        self._slots = asyncio.Semaphore(parallel)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/api/tags', self.handle_tags)
+        app.router.add_get('/api/ps', self.handle_ps)
+        app.router.add_post('/api/pull', self.handle_pull)
+        app.router.add_post('/api/generate', self.handle_generate)
+        app.router.add_post('/api/chat', self.handle_chat)
+        return app
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    async def handle_tags(self, request):
+        return web.json_response({'models': [{'name': self.model, 'model': self.model}]})
+
+    async def handle_ps(self, request):
+        # Modèles chargés en mémoire : sert de vérification de disponibilité
+        return web.json_response({'models': [{'name': self.model, 'model': self.model}]})
+
+    async def handle_pull(self, request):
+        return web.json_response({'status': 'success'})
+
+    async def handle_generate(self, request):
+        # Préchauffage : un prompt vide charge le modèle sans rien générer
+        data = await request.json()
+        return web.json_response({'model': data.get('model', self.model), 'created_at': self._now(),
+                                  'response': '', 'done': True})
+
+    async def handle_chat(self, request):
+        data = await request.json()
+        self.requests += 1
+        prompt_chars = sum(len(message.get('content', '')) for message in data.get('messages', []))
+        tokens = [random.choice(ANSWER_WORDS) for _ in range(self.tokens)]
+
+        async with self._slots:
+            started_at = asyncio.get_running_loop().time()
+            await asyncio.sleep(self.prompt_latency)
+            if not data.get('stream', True):
+                await asyncio.sleep(self.token_latency * len(tokens))
+                return web.json_response(self._final(data, ''.join(tokens), prompt_chars, started_at))
+
+            response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+            await response.prepare(request)
+            try:
+                for token in tokens:
+                    await asyncio.sleep(self.token_latency)
+                    chunk = {'model': data.get('model', self.model), 'created_at': self._now(),
+                             'message': {'role': 'assistant', 'content': token}, 'done': False}
+                    await response.write(json.dumps(chunk).encode() + b'\n')
+                final = self._final(data, '', prompt_chars, started_at)
+                await response.write(json.dumps(final).encode() + b'\n')
+                await response.write_eof()
+            except ConnectionResetError:
+                # Génération annulée par le client : Ollama s'arrête de même
+                self.cancelled += 1
+            return response
+
+    def _final(self, data: dict, content: str, prompt_chars: int, started_at: float) -> dict:
+        """Dernier morceau, avec les compteurs rapportés par un vrai serveur Ollama."""
+        total = asyncio.get_running_loop().time() - started_at
+        return {
+            'model': data.get('model', self.model), 'created_at': self._now(),
+            'message': {'role': 'assistant', 'content': content},
+            'done': True, 'done_reason': 'stop',
+            'prompt_eval_count': int(prompt_chars / 3.5), 'eval_count': self.tokens,
+            'prompt_eval_duration': int(self.prompt_latency * 1e9),
+            'eval_duration': int(self.token_latency * self.tokens * 1e9),
+            'load_duration': 0, 'total_duration': int(total * 1e9),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Faux serveur Ollama pour les tests de charge')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--model', default='llama3.2:3b', help='Modèle annoncé par /api/tags')
+    parser.add_argument('--prompt-latency', type=float, default=0.05,
+                        help='Délai avant le premier token, en secondes (par défaut: 0.05)')
+    parser.add_argument('--token-latency', type=float, default=0.02,
+                        help='Délai entre deux tokens, en secondes (par défaut: 0.02)')
+    parser.add_argument('--tokens', type=int, default=12, help='Tokens par réponse (par défaut: 12)')
+    parser.add_argument('--parallel', type=int, default=1,
+                        help='Requêtes traitées simultanément, comme OLLAMA_NUM_PARALLEL (par défaut: 1)')
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.model, args.prompt_latency, args.token_latency, args.tokens, args.parallel)
+    web.run_app(fake.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
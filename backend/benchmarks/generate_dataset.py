@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Génère un historique fictif de parties et de distributions pour les benchmarks.
+
+Les fichiers produits ont le format historique (game_results.csv,
+distributions.csv, cadeaux_recus.csv) et sont écrits au fil de l'eau : 10
+millions de parties ne demandent pas plus de mémoire que 10 000. Avec
+--sqlite, ils sont aussi importés dans une base SQLite.
+
+Usage :
+    python backend/benchmarks/generate_dataset.py --rows 1000000 --output-dir /tmp/dataset
+    python backend/benchmarks/generate_dataset.py --rows 100000 --output-dir /tmp/dataset --sqlite
+"""
+import argparse
+import csv
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import CADEAUX_HEADER, DISTRIBUTIONS_HEADER, RESULTS_HEADER, SqliteResultsStore  # noqa: E402
+
+RESULTS_FILE = 'game_results.csv'
+DISTRIBUTIONS_FILE = 'distributions.csv'
+CADEAUX_FILE = 'cadeaux_recus.csv'
+DATABASE_FILE = 'game_results.db'
+
+# Répartition des résultats observée en événement : beaucoup d'abandons
+OUTCOMES = (('victoire', 0.35), ('abandon', 0.6), ('en_cours', 0.05))
+
+
+def _telephone(player: int) -> str:
+    return f"06{player:08d}"
+
+
+def generate(output_dir: Path, rows: int, players: int = None, distributions: int = None,
+             words: list = None, span_days: int = 365, seed: int = 0) -> dict:
+    """Écrit les trois fichiers CSV et retourne le nombre de lignes de chacun."""
+    rng = random.Random(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    players = players or max(10, rows // 20)
+    distributions = rows // 1000 if distributions is None else distributions
+    words = words or ['chat', 'maison', 'voiture', 'arbre', 'fenêtre', 'boulanger', 'ordinateur']
+    outcomes, weights = zip(*OUTCOMES)
+
+    start = datetime.now() - timedelta(days=span_days)
+    step = timedelta(days=span_days) / max(rows, 1)
+    # Une distribution toutes les `every` parties, dans l'ordre chronologique
+    every = rows // distributions if distributions else 0
+    recent = []
+    counts = {'games': 0, 'distributions': 0, 'cadeaux': 0}
+
+    with open(output_dir / RESULTS_FILE, 'w', newline='') as results, \
+            open(output_dir / DISTRIBUTIONS_FILE, 'w', newline='') as dists, \
+            open(output_dir / CADEAUX_FILE, 'w', newline='') as gifts:
+        results_writer, dists_writer, gifts_writer = csv.writer(results), csv.writer(dists), csv.writer(gifts)
+        results_writer.writerow(RESULTS_HEADER)
+        dists_writer.writerow(DISTRIBUTIONS_HEADER)
+        gifts_writer.writerow(CADEAUX_HEADER)
+
+        for i in range(rows):
+            date = start + step * i
+            player = rng.randrange(players)
+            resultat = rng.choices(outcomes, weights)[0]
+            temps = rng.randint(15, 900) if resultat != 'en_cours' else 0
+            results_writer.writerow([date.isoformat(), f"joueur{player}", _telephone(player),
+                                     rng.choice(words), resultat, temps])
+            recent.append(player)
+            counts['games'] += 1
+
+            if every and (i + 1) % every == 0 and counts['distributions'] < distributions:
+                winners = rng.sample(recent, min(3, len(recent)))
+                dist_date = (date + step / 2).isoformat()
+                row = [dist_date]
+                for winner in winners:
+                    row += [f"joueur{winner}", _telephone(winner)]
+                    gifts_writer.writerow([f"joueur{winner}", dist_date])
+                    counts['cadeaux'] += 1
+                dists_writer.writerow(row)
+                counts['distributions'] += 1
+                recent = []
+    return counts
+
+
+def import_sqlite(output_dir: Path) -> Path:
+    """Importe les fichiers générés dans une base SQLite."""
+    output_dir = Path(output_dir)
+    database = output_dir / DATABASE_FILE
+    if database.exists():
+        database.unlink()
+    store = SqliteResultsStore(database)
+    try:
+        store.import_csv(output_dir / RESULTS_FILE, output_dir / DISTRIBUTIONS_FILE, output_dir / CADEAUX_FILE)
+    finally:
+        store.close()
+    return database
+
+
+def load_words(words_file: str) -> list:
+    with open(words_file, encoding='utf-8') as f:
+        return [line.split(';')[0].strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Génère un historique fictif pour les benchmarks')
+    parser.add_argument('--rows', type=int, default=10000, help='Nombre de parties (par défaut: 10000)')
+    parser.add_argument('--players', type=int, help='Nombre de joueurs distincts (par défaut: rows / 20)')
+    parser.add_argument('--distributions', type=int, help='Nombre de distributions (par défaut: rows / 1000)')
+    parser.add_argument('--span-days', type=int, default=365, help='Période couverte, en jours (par défaut: 365)')
+    parser.add_argument('--words-file', default='data/mots.txt', help='Mots cachés utilisés')
+    parser.add_argument('--output-dir', required=True, help='Répertoire de sortie')
+    parser.add_argument('--sqlite', action='store_true', help='Importer aussi dans une base SQLite')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    words = load_words(args.words_file) if Path(args.words_file).exists() else None
+    counts = generate(Path(args.output_dir), args.rows, args.players, args.distributions,
+                      words, args.span_days, args.seed)
+    print(f"{counts['games']} parties, {counts['distributions']} distributions, "
+          f"{counts['cadeaux']} cadeaux écrits dans {args.output_dir}")
+    if args.sqlite:
+        print(f"Base SQLite : {import_sqlite(Path(args.output_dir))}")
+
+
+if __name__ == '__main__':
+    main()
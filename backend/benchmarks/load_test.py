@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Test de charge du serveur de jeu : parties complètes /start -> /stream -> /end.
+
+Par défaut, le serveur est lancé dans ce processus avec un stockage temporaire
+et un faux serveur Ollama (fake_ollama.py) : aucun réseau ni modèle requis.
+Avec --url, la charge est envoyée à un serveur déjà démarré.
+
+Le rapport donne le débit, les latences p50/p95/p99 par route et le retard
+de la boucle d'événements (temps pendant lequel elle n'a pas pu répondre).
+
+Usage :
+    python backend/benchmarks/load_test.py --games 200 --concurrency 50 --questions 5
+    python backend/benchmarks/load_test.py --url http://localhost:8080 --games 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'backend'))
+
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+
+QUESTIONS = [
+    "Est-ce un animal ?",
+    "Est-ce que ça se trouve dans une maison ?",
+    "Est-ce plus grand qu'une voiture ?",
+    "Peut-on le manger ?",
+    "Est-ce que ça sert tous les jours ?",
+    "Est-ce fabriqué par l'homme ?",
+    "Est-ce que ça fait du bruit ?",
+    "Peut-on le tenir dans la main ?",
+]
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """Percentile par rang le plus proche d'une liste triée."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class LatencyRecorder:
+    """Latences et codes de réponse par route."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route: str, seconds: float, status: int) -> None:
+        self.statuses[route][status] += 1
+        if status < 400:
+            self.latencies[route].append(seconds)
+
+    def summary(self, elapsed: float) -> dict:
+        report = {}
+        for route in sorted(self.statuses):
+            ordered = sorted(self.latencies[route])
+            statuses = self.statuses[route]
+            report[route] = {
+                'requests': sum(statuses.values()),
+                'errors': {str(status): count for status, count in statuses.items() if status >= 400},
+                'throughput': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+                'p50_ms': round(percentile(ordered, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(ordered, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(ordered, 0.99) * 1000, 1),
+                'max_ms': round(ordered[-1] * 1000, 1) if ordered else 0.0,
+            }
+        return report
+
+
+class LoopLagMonitor:
+    """Mesure le retard de réveil d'une tâche qui dort à intervalle fixe."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def summary(self) -> dict:
+        ordered = sorted(self.lags)
+        return {
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        }
+
+
+class EventStream:
+    """Lecteur SSE d'une partie : mesure le délai jusqu'au premier token."""
+
+    def __init__(self, response):
+        self.response = response
+        self.first_token = asyncio.Event()
+        self._task = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        try:
+            async for line in self.response.content:
+                if line.startswith(b'event: token'):
+                    self.first_token.set()
+        except (aiohttp.ClientError, asyncio.CancelledError):
+            pass
+
+    async def close(self) -> None:
+        self._task.cancel()
+        self.response.close()
+
+
+class LoadTest:
+    def __init__(self, base_url: str, args, recorder: LatencyRecorder, peek_word=None):
+        self.base_url = base_url
+        self.args = args
+        self.recorder = recorder
+        # Accès au mot caché en mode intégré, pour jouer aussi des victoires
+        self.peek_word = peek_word
+        self.games_completed = 0
+        self._reads = set()
+
+    async def _request(self, http, method: str, route: str, **kwargs):
+        started_at = time.perf_counter()
+        async with http.request(method, self.base_url + route, **kwargs) as response:
+            body = await response.read()
+            self.recorder.record(f"{method} {route}", time.perf_counter() - started_at, response.status)
+            return response.status, body
+
+    async def play_game(self, http, index: int) -> None:
+        status, body = await self._request(http, 'POST', '/start',
+                                           json={'pseudo': f'bench{index}', 'telephone': f'06{index:08d}'})
+        if status != 200:
+            return
+        session_id = json.loads(body)['session_id']
+
+        stream = None
+        if self.args.sse:
+            response = await http.get(f"{self.base_url}/stream", params={'session_id': session_id})
+            stream = EventStream(response)
+
+        try:
+            win = self.peek_word is not None and random.random() < self.args.win_ratio
+            for question in random.sample(QUESTIONS, min(self.args.questions, len(QUESTIONS))):
+                if stream:
+                    stream.first_token.clear()
+                started_at = time.perf_counter()
+                post = asyncio.create_task(self._request(http, 'POST', '/stream',
+                                                         json={'question': question, 'session_id': session_id}))
+                if stream:
+                    first = asyncio.create_task(stream.first_token.wait())
+                    await asyncio.wait({post, first}, return_when=asyncio.FIRST_COMPLETED)
+                    if first.done():
+                        self.recorder.record('SSE first token', time.perf_counter() - started_at, 200)
+                    else:
+                        first.cancel()
+                await post
+                if self.args.think_time:
+                    await asyncio.sleep(random.uniform(0, self.args.think_time))
+
+            if win:
+                word = self.peek_word(session_id)
+                if word:
+                    await self._request(http, 'POST', '/stream',
+                                        json={'question': f"C'est {word} ?", 'session_id': session_id})
+                    self.games_completed += 1
+                    return
+            await self._request(http, 'POST', '/end', json={'session_id': session_id})
+            self.games_completed += 1
+        finally:
+            if stream:
+                await stream.close()
+
+    async def run(self) -> float:
+        slots = asyncio.Semaphore(self.args.concurrency)
+        connector = aiohttp.TCPConnector(limit=0)
+
+        async def limited(http, index):
+            async with slots:
+                await self.play_game(http, index)
+
+        async with aiohttp.ClientSession(connector=connector) as http:
+            poller = asyncio.create_task(self._poll_leaderboard(http)) if self.args.leaderboard_rate else None
+            started_at = time.perf_counter()
+            await asyncio.gather(*(limited(http, index) for index in range(self.args.games)))
+            elapsed = time.perf_counter() - started_at
+            if poller:
+                poller.cancel()
+                await asyncio.gather(poller, *self._reads, return_exceptions=True)
+        return elapsed
+
+    async def _poll_leaderboard(self, http) -> None:
+        """Lectures du classement pendant les parties, comme la page des scores ouverte."""
+        while True:
+            read = asyncio.create_task(self._request(http, 'GET', '/leaderboard'))
+            self._reads.add(read)
+            read.add_done_callback(self._reads.discard)
+            await asyncio.sleep(1 / self.args.leaderboard_rate)
+
+
+async def _start_site(app: web.Application):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, 'localhost', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://localhost:{port}"
+
+
+async def _wait_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            async with http.get(base_url + '/ready') as response:
+                if response.status == 200:
+                    return
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Le serveur n'est pas prêt")
+
+
+async def run(args) -> dict:
+    recorder = LatencyRecorder()
+    monitor = LoopLagMonitor()
+    runners = []
+    server = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            peek_word = None
+        else:
+            fake = FakeOllama(args.model, args.prompt_latency, args.token_latency, args.tokens, args.ollama_parallel)
+            runner, ollama_url = await _start_site(fake.create_app())
+            runners.append(runner)
+            os.environ['OLLAMA_HOST'] = ollama_url
+
+            import main as game_main
+            logging.getLogger().setLevel(logging.WARNING)
+            words_file = str(Path(args.words_file).resolve())
+            # Les fichiers de données du serveur sont écrits dans un répertoire temporaire
+            workdir = Path(tempfile.mkdtemp(prefix='bench-'))
+            (workdir / 'frontend').symlink_to(REPO_ROOT / 'frontend', target_is_directory=True)
+            os.chdir(workdir)
+            server = game_main.GameServer(words_file, 'data/game_results.csv', args.model, 'bench',
+                                          llm_concurrency=args.llm_concurrency,
+                                          llm_queue_size=args.llm_queue_size,
+                                          store=args.store, max_sessions=max(500, args.concurrency * 2))
+            runner, base_url = await _start_site(server.app)
+            runners.append(runner)
+            await _wait_ready(base_url)
+
+            def peek_word(session_id):
+                session = server.sessions.peek(session_id)
+                return session.hidden_word if session else None
+
+        monitor.start()
+        load_test = LoadTest(base_url, args, recorder, peek_word)
+        elapsed = await load_test.run()
+        await monitor.stop()
+
+        report = {
+            'games': load_test.games_completed,
+            'elapsed_seconds': round(elapsed, 2),
+            'games_per_second': round(load_test.games_completed / elapsed, 2) if elapsed else 0.0,
+            'routes': recorder.summary(elapsed),
+            'event_loop_lag': monitor.summary(),
+        }
+        if server is not None:
+            report['inference'] = server.inference_queue.to_dict()
+            report['persistence'] = {'batches': server.persistence.batches, 'writes': server.persistence.writes}
+        return report
+    finally:
+        for runner in reversed(runners):
+            await runner.cleanup()
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['games']} parties en {report['elapsed_seconds']}s "
+          f"({report['games_per_second']} parties/s)")
+    print(f"{'Route':<20} {'Requêtes':>9} {'Erreurs':>9} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for route, stats in report['routes'].items():
+        errors = sum(stats['errors'].values())
+        print(f"{route:<20} {stats['requests']:>9} {errors:>9} {stats['throughput']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+    lag = report['event_loop_lag']
+    print(f"Retard de la boucle d'événements : p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Test de charge du serveur de jeu')
+    parser.add_argument('--url', help='Serveur déjà démarré (sinon serveur intégré avec faux Ollama)')
+    parser.add_argument('--games', type=int, default=100, help='Nombre de parties jouées (par défaut: 100)')
+    parser.add_argument('--concurrency', type=int, default=20, help='Parties simultanées (par défaut: 20)')
+    parser.add_argument('--questions', type=int, default=3, help='Questions par partie (par défaut: 3)')
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help='Pause aléatoire maximale entre deux questions, en secondes')
+    parser.add_argument('--win-ratio', type=float, default=0.3,
+                        help='Part des parties gagnées, en mode intégré (par défaut: 0.3)')
+    parser.add_argument('--sse', action='store_true', help='Ouvrir le flux SSE et mesurer le premier token')
+    parser.add_argument('--leaderboard-rate', type=float, default=10,
+                        help='Lectures de /leaderboard par seconde pendant les parties (par défaut: 10)')
+    parser.add_argument('--json', dest='json_output', help='Écrire le rapport JSON dans ce fichier')
+    integrated = parser.add_argument_group('serveur intégré')
+    integrated.add_argument('--words-file', default='data/mots.txt')
+    integrated.add_argument('--store', choices=['csv', 'sqlite'], default='sqlite')
+    integrated.add_argument('--model', default='llama3.2:3b')
+    integrated.add_argument('--llm-concurrency', type=int, default=1)
+    integrated.add_argument('--llm-queue-size', type=int, default=8)
+    integrated.add_argument('--prompt-latency', type=float, default=0.05)
+    integrated.add_argument('--token-latency', type=float, default=0.02)
+    integrated.add_argument('--tokens', type=int, default=12)
+    integrated.add_argument('--ollama-parallel', type=int, default=1)
+    args = parser.parse_args()
+    # Le serveur intégré change de répertoire courant
+    if args.json_output:
+        args.json_output = str(Path(args.json_output).resolve())
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
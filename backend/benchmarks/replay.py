@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Rejeu des parties enregistrées par le journal des conversations (--transcripts-dir).
+
+Chaque partie enregistrée est rejouée : /start, ses questions dans l'ordre
+sur POST /stream, puis /end si elle ne s'est pas terminée par une victoire.
+Les pauses du joueur entre deux questions sont reproduites à l'échelle de
+--pace (0 : aucune pause).
+
+Par défaut, le serveur est lancé dans ce processus avec un stockage
+temporaire, et chaque partie rejouée garde son mot caché d'origine. Le
+rapport compare alors les parties rejouées aux parties enregistrées :
+victoires reproduites, mots révélés, réponses oui/non identiques. Avec le
+faux Ollama les réponses sont aléatoires ; avec --ollama-host, ce sont
+celles du vrai modèle, ce qui permet de vérifier un changement de prompt ou
+de modèle sur de vraies parties. Avec --url, les questions sont envoyées à
+un serveur déjà démarré (mots tirés au hasard) : seules les latences comptent.
+
+Usage :
+    python backend/benchmarks/replay.py data/transcripts --concurrency 20
+    python backend/benchmarks/replay.py data/transcripts --ollama-host http://localhost:11434 --pace 0
+    python backend/benchmarks/replay.py data/transcripts --url http://localhost:8080 --pace 1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'backend'))
+
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+from benchmarks.load_test import LatencyRecorder, LoopLagMonitor, _start_site, _wait_ready, print_report  # noqa: E402
+from transcripts import load_games  # noqa: E402
+
+YES_NO = ('oui', 'non')
+
+
+def yes_no(answer) -> str:
+    """'oui' ou 'non' si la réponse commence ainsi, sinon None."""
+    words = (answer or '').split(maxsplit=1)
+    first = words[0].strip('.,!').lower() if words else ''
+    return first if first in YES_NO else None
+
+
+class Replay:
+    def __init__(self, base_url: str, games: list, args, recorder: LatencyRecorder):
+        self.base_url = base_url
+        self.games = games
+        self.args = args
+        self.recorder = recorder
+        self.games_completed = 0
+        self.turns_replayed = 0
+        self.victories_expected = 0
+        self.victories_reproduced = 0
+        self.leaks_recorded = 0
+        self.compared = 0
+        self.agreed = 0
+
+    async def _request(self, http, method: str, route: str, **kwargs):
+        started_at = time.perf_counter()
+        async with http.request(method, self.base_url + route, **kwargs) as response:
+            body = await response.read()
+            self.recorder.record(f"{method} {route}", time.perf_counter() - started_at, response.status)
+            return response.status, body
+
+    async def replay_game(self, http, index: int, game: dict) -> None:
+        status, body = await self._request(http, 'POST', '/start',
+                                           json={'pseudo': f'replay{index}', 'telephone': f'06{index:08d}'})
+        if status != 200:
+            return
+        session_id = json.loads(body)['session_id']
+
+        previous = 0.0
+        for turn in game['turns']:
+            if self.args.pace:
+                # Temps de réflexion du joueur : écart entre deux tours, moins la génération
+                think = turn['elapsed'] - previous - (turn.get('duration') or 0)
+                await asyncio.sleep(max(0.0, think) * self.args.pace)
+            previous = turn['elapsed']
+            self.leaks_recorded += bool(turn.get('leak'))
+            if turn['source'] == 'victoire':
+                self.victories_expected += 1
+
+            status, body = await self._request(http, 'POST', '/stream',
+                                               json={'question': turn['question'], 'session_id': session_id})
+            self.turns_replayed += 1
+            if status != 200:
+                continue
+            result = json.loads(body)
+            if result.get('victory'):
+                self.victories_reproduced += turn['source'] == 'victoire'
+                self.games_completed += 1
+                return
+            recorded, replayed = yes_no(turn['answer']), yes_no(result.get('response'))
+            if recorded and replayed:
+                self.compared += 1
+                self.agreed += recorded == replayed
+
+        await self._request(http, 'POST', '/end', json={'session_id': session_id})
+        self.games_completed += 1
+
+    async def run(self) -> float:
+        slots = asyncio.Semaphore(self.args.concurrency)
+        connector = aiohttp.TCPConnector(limit=0)
+
+        async def limited(http, index, game):
+            async with slots:
+                await self.replay_game(http, index, game)
+
+        async with aiohttp.ClientSession(connector=connector) as http:
+            started_at = time.perf_counter()
+            await asyncio.gather(*(limited(http, index, game) for index, game in enumerate(self.games)))
+            return time.perf_counter() - started_at
+
+
+def _keep_recorded_words(server, games: list) -> None:
+    """Donne à chaque partie rejouée le mot caché de la partie enregistrée (serveur intégré)."""
+    words = {f'replay{index}': game['word'] for index, game in enumerate(games)}
+    create = server.sessions.create
+
+    async def create_with_recorded_word(pseudo, telephone, hidden_word):
+        return await create(pseudo, telephone, words.get(pseudo, hidden_word))
+
+    server.sessions.create = create_with_recorded_word
+
+
+async def run(args) -> dict:
+    games = load_games(args.transcripts)
+    if args.games:
+        games = games[:args.games]
+    if not games:
+        raise SystemExit("Aucune partie enregistrée dans " + ', '.join(args.transcripts))
+
+    recorder = LatencyRecorder()
+    monitor = LoopLagMonitor()
+    runners = []
+    server = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            if args.ollama_host:
+                os.environ['OLLAMA_HOST'] = args.ollama_host
+            else:
+                fake = FakeOllama(args.model, args.prompt_latency, args.token_latency, args.tokens,
+                                  args.ollama_parallel)
+                runner, ollama_url = await _start_site(fake.create_app())
+                runners.append(runner)
+                os.environ['OLLAMA_HOST'] = ollama_url
+
+            import main as game_main
+            logging.getLogger().setLevel(logging.WARNING)
+            words_file = str(Path(args.words_file).resolve())
+            # Les fichiers de données du serveur sont écrits dans un répertoire temporaire
+            workdir = Path(tempfile.mkdtemp(prefix='replay-'))
+            (workdir / 'frontend').symlink_to(REPO_ROOT / 'frontend', target_is_directory=True)
+            os.chdir(workdir)
+            server = game_main.GameServer(words_file, 'data/game_results.csv', args.model, 'replay',
+                                          llm_concurrency=args.llm_concurrency,
+                                          llm_queue_size=args.llm_queue_size, num_ctx=args.num_ctx,
+                                          max_sessions=max(500, args.concurrency * 2))
+            _keep_recorded_words(server, games)
+            runner, base_url = await _start_site(server.app)
+            runners.append(runner)
+            await _wait_ready(base_url, timeout=args.ready_timeout)
+
+        monitor.start()
+        replay = Replay(base_url, games, args, recorder)
+        elapsed = await replay.run()
+        await monitor.stop()
+
+        report = {
+            'games': replay.games_completed,
+            'turns': replay.turns_replayed,
+            'elapsed_seconds': round(elapsed, 2),
+            'games_per_second': round(replay.games_completed / elapsed, 2) if elapsed else 0.0,
+            'routes': recorder.summary(elapsed),
+            'event_loop_lag': monitor.summary(),
+        }
+        if server is not None:
+            report['comparison'] = {
+                'victories_expected': replay.victories_expected,
+                'victories_reproduced': replay.victories_reproduced,
+                'leaks_recorded': replay.leaks_recorded,
+                'leaks_replayed': server.word_leaks,
+                'yes_no_compared': replay.compared,
+                'yes_no_agreement': round(replay.agreed / replay.compared, 3) if replay.compared else None,
+            }
+            report['inference'] = server.inference_queue.to_dict()
+        return report
+    finally:
+        for runner in reversed(runners):
+            await runner.cleanup()
+
+
+def print_comparison(report: dict) -> None:
+    comparison = report.get('comparison')
+    if not comparison:
+        return
+    print(f"Victoires reproduites : {comparison['victories_reproduced']}/{comparison['victories_expected']}")
+    print(f"Mots révélés : {comparison['leaks_replayed']} (enregistrés : {comparison['leaks_recorded']})")
+    agreement = comparison['yes_no_agreement']
+    print(f"Réponses oui/non identiques : "
+          f"{'-' if agreement is None else f'{agreement:.1%}'} sur {comparison['yes_no_compared']} comparées")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rejeu des parties du journal des conversations')
+    parser.add_argument('transcripts', nargs='+', help='Répertoires ou segments du journal des conversations')
+    parser.add_argument('--url', help='Serveur déjà démarré (sinon serveur intégré)')
+    parser.add_argument('--games', type=int, default=0, help='Nombre maximal de parties rejouées (par défaut: toutes)')
+    parser.add_argument('--concurrency', type=int, default=20, help='Parties simultanées (par défaut: 20)')
+    parser.add_argument('--pace', type=float, default=0.0,
+                        help='Échelle des pauses enregistrées entre deux questions : 1 pour le rythme des '
+                             'joueurs, 0 pour enchaîner (par défaut: 0)')
+    parser.add_argument('--json', dest='json_output', help='Écrire le rapport JSON dans ce fichier')
+    integrated = parser.add_argument_group('serveur intégré')
+    integrated.add_argument('--ollama-host', help='Vrai serveur Ollama (sinon faux Ollama)')
+    integrated.add_argument('--ready-timeout', type=float, default=30,
+                            help='Attente maximale du chargement du modèle, en secondes (par défaut: 30)')
+    integrated.add_argument('--words-file', default='data/mots.txt')
+    integrated.add_argument('--model', default='llama3.2:3b')
+    integrated.add_argument('--num-ctx', type=int, default=2048)
+    integrated.add_argument('--llm-concurrency', type=int, default=1)
+    integrated.add_argument('--llm-queue-size', type=int, default=8)
+    integrated.add_argument('--prompt-latency', type=float, default=0.05)
+    integrated.add_argument('--token-latency', type=float, default=0.02)
+    integrated.add_argument('--tokens', type=int, default=12)
+    integrated.add_argument('--ollama-parallel', type=int, default=1)
+    args = parser.parse_args()
+    # Le serveur intégré change de répertoire courant
+    args.transcripts = [str(Path(path).resolve()) for path in args.transcripts]
+    if args.json_output:
+        args.json_output = str(Path(args.json_output).resolve())
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    print_comparison(report)
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""Fonctionnement multi-processus : plusieurs processus de travail servent le même port.
+
+- `run_workers()` : superviseur qui lance les processus de travail et relance
+  ceux qui s'arrêtent. Chacun écoute le même port avec SO_REUSEPORT : le
+  noyau répartit les connexions entre eux.
+- `WorkerBus` : messages entre processus par sockets Unix (tokens SSE à
+  relayer, notification de changement).
+- `ChangeFeed` : relecture du journal `events` de la base partagée, pour
+  tenir à jour les classements en mémoire de chaque processus.
+- `MetricsSnapshots` : échantillons de métriques de chaque processus, joints
+  à la réponse de GET /metrics quel que soit le processus interrogé.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CHANGE_POLL_INTERVAL = 1.0  # secondes entre deux relectures du journal sans notification
+EVENT_RETENTION = 600  # secondes de journal conservées ; un processus relancé relit la base
+RESTART_DELAY = 1  # secondes avant de relancer un processus arrêté
+METRICS_SNAPSHOT_INTERVAL = 5  # secondes entre deux écritures des métriques d'un processus
+
+
+class _BusProtocol(asyncio.DatagramProtocol):
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+
+    def datagram_received(self, data, addr):
+        try:
+            self.queue.put_nowait(json.loads(data))
+        except ValueError:
+            logger.warning("Message inter-processus illisible ignoré")
+
+    def error_received(self, exc):
+        # Destinataire absent, par exemple en cours de redémarrage : le message est perdu
+        logger.debug("Message inter-processus perdu: %s", exc)
+
+
+class WorkerBus:
+    """Socket Unix en datagrammes propre à chaque processus de travail.
+
+    Les messages sont des objets JSON, traités un par un dans l'ordre
+    d'arrivée. L'envoi ne bloque jamais : un message destiné à un processus
+    absent est perdu, ce que les destinataires compensent (relecture
+    périodique du journal, reconnexion SSE du navigateur).
+    """
+
+    def __init__(self, runtime_dir: str, worker: int, workers: int, handler):
+        self.runtime_dir = Path(runtime_dir)
+        self.worker = worker
+        self.workers = workers
+        self.handler = handler
+        self._queue = asyncio.Queue()
+        self._transport = None
+        self._task = None
+
+    def _path(self, worker: int) -> str:
+        return str(self.runtime_dir / f'worker-{worker}.sock')
+
+    async def start(self) -> None:
+        path = self._path(self.worker)
+        # Socket laissée par un processus précédent de même numéro
+        if os.path.exists(path):
+            os.unlink(path)
+        self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _BusProtocol(self._queue), local_addr=path, family=socket.AF_UNIX)
+        self._task = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._transport:
+            self._transport.close()
+            try:
+                os.unlink(self._path(self.worker))
+            except FileNotFoundError:
+                pass
+
+    def send(self, worker: int, message: dict) -> None:
+        if self._transport is not None:
+            self._transport.sendto(json.dumps(message).encode('utf-8'), self._path(worker))
+
+    def broadcast(self, message: dict) -> None:
+        for worker in range(self.workers):
+            if worker != self.worker:
+                self.send(worker, message)
+
+    async def _dispatch(self) -> None:
+        # Un seul consommateur : les tokens relayés restent dans l'ordre
+        while True:
+            message = await self._queue.get()
+            try:
+                await self.handler(message)
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement d'un message inter-processus: {e}")
+
+
+class ChangeFeed:
+    """Applique les changements enregistrés par les autres processus.
+
+    Chaque processus met à jour ses index en mémoire dès ses propres
+    écritures. Il relit ensuite dans le journal `events` celles des autres
+    processus, dans l'ordre de validation : à chaque notification, et au plus
+    tard toutes les CHANGE_POLL_INTERVAL secondes si une notification s'est
+    perdue. Les classements (et leurs ETag) sont ainsi invalidés partout.
+    """
+
+    def __init__(self, persistence, store, worker: int, handlers: dict, last_event_id: int = 0,
+                 poll_interval: float = CHANGE_POLL_INTERVAL):
+        self.persistence = persistence
+        self.store = store
+        self.worker = worker
+        self.handlers = handlers
+        self.last_event_id = last_event_id
+        self.poll_interval = poll_interval
+        self.applied = 0
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def notify(self) -> None:
+        """Un autre processus a ajouté des événements au journal."""
+        self._wakeup.set()
+
+    async def catch_up(self) -> None:
+        """Applique tous les événements validés depuis la dernière relecture."""
+        async with self._lock:
+            while True:
+                events = await self.persistence.read(self.store.events_since, self.last_event_id)
+                if not events:
+                    return
+                for event_id, worker, kind, payload in events:
+                    self.last_event_id = event_id
+                    handler = self.handlers.get(kind)
+                    if worker != self.worker and handler is not None:
+                        handler(payload)
+                        self.applied += 1
+
+    async def prune(self) -> None:
+        """Supprime les événements que plus aucun processus n'a besoin de relire."""
+        await self.persistence.write(self.store.prune_events, time.time() - EVENT_RETENTION)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.catch_up()
+            except Exception as e:
+                logger.error(f"Erreur lors de la relecture du journal des changements: {e}")
+
+
+class MetricsSnapshots:
+    """Partage les échantillons de métriques entre processus de travail.
+
+    Chaque processus écrit ses échantillons (étiquette `worker` comprise)
+    dans `metrics-<N>.json` du répertoire d'exécution, toutes les `interval`
+    secondes et à l'arrêt. Le processus qui reçoit GET /metrics y joint ceux
+    des autres : la collecte couvre tous les processus, avec au plus
+    `interval` secondes de retard pour les autres. Les fichiers sont
+    remplacés d'un bloc (`os.replace`), jamais lus à moitié écrits.
+    """
+
+    def __init__(self, runtime_dir: str, worker: int, workers: int, metrics,
+                 interval: float = METRICS_SNAPSHOT_INTERVAL):
+        self.runtime_dir = Path(runtime_dir)
+        self.worker = worker
+        self.workers = workers
+        self.metrics = metrics
+        self.interval = interval
+        self._task = None
+
+    def _path(self, worker: int) -> Path:
+        return self.runtime_dir / f'metrics-{worker}.json'
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            # Dernières valeurs, conservées pour le processus relancé sous le même numéro
+            await self.write()
+
+    async def write(self) -> None:
+        # Jauges lues dans la boucle d'événements, écriture du fichier dans un thread
+        samples = self.metrics.samples()
+        await asyncio.get_running_loop().run_in_executor(None, self._write, samples)
+
+    def _write(self, samples: dict) -> None:
+        path = self._path(self.worker)
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(samples), encoding='utf-8')
+        os.replace(temporary, path)
+
+    async def peers(self) -> list:
+        """Derniers échantillons écrits par les autres processus."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._read_peers)
+
+    def _read_peers(self) -> list:
+        peers = []
+        for worker in range(self.workers):
+            if worker == self.worker:
+                continue
+            try:
+                peers.append(json.loads(self._path(worker).read_text(encoding='utf-8')))
+            except FileNotFoundError:
+                # Processus pas encore démarré
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Métriques du processus {worker} illisibles: {e}")
+        return peers
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.write()
+            except Exception as e:
+                logger.error(f"Erreur lors de l'écriture des métriques du processus: {e}")
+            await asyncio.sleep(self.interval)
+
+
+def _worker_main(target, worker: int, runtime_dir: str, args: tuple) -> None:
+    # Le serveur du processus installe ses propres gestionnaires d'arrêt
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    target(worker, runtime_dir, *args)
+
+
+def run_workers(count: int, target, *args) -> None:
+    """Lance `count` processus `target(worker, runtime_dir, *args)` et les relance s'ils s'arrêtent.
+
+    `runtime_dir` est un répertoire temporaire commun (sockets de WorkerBus).
+    SIGINT ou SIGTERM arrête tous les processus puis rend la main.
+    """
+    runtime_dir = tempfile.mkdtemp(prefix='devinette-workers-')
+    processes = {}
+    stopping = False
+
+    def spawn(worker: int) -> None:
+        process = multiprocessing.Process(target=_worker_main, args=(target, worker, runtime_dir, args),
+                                          name=f'worker-{worker}')
+        process.start()
+        processes[worker] = process
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    previous = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        for worker in range(count):
+            spawn(worker)
+        while not stopping:
+            multiprocessing.connection.wait([process.sentinel for process in processes.values()], timeout=1)
+            for worker, process in list(processes.items()):
+                if process.is_alive() or stopping:
+                    continue
+                logger.error("Processus de travail %s arrêté (code %s), relance dans %ss",
+                             worker, process.exitcode, RESTART_DELAY,
+                             extra={'event': 'worker_restart', 'worker': worker})
+                time.sleep(RESTART_DELAY)
+                spawn(worker)
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            process.join()
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+        shutil.rmtree(runtime_dir, ignore_errors=True)
@@ -0,0 +1,95 @@
+"""Contexte de conversation envoyé au modèle pour une partie."""
+from typing import List, Optional
+
+# Les consignes communes viennent en tête et le mot caché en dernier : le
+# début du prompt système est identique pour toutes les parties, ce qui
+# maximise la réutilisation du cache de préfixe d'Ollama.
+SYSTEM_PROMPT_TEMPLATE = """Tu es une IA qui joue à un jeu de devinette.
+Le joueur doit deviner un mot en posant des questions.
+
+Instructions:
+- Si c'est une question fermée, réponds par oui ou non
+- Si c'est une question ouverte, réponds par une phrase
+- Ne donne JAMAIS une description complète du mot
+- NE DONNE JAMAIS LE MOT EN ENTIER
+- Base ta réponse en tenant compte de l'historique des questions précédentes
+
+Le mot à deviner est '{hidden_word}'."""
+
+# Estimation grossière pour le français : environ 3,5 caractères par token
+CHARS_PER_TOKEN = 3.5
+# Après un élagage, l'historique est ramené à cette fraction du budget pour
+# que le préfixe reste stable pendant plusieurs tours
+TRIM_TARGET_RATIO = 0.6
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 4
+
+
+class ChatContext:
+    """Prompt système figé et fenêtre d'historique bornée par un budget de tokens.
+
+    `history` conserve toute la conversation ; seuls les tours de la fenêtre
+    courante sont envoyés au modèle. Quand le budget est dépassé, les tours
+    les plus anciens sont retirés par blocs, afin de ne pas invalider le
+    cache de préfixe à chaque question.
+    """
+
+    def __init__(self, hidden_word: str, max_tokens: int = 1536):
+        self.system_message = {"role": "system",
+                               "content": SYSTEM_PROMPT_TEMPLATE.format(hidden_word=hidden_word.lower())}
+        self.max_tokens = max_tokens
+        self.history = []
+        self.turns = []
+        self._window_start = 0
+        self._system_tokens = estimate_tokens(self.system_message['content'])
+
+    def add_user(self, content: str) -> None:
+        self.history.append({"role": "user", "content": content})
+
+    def add_assistant(self, content: str) -> None:
+        self.history.append({"role": "assistant", "content": content})
+
+    def rollback_user(self) -> None:
+        """Retire la dernière question si elle n'a pas obtenu de réponse."""
+        if self.history and self.history[-1]['role'] == 'user':
+            self.history.pop()
+
+    def _window_tokens(self) -> int:
+        return self._system_tokens + sum(estimate_tokens(m['content'])
+                                         for m in self.history[self._window_start:])
+
+    def messages(self) -> List[dict]:
+        """Messages à envoyer au modèle : prompt système puis fenêtre d'historique."""
+        if self._window_tokens() > self.max_tokens:
+            target = self.max_tokens * TRIM_TARGET_RATIO
+            # On retire des tours complets (question + réponse), jamais la dernière question
+            while self._window_start < len(self.history) - 1 and self._window_tokens() > target:
+                self._window_start += 2 if self.history[self._window_start]['role'] == 'user' else 1
+        return [self.system_message, *self.history[self._window_start:]]
+
+    @property
+    def dropped_messages(self) -> int:
+        return self._window_start
+
+    def restore(self, history: List[dict], window_start: int) -> None:
+        """Reprend une conversation enregistrée par un autre processus."""
+        self.history = history
+        self._window_start = window_start
+
+    def record_turn(self, final_chunk) -> Optional[dict]:
+        """Conserve les compteurs Ollama du dernier tour (dernier morceau du stream)."""
+        if final_chunk is None or final_chunk.eval_count is None:
+            return None
+        turn = {
+            'prompt_tokens': final_chunk.prompt_eval_count or 0,
+            'generated_tokens': final_chunk.eval_count or 0,
+            'prompt_eval_seconds': (final_chunk.prompt_eval_duration or 0) / 1e9,
+            'eval_seconds': (final_chunk.eval_duration or 0) / 1e9,
+            'load_seconds': (final_chunk.load_duration or 0) / 1e9,
+            'total_seconds': (final_chunk.total_duration or 0) / 1e9,
+            'window_messages': len(self.history) - self._window_start,
+        }
+        self.turns.append(turn)
+        return turn
@@ -0,0 +1,151 @@
+"""Index des joueurs éligibles à la distribution de cadeaux, tenu à jour en mémoire."""
+import heapq
+import itertools
+import random
+from typing import Iterable, List, Optional
+
+WINNERS_PER_DISTRIBUTION = 3
+
+
+class SampleableSet:
+    """Ensemble de pseudos avec ajout, retrait et tirage aléatoire en O(1) par élément.
+
+    Les pseudos sont rangés dans une liste (pour le tirage) et leur position
+    dans un dictionnaire (pour le retrait par échange avec le dernier).
+    """
+
+    def __init__(self):
+        self._items = []
+        self._positions = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item) -> bool:
+        return item in self._positions
+
+    def add(self, item) -> None:
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item) -> None:
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._positions[last] = position
+
+    def clear(self) -> None:
+        self._items = []
+        self._positions = {}
+
+    def sample(self, k: int, exclude: set) -> list:
+        """Tire jusqu'à `k` éléments distincts qui ne sont pas dans `exclude`."""
+        # Les exclus sont au plus `len(exclude)` : un tirage un peu plus large suffit
+        drawn = random.sample(self._items, min(len(self._items), k + len(exclude)))
+        return [item for item in drawn if item not in exclude][:k]
+
+
+class EligibilityIndex:
+    """Candidats à la prochaine distribution, sans relecture de l'historique.
+
+    Tenu à jour à chaque partie commencée, à chaque victoire et à chaque
+    distribution :
+    - les joueurs ayant commencé une partie depuis la dernière distribution ;
+    - le meilleur temps de chacun d'eux, dans un tas à suppression paresseuse ;
+    - les joueurs n'ayant encore jamais reçu de cadeau.
+    """
+
+    def __init__(self):
+        self.since = ''
+        self._telephones = {}
+        self._recent = SampleableSet()
+        self._best = {}
+        self._heap = []
+        self._without_gift = SampleableSet()
+        self._gifted = set()
+        self._seq = itertools.count()
+
+    def rebuild(self, games: Iterable[dict], gift_recipients: set, last_distribution: Optional[str]) -> None:
+        """Reconstruit l'index à partir de l'historique (au démarrage)."""
+        self.since = last_distribution or ''
+        self._telephones = {}
+        self._recent.clear()
+        self._best = {}
+        self._heap = []
+        self._without_gift.clear()
+        self._gifted = set(gift_recipients)
+        for game in games:
+            self.record_game(game['pseudo'], game['telephone'], game['date'])
+            if game['resultat'] == 'victoire':
+                self.record_victory(game['pseudo'], game['telephone'], int(game['temps_partie']), game['date'])
+
+    def record_game(self, pseudo: str, telephone: str, date: str) -> None:
+        """Enregistre une partie commencée."""
+        self._telephones[pseudo] = telephone
+        if pseudo not in self._gifted:
+            self._without_gift.add(pseudo)
+        if date >= self.since:
+            self._recent.add(pseudo)
+
+    def record_victory(self, pseudo: str, telephone: str, temps: int, date: str) -> None:
+        """Enregistre une victoire ; seule la meilleure de chaque joueur est conservée."""
+        if date < self.since:
+            return
+        best = self._best.get(pseudo)
+        if best is not None and best[0] <= temps:
+            return
+        entry = (temps, next(self._seq), pseudo, telephone)
+        self._best[pseudo] = entry
+        heapq.heappush(self._heap, entry)
+
+    def record_distribution(self, date: str, winners: List[dict]) -> None:
+        """Ouvre une nouvelle période et retire les gagnants des joueurs sans cadeau."""
+        self.since = date
+        self._recent.clear()
+        self._best = {}
+        self._heap = []
+        for winner in winners:
+            self._gifted.add(winner['pseudo'])
+            self._without_gift.discard(winner['pseudo'])
+
+    def _fastest(self, k: int) -> List[dict]:
+        """Les `k` joueurs les plus rapides de la période, en O(k log n)."""
+        fastest, valid = [], []
+        while self._heap and len(fastest) < k:
+            entry = heapq.heappop(self._heap)
+            # Entrée périmée : le joueur a fait mieux depuis
+            if self._best.get(entry[2]) is not entry:
+                continue
+            valid.append(entry)
+            fastest.append({'pseudo': entry[2], 'telephone': entry[3]})
+        for entry in valid:
+            heapq.heappush(self._heap, entry)
+        return fastest
+
+    def select_winners(self, k: int = WINNERS_PER_DISTRIBUTION) -> List[dict]:
+        """Sélectionne les gagnants de la prochaine distribution.
+
+        D'abord les meilleurs temps depuis la dernière distribution, puis des
+        joueurs récents tirés au sort, puis d'anciens joueurs sans cadeau.
+        """
+        winners = self._fastest(k)
+        chosen = {winner['pseudo'] for winner in winners}
+        for pool in (self._recent, self._without_gift):
+            if len(winners) >= k:
+                break
+            for pseudo in pool.sample(k - len(winners), chosen):
+                winners.append({'pseudo': pseudo, 'telephone': self._telephones[pseudo]})
+                chosen.add(pseudo)
+        return winners
+
+    def to_dict(self) -> dict:
+        return {
+            'since': self.since,
+            'recent_players': len(self._recent),
+            'recent_winners': len(self._best),
+            'players_without_gift': len(self._without_gift),
+        }
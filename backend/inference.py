@@ -0,0 +1,210 @@
+"""File d'attente bornée pour les appels au modèle LLM."""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class InferenceQueueFull(Exception):
+    """Levée quand la file d'attente d'inférence est saturée."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"File d'inférence saturée, réessayer dans {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceQueueBusy(Exception):
+    """Levée quand une génération spéculative retarderait une vraie question."""
+
+
+class InferenceTicket:
+    """Horodatage d'une requête d'inférence, de la mise en file à la fin."""
+
+    def __init__(self):
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.first_token_at = None
+
+    def mark_first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+
+class InferenceStats:
+    """Mesures glissantes du temps d'attente et du temps de génération.
+
+    Si `metrics` est fourni (voir metrics.py), chaque mesure alimente aussi
+    les histogrammes exposés sur /metrics.
+    """
+
+    def __init__(self, window: int = 200, metrics=None):
+        self.metrics = metrics
+        self.wait_times = deque(maxlen=window)
+        self.generation_times = deque(maxlen=window)
+        self.first_token_times = deque(maxlen=window)
+        self.prompt_tokens = deque(maxlen=window)
+        self.generated_tokens = deque(maxlen=window)
+        self.tokens_per_second = deque(maxlen=window)
+        self.completed = 0
+        self.rejected = 0
+
+    def record(self, ticket: InferenceTicket) -> None:
+        finished_at = time.perf_counter()
+        wait = ticket.started_at - ticket.queued_at
+        generation = finished_at - ticket.started_at
+        self.wait_times.append(wait)
+        self.generation_times.append(generation)
+        first_token = None
+        if ticket.first_token_at is not None:
+            # Délai perçu par le joueur : attente en file comprise
+            first_token = ticket.first_token_at - ticket.queued_at
+            self.first_token_times.append(first_token)
+        self.completed += 1
+        if self.metrics:
+            self.metrics.llm_queue_wait.observe(wait)
+            self.metrics.llm_generation.observe(generation)
+            if first_token is not None:
+                self.metrics.llm_first_token.observe(first_token)
+
+    def record_rejection(self) -> None:
+        self.rejected += 1
+        if self.metrics:
+            self.metrics.llm_rejected.inc()
+
+    def record_usage(self, turn: dict) -> None:
+        """Enregistre les compteurs de tokens rapportés par Ollama pour un tour."""
+        self.prompt_tokens.append(turn['prompt_tokens'])
+        self.generated_tokens.append(turn['generated_tokens'])
+        tokens_per_second = None
+        if turn['eval_seconds'] > 0:
+            tokens_per_second = turn['generated_tokens'] / turn['eval_seconds']
+            self.tokens_per_second.append(tokens_per_second)
+        if self.metrics:
+            self.metrics.llm_prompt_tokens.inc(turn['prompt_tokens'])
+            self.metrics.llm_generated_tokens.inc(turn['generated_tokens'])
+            if tokens_per_second is not None:
+                self.metrics.llm_tokens_per_second.observe(tokens_per_second)
+
+    @staticmethod
+    def _summary(samples) -> dict:
+        if not samples:
+            return {'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        ordered = sorted(samples)
+        return {
+            'avg': round(sum(ordered) / len(ordered), 4),
+            'p50': round(ordered[len(ordered) // 2], 4),
+            'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+            'max': round(ordered[-1], 4),
+        }
+
+    def average_generation(self) -> float:
+        if not self.generation_times:
+            return 0.0
+        return sum(self.generation_times) / len(self.generation_times)
+
+    def to_dict(self) -> dict:
+        return {
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'queue_wait_seconds': self._summary(self.wait_times),
+            'generation_seconds': self._summary(self.generation_times),
+            'time_to_first_token_seconds': self._summary(self.first_token_times),
+            'prompt_tokens': self._summary(self.prompt_tokens),
+            'generated_tokens': self._summary(self.generated_tokens),
+            'tokens_per_second': self._summary(self.tokens_per_second),
+        }
+
+
+class InferenceQueue:
+    """Limite le nombre de générations simultanées envoyées à Ollama.
+
+    `max_concurrency` doit correspondre au parallélisme du serveur Ollama
+    (OLLAMA_NUM_PARALLEL). Au-delà de `max_pending` requêtes en attente,
+    les nouvelles demandes sont refusées immédiatement.
+
+    Les générations spéculatives (voir speculation.py) ne prennent une place
+    que si aucune question n'est en cours ni en attente, et sont annulées dès
+    qu'une question arrive : elles ne la retardent jamais.
+    """
+
+    def __init__(self, max_concurrency: int = 1, max_pending: int = 8, metrics=None):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.pending = 0
+        self.active = 0
+        self.stats = InferenceStats(metrics=metrics)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Tâches occupant une place pour une génération spéculative
+        self._speculative = set()
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and self.pending == 0
+
+    def retry_after(self) -> int:
+        """Estime en secondes le délai avant qu'une place se libère."""
+        average = self.stats.average_generation() or 1.0
+        return max(1, math.ceil(average * (self.pending + 1) / self.max_concurrency))
+
+    @asynccontextmanager
+    async def slot(self):
+        """Réserve une place de génération, en attendant si nécessaire.
+
+        Retourne un `InferenceTicket` sur lequel l'appelant signale le
+        premier token reçu.
+        """
+        if self.pending >= self.max_pending:
+            self.stats.record_rejection()
+            raise InferenceQueueFull(self.retry_after())
+
+        # Une vraie question interrompt tout travail spéculatif, même si une place est libre :
+        # les générations simultanées se partagent le serveur Ollama
+        for task in self._speculative:
+            task.cancel()
+
+        ticket = InferenceTicket()
+        self.pending += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.pending -= 1
+
+        ticket.started_at = time.perf_counter()
+        self.active += 1
+        try:
+            yield ticket
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            self.stats.record(ticket)
+
+    @asynccontextmanager
+    async def speculative_slot(self):
+        """Réserve une place pour une génération spéculative, sans jamais attendre.
+
+        Lève `InferenceQueueBusy` si une question est en cours ou en attente.
+        La tâche appelante est annulée dès qu'une question demande une place.
+        Ces générations ne sont pas comptées dans les statistiques.
+        """
+        if not self.idle or self._semaphore.locked():
+            raise InferenceQueueBusy()
+        # Place libre : l'acquisition ne suspend pas la tâche
+        await self._semaphore.acquire()
+        task = asyncio.current_task()
+        self._speculative.add(task)
+        try:
+            yield
+        finally:
+            self._speculative.discard(task)
+            self._semaphore.release()
+
+    def to_dict(self) -> dict:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_pending': self.max_pending,
+            'active': self.active,
+            'pending': self.pending,
+            'speculative': len(self._speculative),
+            **self.stats.to_dict(),
+        }
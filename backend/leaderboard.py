@@ -0,0 +1,123 @@
+"""Classements maintenus en mémoire et mis à jour à chaque victoire."""
+import bisect
+import hashlib
+import itertools
+import json
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+# Périodes de classement disponibles via GET /leaderboard?window=...
+WINDOWS = ('all', 'today', 'week', 'distribution')
+
+
+class TopK:
+    """Meilleurs temps triés, limités à `k` entrées.
+
+    Les entrées sont triées par (temps, ordre d'arrivée) : à temps égal, la
+    victoire la plus ancienne reste devant, comme avec un tri stable.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._entries = []
+
+    def add(self, temps: int, seq: int, pseudo: str, date: str) -> bool:
+        """Insère une victoire et retourne True si le classement a changé."""
+        key = (temps, seq)
+        if len(self._entries) >= self.k and key >= self._entries[-1][:2]:
+            return False
+        bisect.insort(self._entries, (temps, seq, pseudo, date))
+        del self._entries[self.k:]
+        return True
+
+    def clear(self) -> None:
+        self._entries = []
+
+    def to_list(self) -> list:
+        return [{'pseudo': pseudo, 'temps': temps, 'date': date, 'position': position}
+                for position, (temps, _, pseudo, date) in enumerate(self._entries, 1)]
+
+
+class _Board:
+    """Un classement, sa date de début de période et sa réponse JSON en cache."""
+
+    def __init__(self, k: int):
+        self.top = TopK(k)
+        self.since = ''
+        self.body = None
+        self.etag = None
+
+    def invalidate(self) -> None:
+        self.body = None
+        self.etag = None
+
+    def render(self):
+        if self.body is None:
+            self.body = json.dumps({'leaderboard': self.top.to_list()})
+            # ETag fort dérivé du contenu : stable entre redémarrages
+            self.etag = '"' + hashlib.sha1(self.body.encode('utf-8')).hexdigest()[:20] + '"'
+        return self.body, self.etag
+
+
+class Leaderboard:
+    """Classements général, du jour, de la semaine et depuis la dernière distribution.
+
+    Construit une fois au démarrage à partir des victoires enregistrées, puis
+    mis à jour par `record_victory()`. Les classements du jour et de la semaine
+    repartent de zéro au changement de période.
+    """
+
+    def __init__(self, k: int = 10):
+        self.k = k
+        self._seq = itertools.count()
+        self._boards = {window: _Board(k) for window in WINDOWS}
+
+    @staticmethod
+    def _period_start(window: str, now: datetime) -> str:
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if window == 'today':
+            return day.isoformat()
+        return (day - timedelta(days=day.weekday())).isoformat()
+
+    def _roll_periods(self, now: Optional[datetime] = None) -> None:
+        now = now or datetime.now()
+        for window in ('today', 'week'):
+            board = self._boards[window]
+            start = self._period_start(window, now)
+            if board.since != start:
+                board.since = start
+                board.top.clear()
+                board.invalidate()
+
+    def rebuild(self, victories: Iterable[dict], last_distribution: Optional[str]) -> None:
+        """Reconstruit tous les classements à partir de l'historique des victoires."""
+        for board in self._boards.values():
+            board.top.clear()
+            board.invalidate()
+        self._boards['distribution'].since = last_distribution or ''
+        self._boards['today'].since = self._boards['week'].since = None
+        self._roll_periods()
+        for game in victories:
+            self.record_victory(game['pseudo'], int(game['temps_partie']), game['date'])
+
+    def record_victory(self, pseudo: str, temps: int, date: str) -> None:
+        """Ajoute une victoire aux classements dont la période la contient."""
+        self._roll_periods()
+        seq = next(self._seq)
+        for board in self._boards.values():
+            if date >= board.since and board.top.add(temps, seq, pseudo, date):
+                board.invalidate()
+
+    def start_distribution_period(self, date: str) -> None:
+        """Remet à zéro le classement depuis la dernière distribution."""
+        board = self._boards['distribution']
+        board.since = date
+        board.top.clear()
+        board.invalidate()
+
+    def render(self, window: str = 'all'):
+        """Retourne le JSON du classement et son ETag."""
+        if window not in self._boards:
+            raise ValueError(f"Période de classement inconnue: {window}")
+        self._roll_periods()
+        return self._boards[window].render()
@@ -0,0 +1,202 @@
+"""Répartition des générations entre plusieurs serveurs Ollama."""
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Iterable, List, Optional, Tuple
+
+import httpx  # dépendance d'ollama, utilisée pour ses délais et ses exceptions réseau
+import ollama
+
+from warmup import CHECKING, ERROR, PULLING, READY, WARMING, ModelWarmup
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = 10  # secondes entre deux vérifications de chaque serveur
+HEALTH_CHECK_TIMEOUT = 5
+CONNECT_TIMEOUT = 5  # un serveur injoignable est détecté vite ; la génération n'a pas de limite
+
+# Erreurs imputables au serveur Ollama plutôt qu'à la requête
+BACKEND_ERRORS = (ollama.ResponseError, ConnectionError, httpx.HTTPError)
+
+# État global affiché par /ready : le plus avancé parmi les serveurs
+_STATE_PRIORITY = (READY, WARMING, PULLING, CHECKING, ERROR)
+
+
+class NoBackendAvailable(Exception):
+    """Aucun serveur Ollama ne peut traiter la requête."""
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """Indique si l'erreur justifie de réessayer sur un autre serveur.
+
+    Une erreur 4xx (hors 404, modèle absent de ce serveur) vient de la
+    requête elle-même : un autre serveur répondrait de la même façon.
+    """
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500 or error.status_code in (-1, 404)
+    return isinstance(error, BACKEND_ERRORS)
+
+
+def parse_backend(value: str) -> Tuple[str, float]:
+    """Lit "hôte[=poids]", par exemple "http://gpu1:11434=2"."""
+    host, _, weight = value.rpartition('=') if '=' in value else (value, '', '1')
+    weight = float(weight)
+    if weight <= 0:
+        raise ValueError(f"Poids invalide pour {host}: {weight}")
+    return host, weight
+
+
+class Backend:
+    """Un serveur Ollama, son état de préparation et sa charge courante."""
+
+    def __init__(self, host: Optional[str], weight: float, model_name: str, options: dict,
+                 keep_alive, skip_pull: bool):
+        self.host = host
+        self.name = host or 'défaut'
+        self.weight = weight
+        self.client = ollama.AsyncClient(host=host, timeout=httpx.Timeout(None, connect=CONNECT_TIMEOUT))
+        self.warmup = ModelWarmup(self.client, model_name, options, keep_alive, skip_pull=skip_pull)
+        self.healthy = True
+        # Résultat de la dernière vérification, même si le serveur n'a pas été écarté
+        self.reachable = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.warmup.ready
+
+    @property
+    def load(self) -> float:
+        """Requêtes en cours rapportées au poids : le serveur le moins chargé est choisi."""
+        return self.outstanding / self.weight
+
+    @asynccontextmanager
+    async def track(self):
+        self.outstanding += 1
+        self.requests += 1
+        try:
+            yield self
+        finally:
+            self.outstanding -= 1
+
+    def to_dict(self) -> dict:
+        return {
+            'host': self.name,
+            'weight': self.weight,
+            'status': self.warmup.state if self.healthy else ERROR,
+            'healthy': self.healthy,
+            'reachable': self.reachable,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }
+
+
+class BackendPool:
+    """Ensemble de serveurs Ollama servant le même modèle.
+
+    Chaque requête va au serveur disponible le moins chargé (requêtes en
+    cours divisées par le poids), sauf si la partie est déjà associée à un
+    serveur disponible : son contexte y est encore en cache. Un serveur en
+    erreur est écarté jusqu'à ce qu'une vérification périodique le trouve
+    de nouveau joignable.
+    """
+
+    def __init__(self, backends: Iterable[Tuple[Optional[str], float]], model_name: str, options: dict,
+                 keep_alive, skip_pull: bool = False, metrics=None):
+        self.model_name = model_name
+        self.metrics = metrics
+        self.backends: List[Backend] = [Backend(host, weight, model_name, options, keep_alive, skip_pull)
+                                        for host, weight in backends]
+        self._by_name = {backend.name: backend for backend in self.backends}
+        self._health_task = None
+
+    @property
+    def ready(self) -> bool:
+        return any(backend.available for backend in self.backends)
+
+    def start(self) -> None:
+        for backend in self.backends:
+            backend.warmup.start()
+        self._health_task = asyncio.create_task(self._health_checks())
+
+    async def stop(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        for backend in self.backends:
+            await backend.warmup.stop()
+
+    def choose(self, affinity: Optional[str] = None, exclude: Iterable[Backend] = ()) -> Optional[Backend]:
+        """Choisit le serveur d'une requête, ou None si aucun n'est disponible."""
+        preferred = self._by_name.get(affinity)
+        if preferred is not None and preferred.available and preferred not in exclude:
+            return preferred
+        candidates = [backend for backend in self.backends if backend.available and backend not in exclude]
+        if not candidates:
+            return None
+        lowest = min(backend.load for backend in candidates)
+        # Tirage entre ex aequo pour ne pas toujours charger le premier serveur
+        return random.choice([backend for backend in candidates if backend.load == lowest])
+
+    def record_failure(self, backend: Backend, error: Exception) -> None:
+        backend.failures += 1
+        backend.last_error = str(error) or type(error).__name__
+        if self.metrics:
+            self.metrics.llm_backend_failures.inc(backend=backend.name)
+        if is_backend_failure(error) and len(self.backends) > 1:
+            # Avec un seul serveur, l'écarter bloquerait toutes les parties
+            backend.healthy = False
+            logger.warning("Serveur Ollama %s écarté après une erreur: %s", backend.name, backend.last_error,
+                           extra={'event': 'backend_down', 'backend': backend.name})
+
+    async def _health_checks(self) -> None:
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            await asyncio.gather(*(self._check(backend) for backend in self.backends))
+
+    async def _check(self, backend: Backend) -> None:
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(backend.client.ps(), HEALTH_CHECK_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if backend.reachable:
+                logger.warning("Serveur Ollama %s injoignable: %s", backend.name, e,
+                               extra={'event': 'backend_down', 'backend': backend.name})
+            backend.reachable = False
+            backend.last_error = str(e) or type(e).__name__
+            # Avec un seul serveur, l'écarter bloquerait toutes les parties (voir record_failure)
+            if len(self.backends) > 1:
+                backend.healthy = False
+            return
+        if not backend.reachable or not backend.healthy:
+            logger.info("Serveur Ollama %s de nouveau disponible", backend.name,
+                        extra={'event': 'backend_up', 'backend': backend.name})
+        backend.reachable = True
+        backend.healthy = True
+        if self.metrics:
+            self.metrics.llm_backend_health_check.observe(time.perf_counter() - started_at, backend=backend.name)
+
+    def to_dict(self) -> dict:
+        states = {backend.warmup.state if backend.healthy else ERROR for backend in self.backends}
+        status = next(state for state in _STATE_PRIORITY if state in states)
+        errors = [backend.warmup.error for backend in self.backends if backend.warmup.error]
+        ready_after = [backend.warmup.ready_after for backend in self.backends if backend.warmup.ready_after]
+        return {
+            'status': status,
+            'model': self.model_name,
+            'error': errors[0] if errors else None,
+            'ready_after_seconds': min(ready_after) if ready_after else None,
+            'backends': [backend.to_dict() for backend in self.backends],
+        }
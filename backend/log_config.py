@@ -0,0 +1,38 @@
+"""Configuration des journaux : texte lisible ou JSON structuré (une ligne par événement).
+
+Les champs passés via `extra={...}` sont ajoutés à l'événement JSON, ce qui
+permet de filtrer ou d'agréger les journaux sans analyser les messages.
+"""
+import json
+import logging
+from datetime import datetime, timezone
+
+# Attributs standard d'un LogRecord : tout le reste vient de `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                event[key] = value
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = 'INFO', fmt: str = 'text') -> None:
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
@@ -3,69 +3,153 @@ import argparse
 from aiohttp import web
 import aiohttp_sse
 import json
-import ollama
-import csv
-import random
 from datetime import datetime
 from pathlib import Path
 import logging
+import asyncio
+import hmac
+import time
+from contextlib import asynccontextmanager
+
+from analytics import EXPORT_FORMATS, ResultsAnalytics, encode_csv, encode_ndjson, next_page
+from answer_cache import AnswerCache, is_cacheable, normalize_question
+from assets import StaticAssets
+from cluster import ChangeFeed, MetricsSnapshots, WorkerBus, run_workers
+from eligibility import EligibilityIndex
+from inference import InferenceQueue, InferenceQueueFull
+from persistence import PersistenceWriter
+from rate_limit import ADMIN, AUTH, DEFAULT, LLM, AdmissionControl, parse_rate
+from leaderboard import Leaderboard
+from llm_pool import BACKEND_ERRORS, BackendPool, NoBackendAvailable, is_backend_failure, parse_backend
+from log_config import configure_logging
+from metrics import Metrics
+from sessions import SessionConflict, SessionStore, SharedSessionStore
+from speculation import OpeningQuestions, Speculator
+from storage import RESULTATS, DistributionConflict, create_store, import_csv_history
+from transcripts import TranscriptLog
+from words import WordPool
 
 # Constants
 JSON_CONTENT_TYPE = 'application/json'
 DISTRIBUTIONS_FILE = Path('data/distributions.csv')
 CADEAUX_FILE = Path('data/cadeaux_recus.csv')
+SESSION_SWEEP_INTERVAL = 60  # secondes entre deux purges des sessions expirées
+RESPONSE_TOKEN_RESERVE = 512  # tokens de contexte réservés à la réponse du modèle
+WARMUP_RETRY_AFTER = 5  # secondes conseillées au client pendant le chargement du modèle
+EXPORT_PAGE_SIZE = 500  # parties lues et envoyées à la fois par GET /admin/export
+DISCONNECT_POLL_INTERVAL = 0.25  # secondes entre deux vérifications de la connexion pendant une question
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class GameServer:
-    def __init__(self, words_file: str, output_file: str, model_name: str, admin_password: str):
+    def __init__(self, words_file: str, output_file: str, model_name: str, admin_password: str,
+                 session_timeout: float = 1800, max_sessions: int = 500,
+                 llm_concurrency: int = 1, llm_queue_size: int = 8,
+                 store: str = 'sqlite', database: str = None, word_policy: str = 'random',
+                 num_ctx: int = 2048, keep_alive=-1, skip_pull: bool = False,
+                 answer_cache_size: int = 0, answer_cache_ttl: float = 86400, answer_cache_file: str = None,
+                 ollama_hosts: list = None, worker: int = None, workers: int = 1, runtime_dir: str = None,
+                 speculate: bool = False, speculative_questions: int = 3, opening_questions_file: str = None,
+                 rate_limits: dict = None, session_question_rate=None, trust_forwarded: bool = False,
+                 transcripts_dir: str = None):
         self.model_name = model_name
         self.admin_password = admin_password
-        self.conversation_history = []
-        self.start_time = None
-        self.current_pseudo = None
-        self.hidden_word = None
-        logger.info(f"Initialisation du modèle {self.model_name}...")
-        try:
-            ollama.pull(self.model_name)
-            logger.info(f"Modèle {self.model_name} téléchargé avec succès")
-        except Exception as e:
-            logger.error(f"Erreur lors du téléchargement du modèle: {e}")
-            raise
-            
+        # Numéro du processus de travail quand plusieurs processus partagent l'état (voir cluster.py)
+        self.worker = worker
+        shared = worker is not None
+        self.metrics = Metrics(worker)
+        # Options identiques à chaque appel : un changement forcerait Ollama à recharger le modèle
+        self.llm_options = {'num_ctx': num_ctx}
+        self.keep_alive = keep_alive
+        # Serveurs Ollama (hôte, poids) ; par défaut l'hôte implicite (OLLAMA_HOST)
+        backends = [parse_backend(host) for host in ollama_hosts] if ollama_hosts else [(None, 1)]
+        # Le modèle est préparé en arrière-plan sur chaque serveur : les pages sont servies immédiatement
+        self.llm_pool = BackendPool(backends, self.model_name, self.llm_options, self.keep_alive,
+                                    skip_pull=skip_pull, metrics=self.metrics)
+        # `llm_concurrency` générations simultanées par serveur, réparties entre les processus
+        self.inference_queue = InferenceQueue(max_concurrency=max(1, llm_concurrency * len(backends) // workers),
+                                              max_pending=max(1, llm_queue_size // workers), metrics=self.metrics)
+        # Réponses du modèle contenant le mot caché
+        self.word_leaks = 0
+        # Cache optionnel des réponses aux questions fermées fréquentes
+        self.answer_cache = None
+        if answer_cache_size > 0:
+            self.answer_cache = AnswerCache(max_entries=answer_cache_size, ttl=answer_cache_ttl or None)
+            if answer_cache_file:
+                self.answer_cache.load(Path(answer_cache_file))
+        # Travail spéculatif optionnel au début de chaque partie
+        self.speculator = None
+        if speculate:
+            questions = OpeningQuestions()
+            if opening_questions_file:
+                questions.load(Path(opening_questions_file))
+            self.speculator = Speculator(self.llm_pool, self.inference_queue, self.answer_cache, questions,
+                                         self.model_name, self.llm_options, self.keep_alive,
+                                         max_questions=speculative_questions, metrics=self.metrics)
+        # Journal optionnel des conversations, pour l'analyse et le rejeu (benchmarks/replay.py)
+        self.transcripts = TranscriptLog(Path(transcripts_dir), worker=worker) if transcripts_dir else None
+        self._sweeper_task = None
+        self.word_pool = WordPool(words_file, policy=word_policy)
+
         self.output_file = Path(output_file)
-        self.app = web.Application()
+        self.store = create_store(store, self.output_file, DISTRIBUTIONS_FILE, CADEAUX_FILE,
+                                  Path(database) if database else None, worker=worker)
+        self.leaderboard = Leaderboard(k=10)
+        # Candidats à la distribution de cadeaux, tenus à jour au fil des parties
+        self.eligibility = EligibilityIndex()
+        # Un seul instantané : aucun changement d'un autre processus n'est manqué ni appliqué deux fois
+        with self.store.snapshot():
+            last_dist = self.store.last_distribution()
+            self.leaderboard.rebuild(self.store.iter_victories(), last_dist[0] if last_dist else None)
+            self.eligibility.rebuild(self.store.iter_games(), self.store.gift_recipients(),
+                                     last_dist[0] if last_dist else None)
+            last_event_id = self.store.last_event_id() if shared else 0
+        self._distribution_lock = asyncio.Lock()
+        # Après le démarrage, tous les accès au stockage passent par l'écrivain unique
+        self.persistence = PersistenceWriter(self.store, metrics=self.metrics)
+        # Statistiques par mot pour l'administration, recalculées quand les résultats changent
+        self.analytics = ResultsAnalytics(self.persistence, self.store)
+        if shared:
+            self.sessions = SharedSessionStore(self.persistence, self.store, worker, idle_timeout=session_timeout,
+                                               max_sessions=max_sessions,
+                                               context_tokens=num_ctx - RESPONSE_TOKEN_RESERVE)
+        else:
+            self.sessions = SessionStore(idle_timeout=session_timeout, max_sessions=max_sessions,
+                                         context_tokens=num_ctx - RESPONSE_TOKEN_RESERVE)
+        # Messages entre processus et changements enregistrés par les autres
+        self.bus = WorkerBus(runtime_dir, worker, workers, self._handle_worker_message) if shared else None
+        self.changes = ChangeFeed(self.persistence, self.store, worker, {
+            'game': lambda event: self._record_game(event['pseudo'], event['telephone'], event['date']),
+            'victory': lambda event: self._record_victory(event['pseudo'], event['telephone'],
+                                                          event['temps_partie'], event['date']),
+            'abandon': lambda event: self.analytics.invalidate(),
+            'distribution': lambda event: self._record_distribution(event['date'], event['winners']),
+        }, last_event_id) if shared else None
+        # Métriques de tous les processus sur GET /metrics, quel que soit celui qui répond
+        self.metrics_snapshots = MetricsSnapshots(runtime_dir, worker, workers, self.metrics) if shared else None
+        if shared:
+            self.metrics.peers = self.metrics_snapshots.peers
+        # Pages et fichiers statiques chargés et compressés une fois
+        self.assets = StaticAssets(Path('frontend'))
+        # Budgets de requêtes par client et par session (aucune limite par défaut)
+        self.admission = AdmissionControl(rate_limits or {}, llm_session=session_question_rate,
+                                          trust_forwarded=trust_forwarded, metrics=self.metrics)
+        self._register_gauges()
+        self.app = web.Application(middlewares=[self.metrics.middleware(), self.admission.middleware()])
         self.setup_routes()
-        
-        # Vérifier/créer le fichier CSV s'il n'existe pas
-        # Créer le répertoire parent si nécessaire
-        self.output_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Créer le fichier CSV s'il n'existe pas
-        if not self.output_file.exists():
-            with open(self.output_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['date', 'pseudo', 'telephone', 'mot_cache', 'resultat', 'temps_partie'])
-
-    def _select_random_word(self, words_file: str) -> str:
-        """Sélectionne un mot aléatoire du fichier."""
-        try:
-            words_path = Path(words_file)
-            if not words_path.exists():
-                raise FileNotFoundError(f"Le fichier {words_file} n'existe pas")
-                
-            with open(words_path, 'r', encoding='utf-8') as f:
-                words = [word.strip().lower() for word in f if word.strip()]
-                
-            if not words:
-                raise ValueError("Le fichier de mots est vide")
-                
-            return random.choice(words)
-            
-        except Exception as e:
-            logger.error(f"Erreur lors du chargement du fichier de mots: {e}")
-            raise
+        self.app.on_startup.append(self._start_persistence)
+        self.app.on_startup.append(self._start_transcripts)
+        self.app.on_startup.append(self._start_cluster)
+        self.app.on_startup.append(self._start_llm_pool)
+        self.app.on_startup.append(self._start_session_sweeper)
+        self.app.on_startup.append(self._start_word_pool)
+        self.app.on_cleanup.append(self._stop_word_pool)
+        self.app.on_cleanup.append(self._stop_session_sweeper)
+        self.app.on_cleanup.append(self._stop_speculator)
+        self.app.on_cleanup.append(self._stop_transcripts)
+        self.app.on_cleanup.append(self._stop_llm_pool)
+        self.app.on_cleanup.append(self._stop_cluster)
+        self.app.on_cleanup.append(self._stop_persistence)
 
     def setup_routes(self):
         self.app.router.add_get('/', self.handle_index)
@@ -77,56 +161,212 @@ class GameServer:
         self.app.router.add_post('/stream', self.handle_stream)
         self.app.router.add_post('/end', self.handle_end)
         self.app.router.add_get('/leaderboard', self.handle_leaderboard)
+        self.app.router.add_get('/inference/stats', self.handle_inference_stats)
+        self.app.router.add_get('/ready', self.handle_ready)
+        self.app.router.add_get('/metrics', self.metrics.handle_metrics)
         self.app.router.add_get('/distribution/last', self.handle_last_distribution)
         self.app.router.add_get('/distribution/winners', self.handle_distribution_winners)
         self.app.router.add_post('/distribution/start', self.handle_distribution_start)
         self.app.router.add_post('/distribution/verify', self.handle_distribution_verify)
         self.app.router.add_get('/distribution/history', self.handle_distribution_history)
-        self.app.router.add_static('/static', Path('frontend'))
+        self.app.router.add_get('/admin/analytics', self.handle_admin_analytics)
+        self.app.router.add_get('/admin/export', self.handle_admin_export)
+        self.app.router.add_get('/static/{path:.+}', self.assets.handle_static)
+
+    def _register_gauges(self):
+        """Jauges lues à chaque collecte de /metrics."""
+        gauge = self.metrics.gauge
+        gauge('game_sessions_active', 'Parties en cours en mémoire', lambda: len(self.sessions))
+        gauge('llm_queue_pending', "Questions en attente d'une place de génération",
+              lambda: self.inference_queue.pending)
+        gauge('llm_queue_active', 'Générations en cours', lambda: self.inference_queue.active)
+        gauge('llm_model_ready', 'Modèle prêt sur au moins un serveur (1) ou non (0)', lambda: int(self.llm_pool.ready))
+        gauge('llm_backends_available', 'Serveurs Ollama disponibles',
+              lambda: sum(backend.available for backend in self.llm_pool.backends))
+        gauge('llm_word_leaks', 'Réponses du modèle ayant révélé le mot caché', lambda: self.word_leaks)
+        gauge('storage_queue_depth', "Opérations de stockage en attente de l'écrivain",
+              lambda: self.persistence.queue_depth)
+        if self.answer_cache is not None:
+            gauge('answer_cache_hits', 'Réponses servies depuis le cache', lambda: self.answer_cache.hits)
+            gauge('answer_cache_misses', 'Questions absentes du cache', lambda: self.answer_cache.misses)
+        if self.transcripts is not None:
+            gauge('transcript_records_pending', "Enregistrements de conversation en attente d'écriture",
+                  lambda: self.transcripts.pending)
+            gauge('transcript_records_dropped', 'Enregistrements de conversation perdus (file pleine ou erreur)',
+                  lambda: self.transcripts.dropped)
+
+    async def _start_persistence(self, app):
+        self.persistence.start()
+
+    async def _stop_persistence(self, app):
+        await self.persistence.stop()
+
+    async def _start_transcripts(self, app):
+        if self.transcripts is not None:
+            self.transcripts.start()
+
+    async def _stop_transcripts(self, app):
+        if self.transcripts is not None:
+            await self.transcripts.stop()
+
+    async def _start_cluster(self, app):
+        if self.bus is not None:
+            await self.bus.start()
+            self.changes.start()
+            self.metrics_snapshots.start()
+
+    async def _stop_cluster(self, app):
+        if self.bus is not None:
+            await self.metrics_snapshots.stop()
+            await self.changes.stop()
+            await self.bus.stop()
+
+    async def _handle_worker_message(self, message: dict) -> None:
+        """Message d'un autre processus de travail (voir WorkerBus)."""
+        if message['type'] == 'sse':
+            # Événement d'une partie dont la connexion SSE est ouverte sur ce processus
+            session = self.sessions.peek(message['session_id'])
+            if session is not None:
+                await self._send_event(session, message['event'], message['payload'])
+        elif message['type'] == 'changed':
+            self.changes.notify()
+
+    def _notify_change(self) -> None:
+        """Prévient les autres processus qu'un événement a été ajouté au journal."""
+        if self.bus is not None:
+            self.bus.broadcast({'type': 'changed'})
 
-    async def _update_game_result(self, pseudo: str, resultat: str) -> None:
-        """Met à jour le résultat et le temps de la partie dans le CSV."""
+    async def _start_llm_pool(self, app):
+        self.llm_pool.start()
+
+    async def _stop_llm_pool(self, app):
+        await self.llm_pool.stop()
+
+    async def _stop_speculator(self, app):
+        if self.speculator is not None:
+            await self.speculator.stop()
+
+    async def _start_word_pool(self, app):
+        self.word_pool.start()
+
+    async def _stop_word_pool(self, app):
+        await self.word_pool.stop()
+
+    async def _start_session_sweeper(self, app):
+        self._sweeper_task = asyncio.create_task(self._sweep_sessions())
+
+    async def _stop_session_sweeper(self, app):
+        if self._sweeper_task:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _sweep_sessions(self):
+        """Purge périodiquement les sessions inactives."""
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+            try:
+                await self._abandon_sessions(await self.sessions.purge_expired())
+                if self.changes is not None:
+                    await self.changes.prune()
+            except Exception as e:
+                logger.error(f"Erreur lors de la purge des sessions: {e}")
+
+    async def _abandon_sessions(self, sessions) -> None:
+        """Enregistre comme abandonnées les sessions expirées ou évincées."""
+        for session in sessions:
+            logger.info(f"Session expirée pour {session.pseudo}, partie marquée abandonnée")
+            await self._update_game_result(session, 'abandon')
+
+    async def _get_session(self, request, data=None):
+        """Retrouve la session désignée par la requête (corps JSON ou paramètre)."""
+        session_id = (data or {}).get('session_id') or request.query.get('session_id')
+        return await self.sessions.get(session_id)
+
+    def _record_game(self, pseudo: str, telephone: str, date: str) -> None:
+        self.eligibility.record_game(pseudo, telephone, date)
+        self.analytics.invalidate()
+
+    def _record_victory(self, pseudo: str, telephone: str, temps_partie: int, date: str) -> None:
+        """Met à jour les classements et l'index d'éligibilité après une victoire."""
+        self.leaderboard.record_victory(pseudo, temps_partie, date)
+        self.eligibility.record_victory(pseudo, telephone, temps_partie, date)
+        self.analytics.invalidate()
+
+    def _record_distribution(self, date: str, winners: list) -> None:
+        self.leaderboard.start_distribution_period(date)
+        self.eligibility.record_distribution(date, winners)
+
+    def _record_transcript(self, session, kind: str, **fields) -> None:
+        """Ajoute un enregistrement au journal des conversations, s'il est activé."""
+        if self.transcripts is not None:
+            self.transcripts.record({'type': kind, 'game': session.game_id,
+                                     'time': datetime.now().isoformat(timespec='milliseconds'), **fields})
+
+    def _record_transcript_turn(self, session, question: str, answer, source: str, ticket=None,
+                                finished_at: float = None, usage: dict = None, leak: bool = False) -> None:
+        """Enregistre un tour de la partie : la question, la réponse et son coût.
+
+        `source` vaut 'model', 'cache' ou 'victoire'. Les temps de file et de
+        génération viennent du ticket d'inférence et de `finished_at`
+        (time.perf_counter() en fin de génération), les tokens d'Ollama.
+        """
+        if self.transcripts is None:
+            return
+        fields = {
+            # Appelé après l'ajout de la réponse à l'historique, sauf pour une victoire
+            'turn': len(session.context.history) // 2 + (source == 'victoire'),
+            'elapsed': round((datetime.now() - session.start_time).total_seconds(), 3),
+            'question': question,
+            'answer': answer,
+            'source': source,
+            'leak': leak,
+            'backend': session.backend,
+        }
+        if ticket is not None:
+            fields['queue_wait'] = round(ticket.started_at - ticket.queued_at, 4)
+            fields['first_token'] = (round(ticket.first_token_at - ticket.queued_at, 4)
+                                     if ticket.first_token_at is not None else None)
+            fields['duration'] = round(finished_at - ticket.queued_at, 4)
+        if usage:
+            fields.update({key: round(value, 4) if isinstance(value, float) else value
+                           for key, value in usage.items()})
+            fields['dropped_messages'] = session.context.dropped_messages
+        self._record_transcript(session, 'turn', **fields)
+
+    async def _update_game_result(self, session, resultat: str) -> None:
+        """Met à jour le résultat et le temps de la partie dans le stockage."""
         try:
-            temps_partie = int((datetime.now() - self.start_time).total_seconds())
-            
-            # Lire tout le fichier CSV
-            rows = []
-            with open(self.output_file, 'r', newline='') as f:
-                reader = csv.reader(f)
-                header = next(reader)  # Sauvegarder l'en-tête
-                rows = list(reader)
-            
-            # Trouver et mettre à jour la dernière entrée du joueur
-            for i in reversed(range(len(rows))):
-                logger.info(f"Ligne en cours d'analyse: {rows[i]}")
-                if rows[i][1] == pseudo and rows[i][4] == 'en_cours':  # pseudo est dans colonne 1, resultat dans colonne 4
-                    logger.info(f"Mise à jour de la ligne pour {pseudo}")
-                    rows[i][4] = resultat  # Mettre à jour le résultat (indice 4)
-                    rows[i][5] = str(temps_partie)  # Mettre à jour le temps (indice 5)
-                    break
-            
-            # Réécrire le fichier CSV
-            with open(self.output_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(header)
-                writer.writerows(rows)
-                
+            temps_partie = int((datetime.now() - session.start_time).total_seconds())
+            await self.persistence.write(self.store.update_game, session.game_id, resultat, temps_partie)
+            if resultat == 'victoire':
+                self._record_victory(session.pseudo, session.telephone, temps_partie, session.start_time.isoformat())
+            else:
+                self.analytics.invalidate()
+            self._notify_change()
+            self._record_transcript(session, 'end', resultat=resultat, temps_partie=temps_partie)
+            logger.info("Partie de %s enregistrée: %s en %ss", session.pseudo, resultat, temps_partie,
+                        extra={'event': 'game_result', 'game_id': session.game_id, 'pseudo': session.pseudo,
+                               'resultat': resultat, 'temps_partie': temps_partie})
+
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour du résultat: {e}")
             raise
 
     async def handle_index(self, request):
-        return web.FileResponse('frontend/index.html')
+        return self.assets.response(request, 'index.html')
     async def handle_scores(self, request):
         """Retourne la page du leaderboard."""
-        return web.FileResponse('frontend/leaderboard.html')
+        return self.assets.response(request, 'leaderboard.html')
 
     async def handle_distribution(self, request):
         """Retourne la page de distribution des cadeaux."""
-        return web.FileResponse('frontend/distribution.html')
+        return self.assets.response(request, 'distribution.html')
 
     async def handle_game(self, request):
-        return web.FileResponse('frontend/game.html')
+        return self.assets.response(request, 'game.html')
         
     async def handle_start(self, request):
         try:
@@ -140,22 +380,26 @@ class GameServer:
             if not re.fullmatch(r'\+?\d{10,}', data['telephone']):
                 raise web.HTTPBadRequest(text='Format de téléphone invalide')
 
-            # Réinitialiser l'historique des conversations et le temps
-            self.conversation_history = []
-            self.start_time = datetime.now()
-            self.current_pseudo = data['pseudo']
+            # Libérer les sessions expirées et faire de la place si la table est pleine
+            await self._abandon_sessions(await self.sessions.purge_expired())
+            await self._abandon_sessions(await self.sessions.evict_overflow())
 
-            # Sélectionner un mot aléatoire
-            self.hidden_word = self._select_random_word('data/mots.txt')
+            # Sélectionner un mot aléatoire et créer la session du joueur
+            hidden_word = self.word_pool.choose()
+            session = await self.sessions.create(data['pseudo'], data['telephone'], hidden_word)
 
             # Sauvegarder les informations du joueur
-            now = datetime.now().isoformat()
-            with open(self.output_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([now, data['pseudo'], data['telephone'],
-                              self.hidden_word, 'en_cours', '0'])
+            session.game_id = await self.persistence.write(self.store.add_game, session.start_time.isoformat(),
+                                                           data['pseudo'], data['telephone'], hidden_word)
+            # Le joueur lit les consignes : le modèle peut préparer la partie
+            if self.speculator is not None and self.llm_pool.ready:
+                self.speculator.start(session)
+            await self.sessions.save(session)
+            self._record_game(data['pseudo'], data['telephone'], session.start_time.isoformat())
+            self._record_transcript(session, 'start', word=hidden_word, model=self.model_name, worker=self.worker)
+            self._notify_change()
 
-            return web.Response(text=json.dumps({'status': 'success'}),
+            return web.Response(text=json.dumps({'status': 'success', 'session_id': session.session_id}),
                               content_type=JSON_CONTENT_TYPE)
 
         except json.JSONDecodeError:
@@ -163,8 +407,20 @@ class GameServer:
 
     async def handle_stream(self, request):
         if request.method == 'GET':
-            # Configuration SSE
-            return await aiohttp_sse.sse_response(request)
+            # Configuration SSE : les tokens générés pour la session y sont poussés
+            session = await self._get_session(request)
+            if session is None:
+                raise web.HTTPNotFound(text='Session inconnue ou expirée')
+
+            stream = await aiohttp_sse.sse_response(request)
+            await self.sessions.attach_stream(session, stream)
+            try:
+                await stream.wait()
+            except ConnectionResetError:
+                pass
+            finally:
+                await self.sessions.detach_stream(session, stream)
+            return stream
             
         elif request.method == 'POST':
             try:
@@ -178,60 +434,25 @@ class GameServer:
                         content_type=JSON_CONTENT_TYPE
                     )
 
-                # Vérifier d'abord si le mot est dans le message
-                if self.hidden_word.lower() in message.lower():
-                    # Mettre à jour le CSV avec la victoire
-                    await self._update_game_result(self.current_pseudo, 'victoire')
+                session = await self._get_session(request, data)
+                if session is None:
                     return web.Response(
-                        text=json.dumps({"victory": True}),
+                        text=json.dumps({"error": "Session inconnue ou expirée"}),
+                        status=404,
                         content_type=JSON_CONTENT_TYPE
                     )
 
-                # Si le mot n'est pas trouvé, continuer avec le traitement normal
-                self.conversation_history.append({"role": "user", "content": message})
-                system_prompt = f"""Tu es une IA qui joue à un jeu de devinette.
-Le joueur doit deviner un mot en posant des questions.
-Le mot à deviner est '{self.hidden_word.lower()}'.
-
-Instructions:
-- Si c'est une question fermée, réponds par oui ou non
-- Si c'est une question ouverte, réponds par une phrase
-- Ne donne JAMAIS une description complète du mot
-- NE DONNE JAMAIS LE MOT EN ENTIER
-- Base ta réponse en tenant compte de l'historique des questions précédentes"""
-
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    *self.conversation_history
-                ]
-                
-                try:
-                    response = ollama.chat(
-                        model=self.model_name,
-                        messages=messages
-                    )
-                    full_response = response.message.content
-                    self.conversation_history.append({"role": "assistant", "content": full_response})
-                    
-                    return web.Response(
-                        text=json.dumps({"victory": False, "response": full_response}),
-                        content_type=JSON_CONTENT_TYPE
-                    )
-                
-                except ollama.ResponseError as e:
-                    logger.error(f"Erreur Ollama: {e}")
-                    return web.Response(
-                        text=json.dumps({"error": "Erreur de génération de réponse"}),
-                        status=500,
-                        content_type=JSON_CONTENT_TYPE
-                    )
-                except Exception as e:
-                    logger.error(f"Erreur inattendue avec Ollama: {e}")
-                    return web.Response(
-                        text=json.dumps({"error": "Erreur interne"}),
-                        status=500,
-                        content_type=JSON_CONTENT_TYPE
-                    )
+                # Une seule question à la fois par partie : les suivantes sont refusées, pas mises en file
+                if session.lock.locked():
+                    return self._question_in_progress()
+                async with session.lock:
+                    try:
+                        return await self._answer_question(session, message, request)
+                    except SessionConflict:
+                        # Question de la même partie traitée en même temps par un autre processus
+                        logger.warning("Question concurrente sur un autre processus pour %s, réponse écartée",
+                                       session.pseudo, extra={'event': 'session_conflict'})
+                        return self._question_in_progress()
 
             except json.JSONDecodeError:
                 logger.error("Erreur de décodage JSON")
@@ -248,91 +469,301 @@ Instructions:
                     content_type=JSON_CONTENT_TYPE
                 )
 
+    @staticmethod
+    def _question_in_progress():
+        return web.Response(
+            text=json.dumps({"error": "Une question est déjà en cours pour cette partie"}),
+            status=409,
+            content_type=JSON_CONTENT_TYPE
+        )
+
+    @asynccontextmanager
+    async def _cancel_on_disconnect(self, request):
+        """Annule la requête en cours si le client ferme la connexion.
+
+        Une question abandonnée libère ainsi sa place dans la file
+        d'inférence, et la génération s'arrête côté Ollama. Seules l'attente
+        et la génération sont annulables : l'enregistrement du résultat et
+        la mise à jour de la session vont toujours à leur terme.
+        """
+        task = asyncio.current_task()
+
+        async def watch():
+            while request.transport is not None and not request.transport.is_closing():
+                await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+            task.cancel()
+
+        watcher = asyncio.create_task(watch())
+        try:
+            yield
+        finally:
+            watcher.cancel()
+
+    async def _publish(self, session, event: str, payload: dict) -> None:
+        """Envoie un événement SSE au navigateur du joueur s'il est connecté."""
+        if session.event_stream is None and session.stream_worker not in (None, self.worker):
+            # Connexion SSE ouverte sur un autre processus : l'événement lui est relayé
+            self.bus.send(session.stream_worker, {'type': 'sse', 'session_id': session.session_id,
+                                                  'event': event, 'payload': payload})
+            return
+        await self._send_event(session, event, payload)
+
+    async def _send_event(self, session, event: str, payload: dict) -> None:
+        stream = session.event_stream
+        if stream is None:
+            return
+        try:
+            await stream.send(json.dumps(payload), event=event)
+        except (ConnectionResetError, RuntimeError):
+            session.event_stream = None
+
+    async def _answer_question(self, session, message: str, request):
+        """Traite une question du joueur dans le contexte de sa session."""
+        # Vérifier d'abord si le mot est dans le message
+        if session.matcher.matches(message):
+            self._record_transcript_turn(session, message, None, 'victoire')
+            # Mettre à jour le CSV avec la victoire
+            await self._update_game_result(session, 'victoire')
+            await self.sessions.remove(session.session_id)
+            return web.Response(
+                text=json.dumps({"victory": True}),
+                content_type=JSON_CONTENT_TYPE
+            )
+
+        # Si le mot n'est pas trouvé, chercher une réponse déjà connue
+        normalized = normalize_question(message)
+        first_turn = not session.context.history
+        cacheable = self.answer_cache is not None and is_cacheable(normalized, first_turn)
+        if self.speculator is not None and first_turn:
+            self.speculator.questions.record(message)
+        if cacheable:
+            cached = self.answer_cache.get(session.hidden_word, normalized)
+            if cached is not None and self.speculator is not None:
+                self.speculator.record_hit(session.hidden_word, normalized)
+            elif self.speculator is not None:
+                # Réponse peut-être en cours de précalcul : l'attendre plutôt que la regénérer
+                cached = await self.speculator.join(session.hidden_word, normalized)
+            if cached is not None:
+                session.context.add_user(message)
+                session.context.add_assistant(cached)
+                await self.sessions.save(session)
+                self._record_transcript_turn(session, message, cached, 'cache')
+                await self._publish(session, 'token', {'content': cached})
+                await self._publish(session, 'done', {'response': cached})
+                return web.Response(
+                    text=json.dumps({"victory": False, "response": cached}),
+                    content_type=JSON_CONTENT_TYPE
+                )
+
+        # Sinon, continuer avec le traitement normal
+        if self.speculator is not None:
+            self.speculator.cancel(session.session_id)
+        if not self.llm_pool.ready:
+            return web.Response(
+                text=json.dumps({"error": "Le modèle est en cours de chargement, veuillez patienter"}),
+                status=503,
+                headers={'Retry-After': str(WARMUP_RETRY_AFTER)},
+                content_type=JSON_CONTENT_TYPE
+            )
+
+        session.context.add_user(message)
+        messages = session.context.messages()
+
+        try:
+            async with self._cancel_on_disconnect(request), self.inference_queue.slot() as ticket:
+                full_response, final_chunk = await self._generate(session, messages, ticket)
+            finished_at = time.perf_counter()
+
+            turn = session.context.record_turn(final_chunk)
+            if turn:
+                self.inference_queue.stats.record_usage(turn)
+                # Un tour par question : rien n'est formaté si le niveau DEBUG est désactivé
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Tour de %s: %s tokens de prompt, %s générés, %s messages élagués",
+                                 session.pseudo, turn['prompt_tokens'], turn['generated_tokens'],
+                                 session.context.dropped_messages,
+                                 extra={'event': 'llm_turn', 'pseudo': session.pseudo,
+                                        'dropped_messages': session.context.dropped_messages, **turn})
+
+            leak = session.matcher.matches(full_response)
+            if leak:
+                self.word_leaks += 1
+                logger.warning("Le modèle a révélé le mot caché '%s' à %s", session.hidden_word, session.pseudo,
+                               extra={'event': 'word_leak', 'pseudo': session.pseudo})
+            elif cacheable and full_response.strip():
+                self.answer_cache.put(session.hidden_word, normalized, full_response)
+            session.context.add_assistant(full_response)
+            await self.sessions.save(session)
+            self._record_transcript_turn(session, message, full_response, 'model', ticket=ticket,
+                                         finished_at=finished_at, usage=turn, leak=leak)
+            await self._publish(session, 'done', {'response': full_response})
+
+            return web.Response(
+                text=json.dumps({"victory": False, "response": full_response}),
+                content_type=JSON_CONTENT_TYPE
+            )
+
+        except asyncio.CancelledError:
+            # Client déconnecté : la génération est abandonnée et la question oubliée
+            session.context.rollback_user()
+            self.metrics.llm_cancelled.inc()
+            logger.info("Question de %s annulée, client déconnecté", session.pseudo,
+                        extra={'event': 'llm_cancelled', 'pseudo': session.pseudo})
+            raise
+        except InferenceQueueFull as e:
+            # La question n'a pas été traitée : on la retire de l'historique
+            session.context.rollback_user()
+            logger.warning("File d'inférence saturée, requête refusée (Retry-After: %ss)", e.retry_after,
+                           extra={'event': 'llm_rejected', 'retry_after': e.retry_after})
+            return web.Response(
+                text=json.dumps({"error": "Serveur très sollicité, veuillez réessayer", "retry_after": e.retry_after}),
+                status=429,
+                headers={'Retry-After': str(e.retry_after)},
+                content_type=JSON_CONTENT_TYPE
+            )
+        except (NoBackendAvailable, *BACKEND_ERRORS) as e:
+            session.context.rollback_user()
+            logger.error(f"Erreur Ollama: {e}")
+            return web.Response(
+                text=json.dumps({"error": "Erreur de génération de réponse"}),
+                status=500,
+                content_type=JSON_CONTENT_TYPE
+            )
+        except SessionConflict:
+            # L'état enregistré par l'autre processus a déjà été repris
+            raise
+        except Exception as e:
+            session.context.rollback_user()
+            logger.error(f"Erreur inattendue avec Ollama: {e}")
+            return web.Response(
+                text=json.dumps({"error": "Erreur interne"}),
+                status=500,
+                content_type=JSON_CONTENT_TYPE
+            )
+
+    async def _generate(self, session, messages, ticket):
+        """Génère la réponse en streaming et retourne (texte, dernier morceau).
+
+        La partie reste sur le serveur qui a son contexte en cache. Si un
+        serveur échoue avant d'avoir envoyé un token, la génération est
+        relancée sur un autre ; après, le joueur a déjà reçu une partie de la
+        réponse et l'erreur est remontée.
+        """
+        tried = []
+        while True:
+            backend = self.llm_pool.choose(affinity=session.backend, exclude=tried)
+            if backend is None:
+                raise NoBackendAvailable(f"Aucun serveur Ollama disponible ({len(tried)} essayé(s))")
+            self.metrics.llm_backend_requests.inc(backend=backend.name)
+            chunks = []
+            try:
+                async with backend.track():
+                    stream = await backend.client.chat(
+                        model=self.model_name,
+                        messages=messages,
+                        stream=True,
+                        options=self.llm_options,
+                        keep_alive=self.keep_alive
+                    )
+                    final_chunk = None
+                    async for chunk in stream:
+                        content = chunk.message.content
+                        if content:
+                            ticket.mark_first_token()
+                            chunks.append(content)
+                            await self._publish(session, 'token', {'content': content})
+                        if chunk.done:
+                            final_chunk = chunk
+                session.backend = backend.name
+                return ''.join(chunks), final_chunk
+            except BACKEND_ERRORS as e:
+                self.llm_pool.record_failure(backend, e)
+                if chunks or not is_backend_failure(e):
+                    raise
+                tried.append(backend)
+                logger.warning("Échec du serveur %s pour %s, nouvel essai sur un autre serveur: %s",
+                               backend.name, session.pseudo, e,
+                               extra={'event': 'backend_retry', 'backend': backend.name})
+
+    async def handle_ready(self, request):
+        """Indique si le modèle est chargé et prêt à répondre."""
+        return web.Response(
+            text=json.dumps(self.llm_pool.to_dict()),
+            status=200 if self.llm_pool.ready else 503,
+            content_type=JSON_CONTENT_TYPE
+        )
+
+    async def handle_inference_stats(self, request):
+        """Retourne l'état de la file d'inférence (attente vs génération)."""
+        return web.Response(
+            text=json.dumps({
+                **self.inference_queue.to_dict(),
+                'word_leaks': self.word_leaks,
+                'answer_cache': self.answer_cache.to_dict() if self.answer_cache else None,
+                'speculation': self.speculator.to_dict() if self.speculator else None,
+                'rate_limits': self.admission.to_dict(),
+                'transcripts': self.transcripts.to_dict() if self.transcripts else None,
+            }),
+            content_type=JSON_CONTENT_TYPE
+        )
 
     async def handle_end(self, request):
         """Gère l'abandon d'une partie."""
         try:
-            if not self.current_pseudo:
+            try:
+                data = await request.json()
+            except json.JSONDecodeError:
+                data = {}
+
+            session = await self._get_session(request, data)
+            if session is None:
                 raise web.HTTPBadRequest(text='Aucune partie en cours')
-                
-            await self._update_game_result(self.current_pseudo, 'abandon')
+
+            async with session.lock:
+                await self._update_game_result(session, 'abandon')
+                await self.sessions.remove(session.session_id)
             return web.Response(text=json.dumps({'status': 'success'}),
                               content_type=JSON_CONTENT_TYPE)
-                             
+
+        except web.HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de l'abandon: {e}")
             raise web.HTTPInternalServerError(text=str(e))
 
     async def handle_leaderboard(self, request):
-        """Retourne les 10 meilleurs scores."""
-        try:
-            # Lire le fichier CSV
-            scores = []
-            with open(self.output_file, 'r', newline='') as f:
-                reader = csv.DictReader(f)
-                # Filtrer les parties gagnées et convertir les données
-                for row in reader:
-                    if row['resultat'] == 'victoire':
-                        scores.append({
-                            'pseudo': row['pseudo'],
-                            'temps': int(row['temps_partie']),
-                            'date': row['date']
-                        })
-            
-            # Trier par temps et prendre les 10 meilleurs
-            top_scores = sorted(scores, key=lambda x: x['temps'])[:10]
-            
-            # Ajouter la position
-            for i, score in enumerate(top_scores, 1):
-                score['position'] = i
-            
-            return web.Response(
-                text=json.dumps({'leaderboard': top_scores}),
-                content_type=JSON_CONTENT_TYPE
-            )
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la récupération du leaderboard: {e}")
-            raise web.HTTPInternalServerError(text=str(e))
-    async def get_recent_players(self, since_date):
-        """Récupère les joueurs qui ont joué depuis une date donnée."""
-        recent_players = []
+        """Retourne les 10 meilleurs scores (classement maintenu en mémoire).
+
+        Paramètre optionnel `window` : all (défaut), today, week ou
+        distribution (depuis la dernière distribution de cadeaux).
+        """
         try:
-            with open(self.output_file, 'r', newline='') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    row_date = datetime.fromisoformat(row['date'])
-                    if row_date >= since_date:
-                        recent_players.append(row)
-            return recent_players
-        except Exception as e:
-            logger.error(f"Erreur lors de la récupération des joueurs récents: {e}")
-            raise
+            body, etag = self.leaderboard.render(request.query.get('window', 'all'))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=body, headers=headers, content_type=JSON_CONTENT_TYPE)
 
     async def get_last_distribution(self):
         """Récupère la dernière distribution de cadeaux."""
         try:
-            if not DISTRIBUTIONS_FILE.exists():
+            last_row = await self.persistence.read(self.store.last_distribution)
+            if not last_row:
                 return None
-                
-            with open(DISTRIBUTIONS_FILE, 'r', newline='') as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header
-                rows = list(reader)
-                if not rows:
-                    return None
-                    
-                last_row = rows[-1]
-                result = {'date_distribution': last_row[0]}
-                # Chaque gagnant a deux colonnes (pseudo et téléphone)
-                for i in range(3):
-                    idx = 1 + i * 2  # Index de départ pour chaque gagnant
-                    if idx + 1 < len(last_row):  # Vérifier qu'on a bien le pseudo et le téléphone
-                        result[f'gagnant{i+1}'] = {
-                            'pseudo': last_row[idx],
-                            'telephone': last_row[idx + 1]
-                        }
-                return result
+
+            result = {'date_distribution': last_row[0]}
+            # Chaque gagnant a deux colonnes (pseudo et téléphone)
+            for i in range(3):
+                idx = 1 + i * 2  # Index de départ pour chaque gagnant
+                if idx + 1 < len(last_row):  # Vérifier qu'on a bien le pseudo et le téléphone
+                    result[f'gagnant{i+1}'] = {
+                        'pseudo': last_row[idx],
+                        'telephone': last_row[idx + 1]
+                    }
+            return result
         except Exception as e:
             logger.error(f"Erreur lors de la récupération de la dernière distribution: {e}")
             raise
@@ -340,78 +771,28 @@ Instructions:
     async def save_distribution(self, winners):
         """Enregistre une nouvelle distribution."""
         try:
+            # Enregistre la distribution et les cadeaux reçus
             now = datetime.now().isoformat()
-            
-            row = [now]  # Date de distribution
-            for winner in winners:
-                row.extend([winner['pseudo'], winner['telephone']])  # Ajouter pseudo et téléphone
-            
-            with open(DISTRIBUTIONS_FILE, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(row)
-
-            # Enregistrer les cadeaux reçus
-            with open(CADEAUX_FILE, 'a', newline='') as f:
-                writer = csv.writer(f)
-                for winner in winners:
-                    writer.writerow([winner['pseudo'], now])
-                    
+            # Refusée si une distribution a été enregistrée depuis la sélection (autre processus)
+            await self.persistence.write(self.store.add_distribution, now, winners, self.eligibility.since)
+            self._record_distribution(now, winners)
+            self._notify_change()
+
+        except DistributionConflict:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de l'enregistrement de la distribution: {e}")
             raise
 
     async def select_distribution_winners(self):
-        """Sélectionne les gagnants pour la distribution."""
+        """Sélectionne les gagnants pour la distribution.
+
+        Les meilleurs temps depuis la dernière distribution passent d'abord,
+        complétés par des joueurs récents puis d'anciens joueurs sans cadeau
+        tirés au sort. L'index d'éligibilité évite de relire l'historique.
+        """
         try:
-            # 1. Obtenir la dernière distribution
-            last_dist = await self.get_last_distribution()
-            last_dist_date = datetime.fromisoformat(last_dist['date_distribution']) if last_dist else datetime.min
-            
-            # 2. Récupérer les joueurs récents
-            recent_players = await self.get_recent_players(last_dist_date)
-            
-            # 3. Sélectionner les gagnants
-            winners_info = []
-            
-            # D'abord les victoires, triées par temps
-            victoires = sorted(
-                [p for p in recent_players if p['resultat'] == 'victoire'],
-                key=lambda x: int(x['temps_partie'])
-            )
-            winners_info.extend([{'pseudo': p['pseudo'], 'telephone': p['telephone']} for p in victoires[:3]])
-            
-            # Si pas assez de gagnants, ajouter des perdants aléatoires
-            if len(winners_info) < 3:
-                import random
-                perdants = [{'pseudo': p['pseudo'], 'telephone': p['telephone']}
-                          for p in recent_players
-                          if p['pseudo'] not in [w['pseudo'] for w in winners_info]]
-                if perdants:
-                    winners_info.extend(random.sample(perdants, min(3 - len(winners_info), len(perdants))))
-            
-            # Si toujours pas assez, prendre des anciens joueurs sans cadeau
-            if len(winners_info) < 3:
-                # Charger les joueurs qui ont déjà reçu un cadeau
-                cadeaux_file = Path('data/cadeaux_recus.csv')
-                recus = set()
-                if cadeaux_file.exists():
-                    with open(cadeaux_file, 'r', newline='') as f:
-                        reader = csv.DictReader(f)
-                        recus = {row['pseudo'] for row in reader}
-                
-                # Charger tous les joueurs qui n'ont pas encore reçu de cadeau
-                with open(self.output_file, 'r', newline='') as f:
-                    reader = csv.DictReader(f)
-                    anciens = [{'pseudo': row['pseudo'], 'telephone': row['telephone']}
-                             for row in reader
-                             if row['pseudo'] not in recus and
-                                row['pseudo'] not in [w['pseudo'] for w in winners_info]]
-                
-                if anciens:
-                    winners_info.extend(random.sample(anciens, min(3 - len(winners_info), len(anciens))))
-            
-            return winners_info[:3]  # Assure qu'on ne retourne que 3 gagnants maximum
-            
+            return self.eligibility.select_winners()
         except Exception as e:
             logger.error(f"Erreur lors de la sélection des gagnants: {e}")
             raise
@@ -454,11 +835,16 @@ Instructions:
     async def handle_distribution_start(self, request):
         """Déclenche une nouvelle distribution de cadeaux."""
         try:
-            winners = await self.select_distribution_winners()
-            if len(winners) < 3:
-                raise web.HTTPBadRequest(text="Pas assez de joueurs éligibles pour la distribution")
-                
-            await self.save_distribution(winners)
+            # Deux distributions simultanées tireraient les mêmes gagnants
+            async with self._distribution_lock:
+                if self.changes is not None:
+                    # Parties et distributions des autres processus
+                    await self.changes.catch_up()
+                winners = await self.select_distribution_winners()
+                if len(winners) < 3:
+                    raise web.HTTPBadRequest(text="Pas assez de joueurs éligibles pour la distribution")
+
+                await self.save_distribution(winners)
             
             return web.Response(
                 text=json.dumps({'winners': winners}),
@@ -466,6 +852,8 @@ Instructions:
             )
         except web.HTTPBadRequest as e:
             raise
+        except DistributionConflict:
+            raise web.HTTPConflict(text="Une distribution vient d'être enregistrée, veuillez recharger la page")
         except Exception as e:
             logger.error(f"Erreur lors du démarrage de la distribution: {e}")
             raise web.HTTPInternalServerError(text=str(e))
@@ -479,7 +867,8 @@ Instructions:
             if not password:
                 raise web.HTTPBadRequest(text="Mot de passe requis")
                 
-            if password == self.admin_password:
+            # Comparaison en temps constant : la durée ne renseigne pas sur le mot de passe
+            if hmac.compare_digest(str(password).encode('utf-8'), self.admin_password.encode('utf-8')):
                 return web.Response(
                     text=json.dumps({'success': True}),
                     content_type=JSON_CONTENT_TYPE
@@ -489,42 +878,113 @@ Instructions:
                 
         except json.JSONDecodeError:
             raise web.HTTPBadRequest(text="Format JSON invalide")
+        except web.HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la vérification du mot de passe: {e}")
             raise web.HTTPInternalServerError(text=str(e))
 
+    def _check_admin(self, request) -> None:
+        """Vérifie le mot de passe admin transmis dans l'en-tête X-Admin-Password."""
+        password = request.headers.get('X-Admin-Password', '')
+        if not password:
+            raise web.HTTPUnauthorized(text="Mot de passe requis")
+        if not hmac.compare_digest(password.encode('utf-8'), self.admin_password.encode('utf-8')):
+            raise web.HTTPUnauthorized(text="Mot de passe incorrect")
+
+    async def handle_admin_analytics(self, request):
+        """Taux de victoire, taux d'abandon et temps moyens par mot caché.
+
+        Le calcul n'est refait que si des parties ont commencé ou se sont
+        terminées depuis la dernière requête ; l'ETag permet au client de
+        revalider sans recevoir de nouveau le corps.
+        """
+        self._check_admin(request)
+        try:
+            body, etag = await self.analytics.render()
+        except Exception as e:
+            logger.error(f"Erreur lors du calcul des statistiques: {e}")
+            raise web.HTTPInternalServerError(text=str(e))
+
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=body, headers=headers, content_type=JSON_CONTENT_TYPE)
+
+    async def handle_admin_export(self, request):
+        """Exporte les parties en flux, au format CSV (par défaut) ou NDJSON.
+
+        Filtres optionnels : `since` (inclus) et `until` (exclu), dates ISO
+        éventuellement partielles ("2024-06"), `resultat` et `mot`. Les
+        parties sont lues et envoyées par pages : la mémoire utilisée ne
+        dépend pas du nombre de parties exportées.
+        """
+        self._check_admin(request)
+        export_format = request.query.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise web.HTTPBadRequest(text=f"Format inconnu, formats disponibles : {', '.join(EXPORT_FORMATS)}")
+        resultat = request.query.get('resultat')
+        if resultat is not None and resultat not in RESULTATS:
+            raise web.HTTPBadRequest(text=f"Résultat inconnu, valeurs possibles : {', '.join(RESULTATS)}")
+        content_type, extension = EXPORT_FORMATS[export_format]
+        encode = encode_csv if export_format == 'csv' else encode_ndjson
+
+        # Générateur : chaque page n'est lue qu'à sa demande, hors de la boucle d'événements
+        pages = self.store.games_pages(request.query.get('since'), request.query.get('until'), resultat,
+                                       request.query.get('mot'), EXPORT_PAGE_SIZE)
+        response = web.StreamResponse(headers={
+            'Content-Type': f'{content_type}; charset=utf-8',
+            'Content-Disposition': f'attachment; filename="parties.{extension}"',
+            'Cache-Control': 'no-store',
+        })
+        response.enable_chunked_encoding()
+        try:
+            await response.prepare(request)
+            # En-tête CSV envoyé même si aucune partie ne correspond
+            first = True
+            while True:
+                page = await self.persistence.read(next_page, pages)
+                if page is None:
+                    if first:
+                        await response.write(encode([], header=True))
+                    break
+                await response.write(encode(page, header=first))
+                first = False
+            await response.write_eof()
+        except ConnectionResetError:
+            # Le client a abandonné le téléchargement
+            pass
+        finally:
+            try:
+                pages.close()
+            except ValueError:
+                # Page encore en cours de lecture (requête annulée) : fermé par le ramasse-miettes
+                pass
+        return response
+
     async def handle_distribution_history(self, request):
-        """Retourne l'historique des distributions avec pagination."""
+        """Retourne l'historique des distributions, de la plus récente à la plus ancienne.
+
+        Pagination par numéro de page (`page`, `per_page`) ou par curseur :
+        `before=<date>` retourne les distributions antérieures à cette date, et
+        `next_before` dans la réponse donne le curseur de la page suivante.
+        """
         try:
             # Récupérer les paramètres de pagination
             page = int(request.query.get('page', '1'))
             per_page = int(request.query.get('per_page', '10'))
+            before = request.query.get('before')
+            if before is not None:
+                datetime.fromisoformat(before)
             
             # Vérifier la validité des paramètres
             if page < 1 or per_page < 1:
                 raise web.HTTPBadRequest(text="Les paramètres de pagination doivent être positifs")
             
-            if not DISTRIBUTIONS_FILE.exists():
-                return web.Response(
-                    text=json.dumps({'distributions': [], 'total': 0, 'page': page, 'per_page': per_page}),
-                    content_type=JSON_CONTENT_TYPE
-                )
-            
-            # Lire toutes les distributions
-            rows = []
-            with open(DISTRIBUTIONS_FILE, 'r', newline='') as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header
-                rows = list(reader)
-            
-            # Trier par date décroissante
-            rows.sort(reverse=True)  # Supposant que la date est en première colonne
-            
-            # Calculer la pagination
-            total = len(rows)
-            start_idx = (page - 1) * per_page
-            end_idx = start_idx + per_page
-            page_rows = rows[start_idx:end_idx]
+            # Seules les lignes de la page demandée sont lues
+            total = await self.persistence.read(self.store.count_distributions)
+            page_rows = await self.persistence.read(self.store.distributions_page, per_page,
+                                                    (page - 1) * per_page, before)
             
             # Formater les résultats
             distributions = []
@@ -548,26 +1008,153 @@ Instructions:
                     'distributions': distributions,
                     'total': total,
                     'page': page,
-                    'per_page': per_page
+                    'per_page': per_page,
+                    'next_before': page_rows[-1][0] if len(page_rows) == per_page else None
                 }),
                 content_type=JSON_CONTENT_TYPE
             )
             
+        except web.HTTPBadRequest:
+            raise
         except ValueError as e:
             raise web.HTTPBadRequest(text="Paramètres de pagination invalides")
         except Exception as e:
             logger.error(f"Erreur lors de la récupération de l'historique: {e}")
             raise web.HTTPInternalServerError(text=str(e))
 
+def parse_keep_alive(value: str):
+    """Accepte une durée Ollama ("30m") ou un nombre de secondes (-1 = indéfiniment)."""
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def create_server(args, worker: int = None, runtime_dir: str = None) -> GameServer:
+    return GameServer(args.words_file, args.output, args.model, args.password,
+                      session_timeout=args.session_timeout, max_sessions=args.max_sessions,
+                      llm_concurrency=args.llm_concurrency, llm_queue_size=args.llm_queue_size,
+                      store=args.store, database=args.database, word_policy=args.word_policy,
+                      num_ctx=args.num_ctx, keep_alive=args.keep_alive, skip_pull=args.skip_pull,
+                      answer_cache_size=args.answer_cache_size, answer_cache_ttl=args.answer_cache_ttl,
+                      answer_cache_file=args.answer_cache_file, ollama_hosts=args.ollama_hosts,
+                      worker=worker, workers=args.workers, runtime_dir=runtime_dir,
+                      speculate=args.speculate, speculative_questions=args.speculative_questions,
+                      opening_questions_file=args.opening_questions_file,
+                      rate_limits={LLM: args.rate_limit_client_questions, AUTH: args.rate_limit_auth,
+                                   ADMIN: args.rate_limit_admin, DEFAULT: args.rate_limit_requests},
+                      session_question_rate=args.rate_limit_questions, trust_forwarded=args.trust_forwarded_for,
+                      transcripts_dir=args.transcripts_dir)
+
+
+def run_worker(worker: int, runtime_dir: str, args) -> None:
+    """Processus de travail : même port que les autres, le noyau répartit les connexions."""
+    configure_logging(args.log_level, args.log_format)
+    game_server = create_server(args, worker=worker, runtime_dir=runtime_dir)
+    web.run_app(game_server.app, host='localhost', port=8080, reuse_port=True, print=None)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Serveur de jeu de devinette')
     parser.add_argument('--words-file', required=True, help='Fichier contenant la liste des mots à deviner')
     parser.add_argument('--output', required=True, help='Fichier CSV pour les résultats')
     parser.add_argument('--password', required=True, help='Mot de passe admin pour la page de distribution')
     parser.add_argument('--model', default='llama3.2:3b', help='Nom du modèle LLM à utiliser (par défaut: llama3.2:3b)')
+    parser.add_argument('--session-timeout', type=float, default=1800,
+                        help='Durée d\'inactivité (s) avant expiration d\'une partie (par défaut: 1800)')
+    parser.add_argument('--max-sessions', type=int, default=500,
+                        help='Nombre maximal de parties simultanées en mémoire (par défaut: 500)')
+    parser.add_argument('--llm-concurrency', type=int, default=1,
+                        help='Générations simultanées par serveur Ollama, à aligner sur OLLAMA_NUM_PARALLEL (par défaut: 1)')
+    parser.add_argument('--llm-queue-size', type=int, default=8,
+                        help='Requêtes en attente avant de répondre 429 (par défaut: 8)')
+    parser.add_argument('--num-ctx', type=int, default=2048,
+                        help='Taille du contexte du modèle en tokens ; l\'historique est élagué au-delà (par défaut: 2048)')
+    parser.add_argument('--keep-alive', type=parse_keep_alive, default=-1,
+                        help='Durée pendant laquelle Ollama garde le modèle chargé, ex. 30m ; '
+                             '-1 le garde indéfiniment (par défaut: -1)')
+    parser.add_argument('--ollama-host', action='append', dest='ollama_hosts', metavar='HOTE[=POIDS]',
+                        help='Serveur Ollama à utiliser, répétable pour répartir la charge, ex. '
+                             'http://gpu1:11434=2 (par défaut: OLLAMA_HOST ou localhost:11434)')
+    parser.add_argument('--skip-pull', action='store_true',
+                        help='Ne pas vérifier ni télécharger le modèle (déploiement hors ligne)')
+    parser.add_argument('--answer-cache-size', type=int, default=0,
+                        help='Nombre de réponses gardées en cache par mot et question (par défaut: 0, désactivé)')
+    parser.add_argument('--answer-cache-ttl', type=float, default=86400,
+                        help='Durée de vie (s) d\'une réponse générée en cache, 0 pour illimitée ; les réponses '
+                             'précalculées n\'expirent pas (par défaut: 86400)')
+    parser.add_argument('--answer-cache-file',
+                        help='Réponses précalculées par seed_answer_cache.py à charger au démarrage')
+    parser.add_argument('--speculate', action='store_true',
+                        help='Au début de chaque partie, préchauffer le modèle et précalculer les réponses '
+                             'aux questions d\'ouverture fréquentes quand il est inoccupé')
+    parser.add_argument('--speculative-questions', type=int, default=3,
+                        help='Questions d\'ouverture précalculées par partie avec --speculate ; '
+                             'nécessite le cache de réponses (par défaut: 3)')
+    parser.add_argument('--opening-questions-file', default='data/questions_frequentes.txt',
+                        help='Questions d\'ouverture initiales pour --speculate, complétées par les premières '
+                             'questions des joueurs (par défaut: data/questions_frequentes.txt)')
+    parser.add_argument('--rate-limit-questions', type=parse_rate, default='12/min:4', metavar='N/PERIODE[:RAFALE]',
+                        help='Questions au modèle par partie, ex. 12/min:4 (rafale de 4) ; 0 pour ne pas limiter '
+                             '(par défaut: 12/min:4)')
+    parser.add_argument('--rate-limit-client-questions', type=parse_rate, default='30/min:10',
+                        metavar='N/PERIODE[:RAFALE]',
+                        help='Questions au modèle par adresse de client, toutes parties confondues (par défaut: 30/min:10)')
+    parser.add_argument('--rate-limit-auth', type=parse_rate, default='10/min:5', metavar='N/PERIODE[:RAFALE]',
+                        help='Vérifications du mot de passe par adresse (POST /distribution/verify) (par défaut: 10/min:5)')
+    parser.add_argument('--rate-limit-admin', type=parse_rate, default='30/min:10', metavar='N/PERIODE[:RAFALE]',
+                        help='Requêtes par adresse sur les routes d\'administration /admin/* (par défaut: 30/min:10)')
+    parser.add_argument('--rate-limit-requests', type=parse_rate, default='20/s:60', metavar='N/PERIODE[:RAFALE]',
+                        help='Autres requêtes par adresse, hors fichiers statiques (par défaut: 20/s:60)')
+    parser.add_argument('--trust-forwarded-for', action='store_true',
+                        help='Identifier le client par l\'en-tête X-Forwarded-For (serveur derrière un proxy local) ; '
+                             'sans cette option, les clients locaux partagent le budget des mots de passe '
+                             'et ne sont pas limités par adresse sur les autres routes')
+    parser.add_argument('--transcripts-dir',
+                        help='Répertoire du journal des conversations (segments NDJSON compressés), '
+                             'relu par benchmarks/replay.py (par défaut: désactivé)')
+    parser.add_argument('--word-policy', choices=['random', 'no_repeat', 'weighted'], default='random',
+                        help='Sélection des mots : aléatoire, sans répétition ou pondérée par difficulté (par défaut: random)')
+    parser.add_argument('--store', choices=['csv', 'sqlite'], default='sqlite',
+                        help='Stockage des résultats : base SQLite, ou fichiers CSV réécrits à chaque résultat '
+                             '(par défaut: sqlite ; une base absente est créée à partir des CSV existants)')
+    parser.add_argument('--database', help='Base SQLite (par défaut: fichier --output avec l\'extension .db)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processus servant le même port ; au-delà de 1, l\'état est partagé '
+                             'par la base SQLite et --store sqlite est requis. Au plus --llm-concurrency '
+                             '× serveurs Ollama (par défaut: 1)')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Niveau des journaux ; WARNING désactive aussi le journal des accès (par défaut: INFO)')
+    parser.add_argument('--log-format', choices=['text', 'json'], default='text',
+                        help='Journaux lisibles ou JSON structuré, une ligne par événement (par défaut: text)')
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('--workers doit être au moins 1')
+    if args.speculate and args.speculative_questions > 0 and args.answer_cache_size <= 0:
+        parser.error('--speculative-questions nécessite --answer-cache-size : les réponses précalculées y sont rangées')
+    if args.workers > 1 and args.store != 'sqlite':
+        parser.error('--workers au-delà de 1 nécessite --store sqlite (état partagé entre processus)')
+    # Chaque processus a au moins une place de génération : au-delà, Ollama en recevrait plus que configuré
+    llm_slots = args.llm_concurrency * len(args.ollama_hosts or [None])
+    if args.workers > llm_slots:
+        parser.error(f'--workers ({args.workers}) ne peut dépasser les générations simultanées '
+                     f'(--llm-concurrency × serveurs Ollama = {llm_slots})')
+    configure_logging(args.log_level, args.log_format)
+    if args.store == 'sqlite':
+        # Passage d'une installation en CSV au stockage SQLite, avant le démarrage des processus
+        database = Path(args.database) if args.database else Path(args.output).with_suffix('.db')
+        counts = import_csv_history(database, Path(args.output), DISTRIBUTIONS_FILE, CADEAUX_FILE)
+        if counts:
+            logger.info("Historique CSV importé dans %s : %s parties, %s distributions, %s cadeaux "
+                        "(les fichiers CSV ne sont plus mis à jour)", database, counts['games'],
+                        counts['distributions'], counts['cadeaux'])
+
+    if args.workers > 1:
+        logger.info("Démarrage de %s processus de travail...", args.workers)
+        run_workers(args.workers, run_worker, args)
+        return
 
-    game_server = GameServer(args.words_file, args.output, args.model, args.password)
+    game_server = create_server(args)
     logger.info("Démarrage du serveur...")
     web.run_app(game_server.app, host='localhost', port=8080)
 
@@ -0,0 +1,142 @@
+"""Détection du mot caché dans un texte (message du joueur ou réponse du modèle)."""
+import re
+import unicodedata
+
+# Ligatures et lettres sans décomposition Unicode
+_SPECIAL_FOLDS = {'œ': 'oe', 'Œ': 'oe', 'æ': 'ae', 'Æ': 'ae', 'ß': 'ss',
+                  'ø': 'o', 'Ø': 'o', 'đ': 'd', 'Đ': 'd', 'ł': 'l', 'Ł': 'l',
+                  '’': "'", '‘': "'", 'ʼ': "'"}
+
+
+def _build_fold_table() -> dict:
+    """Table de translittération des lettres latines accentuées vers l'ASCII."""
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        decomposed = unicodedata.normalize('NFKD', char)
+        stripped = ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+        if stripped != char:
+            table[code] = stripped
+    for char, replacement in _SPECIAL_FOLDS.items():
+        table[ord(char)] = replacement
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+def fold(text: str) -> str:
+    """Met un texte en minuscules sans accents ("Fenêtre" -> "fenetre")."""
+    folded = text.lower().translate(_FOLD_TABLE)
+    if folded.isascii():
+        return folded
+    # Caractères hors de la table (autres alphabets, accents combinants)
+    decomposed = unicodedata.normalize('NFKD', folded)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+# Formes féminines des noms d'agent, appliquées uniquement aux mots d'au moins
+# 5 lettres pour éviter les faux positifs du type "mer" -> "mere". Toutes les
+# règles qui correspondent sont appliquées : "chanteur" donne "chantrice" et
+# "chanteuse", dont une seule existe, mais les deux sont acceptées.
+_FEMININE_SUFFIXES = (('teur', 'trice'), ('eur', 'euse'), ('ien', 'ienne'), ('er', 'ere'),
+                      ('ant', 'ante'), ('ent', 'ente'), ('if', 'ive'))
+# Noms courants qui ont ces suffixes sans être des noms d'agent : pas de féminin
+_NOT_AGENT_NOUNS = frozenset({
+    'fleur', 'coeur', 'couleur', 'odeur', 'chaleur', 'douleur', 'humeur', 'moteur', 'ordinateur',
+    'aspirateur', 'radiateur', 'refrigerateur', 'ventilateur', 'ascenseur', 'tracteur', 'secteur',
+    'cahier', 'escalier', 'papier', 'panier', 'clavier', 'tablier', 'collier', 'soulier', 'sablier',
+    'cendrier', 'saladier', 'dossier', 'quartier', 'sentier', 'atelier', 'grenier', 'calendrier',
+    'pommier', 'cerisier', 'palmier', 'poirier', 'rosier', 'plancher', 'rocher', 'clocher',
+    'verger', 'hiver', 'diner', 'dejeuner', 'cancer',
+    'restaurant', 'diamant', 'aimant', 'croissant', 'volant', 'carburant', 'instant', 'enfant',
+    'serpent', 'argent', 'accident', 'continent', 'talent',
+    'canif', 'recif', 'tarif', 'motif', 'objectif',
+})
+# Terminaisons en -s d'un mot singulier : "tapis", "tennis", "ananas", "cactus"
+_SINGULAR_S_ENDINGS = ('as', 'is', 'os', 'us', 'ys', 'ss')
+# Mots de liaison d'une expression : seul le premier mot s'accorde ("pommes de terre")
+_LINKING_WORDS = frozenset({'a', 'au', 'aux', 'de', 'des', 'du', 'en', 'la', 'le', 'les'})
+
+
+def _plural(word: str) -> set:
+    if word.endswith(('s', 'x', 'z')):
+        return set()
+    if word.endswith('al'):
+        return {word[:-2] + 'aux'}
+    if word.endswith('ail'):
+        return {word + 's', word[:-3] + 'aux'}
+    if word.endswith(('eau', 'au', 'eu')):
+        return {word + 'x', word + 's'}
+    return {word + 's'}
+
+
+def _singular(word: str) -> set:
+    """Singulier d'un mot au pluriel ("ciseaux", "lunettes") ; rien pour un singulier."""
+    if word.endswith('aux') and len(word) > 4:
+        return {word[:-3] + 'al', word[:-1]}
+    if word.endswith(('eux', 'oux')) and len(word) > 4:
+        return {word[:-1]}
+    if word.endswith('s') and len(word) > 3 and not word.endswith(_SINGULAR_S_ENDINGS):
+        return {word[:-1]}
+    return set()
+
+
+def _feminine(word: str) -> set:
+    if len(word) < 5 or word in _NOT_AGENT_NOUNS or word.endswith('ment'):
+        return set()
+    return {word[:-len(suffix)] + feminine
+            for suffix, feminine in _FEMININE_SUFFIXES if word.endswith(suffix)}
+
+
+def _number_forms(word: str) -> set:
+    forms = {word} | _singular(word)
+    for form in list(forms):
+        forms |= _plural(form)
+    return forms
+
+
+def _word_forms(word: str) -> set:
+    forms = {word} | _singular(word)
+    for form in list(forms):
+        forms |= _feminine(form)
+    for form in list(forms):
+        forms |= _plural(form)
+    return forms
+
+
+def inflections(word: str) -> set:
+    """Formes acceptées pour un mot : singulier/pluriel et masculin/féminin simples.
+
+    Dans une expression, seul le nombre varie : celui du premier mot quand
+    un mot de liaison suit ("pomme(s) de terre"), sinon celui du premier et
+    du dernier ("grand(s)-pere(s)").
+    """
+    word = fold(word.strip())
+    pieces = re.split(r'([\s\-]+)', word)
+    if len(pieces) == 1:
+        return _word_forms(word)
+    head, middle, last = pieces[0], ''.join(pieces[1:-1]), pieces[-1]
+    if _LINKING_WORDS.intersection(pieces[2::2]) or "'" in word:
+        return {form + ''.join(pieces[1:]) for form in _number_forms(head)}
+    return {first + middle + second for first in _number_forms(head) for second in _number_forms(last)}
+
+
+class WordMatcher:
+    """Expression compilée une fois par partie pour reconnaître le mot caché.
+
+    La recherche se fait sur le texte normalisé (minuscules, sans accents) et
+    respecte les frontières de mots : "art" ne reconnaît pas "partie". Les
+    mots composés acceptent espace, tiret ou rien ("grand-père", "grand pere").
+    """
+
+    def __init__(self, word: str):
+        self.word = word
+        alternatives = sorted(inflections(word), key=len, reverse=True)
+        parts = [r'[\s\-]*'.join(re.escape(piece) for piece in re.split(r'[\s\-]+', form))
+                 for form in alternatives]
+        self._pattern = re.compile(r'(?<!\w)(?:' + '|'.join(parts) + r')(?!\w)')
+
+    def matches(self, text: str) -> bool:
+        """Indique si le texte contient le mot caché ou une de ses formes."""
+        return self._pattern.search(fold(text)) is not None
@@ -0,0 +1,252 @@
+"""Métriques au format texte Prometheus, exposées sur GET /metrics.
+
+Implémentation minimale (compteurs, jauges, histogrammes avec étiquettes),
+sans dépendance supplémentaire. Les mesures du stockage arrivent depuis les
+threads de persistance : les mises à jour sont protégées par un verrou.
+
+Avec plusieurs processus de travail, chaque échantillon porte l'étiquette
+`worker`, et le processus qui répond à la collecte y joint les derniers
+échantillons des autres (voir `MetricsSnapshots` dans cluster.py) : chaque
+série reste croissante quel que soit le processus interrogé.
+"""
+import asyncio
+import bisect
+import threading
+import time
+
+from aiohttp import web
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bornes en secondes : des requêtes statiques (ms) aux générations LLM (dizaines de s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, *extra: str) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(label for label in extra if label)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, '') for name in self.label_names)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self, extra: str = '') -> list:
+        """Lignes des échantillons ; `extra` est une étiquette ajoutée à chacun (`worker="0"`)."""
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key, extra)} {_format_value(value)}"
+                for key, value in values]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Jauge mise à jour par le code, ou lue à chaque collecte si `function` est fournie."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), function=None):
+        super().__init__(name, documentation, labels)
+        self.function = function
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self, extra: str = '') -> list:
+        if self.function is not None:
+            return [f"{self.name}{_format_labels((), (), extra)} {_format_value(self.function())}"]
+        return super().samples(extra)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Comptes par intervalle (cumulés à la collecte), somme, total
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self, extra: str = '') -> list:
+        lines = []
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, extra, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key, extra)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def samples(self, extra: str = '') -> dict:
+        """Échantillons de chaque métrique, par nom."""
+        return {metric.name: metric.samples(extra) for metric in self._metrics}
+
+    def render(self, extra: str = '', peers=()) -> str:
+        """Texte de collecte ; `peers` : échantillons des autres processus (voir `samples`)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples(extra))
+            for peer in peers:
+                lines.extend(peer.get(metric.name, ()))
+        return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """Métriques du serveur de jeu : HTTP, inférence LLM et stockage."""
+
+    def __init__(self, worker: int = None):
+        self.registry = Registry()
+        # Étiquette des échantillons quand plusieurs processus servent le même port
+        self.worker_label = f'worker="{worker}"' if worker is not None else ''
+        # Coroutine retournant les échantillons des autres processus (voir `Registry.render`)
+        self.peers = None
+        register = self.registry.register
+        self.http_requests = register(Counter(
+            'http_requests_total', 'Requêtes HTTP traitées', ('method', 'route', 'status')))
+        self.http_duration = register(Histogram(
+            'http_request_duration_seconds', 'Durée de traitement des requêtes HTTP', ('method', 'route')))
+        self.http_in_flight = register(Gauge(
+            'http_requests_in_flight', 'Requêtes HTTP en cours de traitement'))
+        self.http_rate_limited = register(Counter(
+            'http_requests_rate_limited_total', 'Requêtes refusées par la limitation de débit', ('budget',)))
+
+        self.llm_queue_wait = register(Histogram(
+            'llm_queue_wait_seconds', "Attente d'une place dans la file d'inférence"))
+        self.llm_first_token = register(Histogram(
+            'llm_time_to_first_token_seconds', 'Délai entre la mise en file et le premier token'))
+        self.llm_generation = register(Histogram(
+            'llm_generation_seconds', "Durée d'une génération, de la place obtenue au dernier token"))
+        self.llm_tokens_per_second = register(Histogram(
+            'llm_tokens_per_second', "Vitesse de génération rapportée par Ollama (eval_count / eval_duration)",
+            buckets=TOKENS_PER_SECOND_BUCKETS))
+        self.llm_prompt_tokens = register(Counter(
+            'llm_prompt_tokens_total', 'Tokens de prompt évalués par Ollama'))
+        self.llm_generated_tokens = register(Counter(
+            'llm_generated_tokens_total', 'Tokens générés par Ollama'))
+        self.llm_rejected = register(Counter(
+            'llm_requests_rejected_total', "Questions refusées car la file d'inférence était pleine"))
+        self.llm_cancelled = register(Counter(
+            'llm_requests_cancelled_total', 'Questions abandonnées car le client s\'est déconnecté'))
+        self.llm_backend_requests = register(Counter(
+            'llm_backend_requests_total', 'Générations envoyées à chaque serveur Ollama', ('backend',)))
+        self.llm_backend_failures = register(Counter(
+            'llm_backend_failures_total', 'Erreurs de chaque serveur Ollama', ('backend',)))
+        self.llm_backend_health_check = register(Histogram(
+            'llm_backend_health_check_seconds', 'Durée des vérifications de disponibilité', ('backend',)))
+        self.llm_speculation = register(Counter(
+            'llm_speculation_total', 'Travail spéculatif en début de partie, par résultat', ('outcome',)))
+
+        self.storage_duration = register(Histogram(
+            'storage_operation_seconds', 'Durée des opérations de stockage', ('operation',)))
+        self.storage_commit = register(Histogram(
+            'storage_commit_seconds', "Durée d'un commit (fsync compris)"))
+        self.storage_batch_size = register(Histogram(
+            'storage_batch_size', 'Opérations regroupées dans un même lot', buckets=BATCH_SIZE_BUCKETS))
+
+    def gauge(self, name: str, documentation: str, function) -> Gauge:
+        """Ajoute une jauge dont la valeur est lue à chaque collecte."""
+        return self.registry.register(Gauge(name, documentation, function=function))
+
+    def samples(self) -> dict:
+        return self.registry.samples(self.worker_label)
+
+    async def render(self) -> str:
+        peers = await self.peers() if self.peers is not None else ()
+        return self.registry.render(self.worker_label, peers)
+
+    def middleware(self):
+        """Middleware aiohttp mesurant chaque requête par route et code de retour."""
+
+        @web.middleware
+        async def metrics_middleware(request, handler):
+            # Route déclarée plutôt que chemin réel : cardinalité bornée
+            resource = request.match_info.route.resource
+            route = resource.canonical if resource is not None else 'unmatched'
+            started_at = time.perf_counter()
+            status = 500
+            self.http_in_flight.inc()
+            try:
+                response = await handler(request)
+                status = response.status
+                return response
+            except web.HTTPException as e:
+                status = e.status
+                raise
+            except asyncio.CancelledError:
+                # Client déconnecté avant la réponse (convention nginx)
+                status = 499
+                raise
+            finally:
+                self.http_in_flight.dec()
+                self.http_requests.inc(method=request.method, route=route, status=status)
+                self.http_duration.observe(time.perf_counter() - started_at, method=request.method, route=route)
+
+        return metrics_middleware
+
+    async def handle_metrics(self, request):
+        return web.Response(body=(await self.render()).encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Migration ponctuelle des fichiers CSV historiques vers la base SQLite.
+
+Exemples :
+    python backend/migrate_to_sqlite.py import --database data/game_results.db \
+        --results data/game_results.csv --distributions data/distributions.csv \
+        --cadeaux data/cadeaux_recus.csv
+    python backend/migrate_to_sqlite.py export --database data/game_results.db \
+        --results export/game_results.csv
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from storage import SqliteResultsStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import/export CSV de la base de résultats SQLite')
+    parser.add_argument('action', choices=['import', 'export'], help='Sens de la conversion')
+    parser.add_argument('--database', required=True, help='Fichier de base SQLite')
+    parser.add_argument('--results', help='Fichier CSV des résultats de parties')
+    parser.add_argument('--distributions', help='Fichier CSV des distributions de cadeaux')
+    parser.add_argument('--cadeaux', help='Fichier CSV des cadeaux reçus')
+    args = parser.parse_args()
+
+    store = SqliteResultsStore(Path(args.database))
+    if args.action == 'import':
+        # Migration ponctuelle : ne jamais dupliquer un historique déjà importé
+        already = store.conn.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+        if already:
+            logger.error(f"La base {args.database} contient déjà {already} parties, import annulé")
+            store.close()
+            sys.exit(1)
+        counts = store.import_csv(args.results, args.distributions, args.cadeaux)
+        logger.info(f"Import terminé : {counts['games']} parties, {counts['distributions']} distributions, "
+                    f"{counts['cadeaux']} cadeaux")
+    else:
+        store.export_csv(args.results, args.distributions, args.cadeaux)
+        logger.info("Export terminé")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Écrivain unique du stockage, alimenté par une file asyncio.
+
+Aucun handler ne touche le disque depuis la boucle d'événements : les
+écritures sont mises en file, exécutées par lots dans un thread dédié et
+validées ensemble par un seul commit (fsync). Les lectures s'exécutent hors
+de la boucle, sur l'état validé.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_WRITE = 'write'
+_READ = 'read'
+
+
+class PersistenceWriter:
+    """Sérialise les accès au stockage et regroupe les commits.
+
+    Tant qu'un lot est en cours d'écriture, les nouvelles opérations
+    s'accumulent dans la file et forment le lot suivant : plus le trafic est
+    élevé, plus les commits sont groupés.
+    """
+
+    def __init__(self, store, max_batch: int = 128, read_workers: int = 4, metrics=None):
+        self.store = store
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self.last_commit_seconds = 0.0
+        self._queue = asyncio.Queue()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='persistence-writer')
+        self._readers = (ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='persistence-reader')
+                         if store.concurrent_reads else None)
+        self._task = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Termine les opérations en attente puis ferme le stockage."""
+        if self._task:
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, self.store.close)
+        self._writer.shutdown(wait=True)
+        if self._readers:
+            self._readers.shutdown(wait=True)
+
+    async def write(self, fn, *args):
+        """Met en file une écriture et attend qu'elle soit validée sur disque."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((_WRITE, fn, args, future))
+        return await future
+
+    async def read(self, fn, *args):
+        """Exécute une lecture hors de la boucle d'événements.
+
+        Avec un stockage à lecteurs concurrents (SQLite/WAL), la lecture
+        s'exécute en parallèle sur le dernier état validé. Sinon, elle passe
+        par la file, après les écritures qui la précèdent.
+        """
+        if self._readers is not None:
+            return await asyncio.get_running_loop().run_in_executor(self._readers, self._timed, fn, args)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((_READ, fn, args, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self._writer, self._apply, batch)
+                for (_, _, _, future), (ok, value) in zip(batch, results):
+                    if future.done():
+                        continue
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+            except Exception as e:
+                logger.error(f"Erreur lors de la validation d'un lot d'écritures: {e}")
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _apply(self, batch) -> list:
+        """Exécute un lot dans le thread écrivain ; un seul commit pour toutes les écritures."""
+        results = []
+        dirty = False
+        for kind, fn, args, _ in batch:
+            if kind == _READ and dirty:
+                # Une lecture doit voir les écritures qui la précèdent
+                self._commit()
+                dirty = False
+            # Même en échec, une écriture peut avoir ouvert une transaction à valider
+            dirty = dirty or kind == _WRITE
+            try:
+                results.append((True, self._timed(fn, args)))
+            except Exception as e:
+                results.append((False, e))
+        if dirty:
+            self._commit()
+        self.batches += 1
+        if self.metrics:
+            self.metrics.storage_batch_size.observe(len(batch))
+        self.writes += sum(1 for kind, *_ in batch if kind == _WRITE)
+        return results
+
+    def _timed(self, fn, args):
+        if not self.metrics:
+            return fn(*args)
+        started_at = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.metrics.storage_duration.observe(time.perf_counter() - started_at,
+                                                  operation=getattr(fn, '__name__', 'lambda'))
+
+    def _commit(self) -> None:
+        started_at = time.perf_counter()
+        self.store.commit()
+        self.last_commit_seconds = time.perf_counter() - started_at
+        if self.metrics:
+            self.metrics.storage_commit.observe(self.last_commit_seconds)
@@ -0,0 +1,206 @@
+"""Limitation du débit des requêtes par seau à jetons (token bucket).
+
+Chaque client dispose d'un seau par budget : un jeton est consommé par
+requête et les jetons se régénèrent à débit constant, jusqu'à la capacité
+du seau (rafale autorisée). Les budgets séparent les routes coûteuses
+(questions au modèle), la vérification du mot de passe (essais limités),
+les routes d'administration et les autres routes.
+
+Les questions sont limitées par session et par adresse du client. Les
+adresses locales (127.0.0.1, ::1) désignent tous les joueurs à la fois,
+derrière un proxy local ou pour des bornes sur la même machine : elles ne
+sont pas limitées, sauf sur les routes protégées par mot de passe, où elles
+partagent un seul seau par budget. Les routes d'administration ont leur
+propre budget : des essais répétés sur /distribution/verify n'en bloquent
+pas l'accès.
+"""
+import ipaddress
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LLM = 'llm'
+AUTH = 'auth'
+ADMIN = 'admin'
+DEFAULT = 'default'
+
+# Budget de chaque route (méthode, route déclarée) ; les autres routes utilisent DEFAULT
+ROUTE_BUDGETS = {
+    ('POST', '/stream'): LLM,
+    ('POST', '/distribution/verify'): AUTH,
+    ('GET', '/admin/analytics'): ADMIN,
+    ('GET', '/admin/export'): ADMIN,
+}
+# Budgets des routes protégées par mot de passe : toujours limités, même pour les clients locaux
+PASSWORD_BUDGETS = (AUTH, ADMIN)
+# Routes jamais limitées : fichiers statiques, collecte des métriques, sonde de disponibilité
+EXEMPT_ROUTES = ('/static/{path}', '/metrics', '/ready')
+
+# Clé commune aux clients locaux ou d'adresse inconnue, pour les budgets PASSWORD_BUDGETS
+LOCAL_CLIENTS = 'local'
+MAX_KEYS = 10000  # clients suivis par budget ; les moins récents sont oubliés
+_PERIODS = {'s': 1, 'min': 60, 'h': 3600}
+
+
+def parse_rate(value: str) -> Optional[Tuple[float, float]]:
+    """Lit "N/période[:rafale]", par exemple "12/min:3", en (jetons par seconde, capacité).
+
+    La rafale vaut N par défaut. "0" désactive la limite (retourne None).
+    """
+    if value.strip() == '0':
+        return None
+    rate, _, burst = value.partition(':')
+    count, _, period = rate.partition('/')
+    if period not in _PERIODS:
+        raise ValueError(f"Période inconnue dans '{value}' (s, min ou h)")
+    count = float(count)
+    burst = float(burst) if burst else count
+    if count <= 0 or burst < 1:
+        raise ValueError(f"Débit invalide: '{value}'")
+    return count / _PERIODS[period], burst
+
+
+class TokenBucket:
+    """Seau de `capacity` jetons, régénérés à `rate` jetons par seconde."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self) -> float:
+        """Consomme un jeton ; retourne 0 si accepté, sinon le délai d'attente en secondes."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Seaux à jetons d'un budget, indexés par client (adresse ou session)."""
+
+    def __init__(self, rate: float, capacity: float, max_keys: int = MAX_KEYS):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def consume(self, key: str) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+            if len(self._buckets) > self.max_keys:
+                # Client inactif depuis le plus longtemps : son seau est plein ou presque
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.consume()
+        if wait:
+            self.rejected += 1
+        return wait
+
+
+def _is_loopback(address: str) -> bool:
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+
+class AdmissionControl:
+    """Middleware appliquant les budgets de requêtes par client.
+
+    `budgets` associe à chaque budget (LLM, AUTH, DEFAULT) un couple
+    (jetons par seconde, capacité) par adresse, ou None pour ne pas le
+    limiter. `llm_session` limite en plus les questions de chaque session.
+    Avec `trust_forwarded`, l'adresse du client est la dernière de
+    l'en-tête X-Forwarded-For, ajoutée par le proxy local.
+    """
+
+    def __init__(self, budgets: Dict[str, Optional[Tuple[float, float]]],
+                 llm_session: Optional[Tuple[float, float]] = None, trust_forwarded: bool = False, metrics=None):
+        self.limiters = {budget: RateLimiter(*rate) for budget, rate in budgets.items() if rate is not None}
+        self.session_limiter = RateLimiter(*llm_session) if llm_session is not None else None
+        self.trust_forwarded = trust_forwarded
+        self.metrics = metrics
+
+    def client_address(self, request) -> Optional[str]:
+        if self.trust_forwarded:
+            forwarded = request.headers.get('X-Forwarded-For', '')
+            if forwarded:
+                return forwarded.rsplit(',', 1)[-1].strip()
+        return request.remote
+
+    async def _session_id(self, request) -> Optional[str]:
+        try:
+            data = await request.json()
+        except (ValueError, UnicodeDecodeError):
+            # Corps invalide : le handler répondra 400
+            return None
+        return data.get('session_id') if isinstance(data, dict) else None
+
+    def _reject(self, request, budget: str, wait: float):
+        retry_after = max(1, math.ceil(wait))
+        if self.metrics:
+            self.metrics.http_rate_limited.inc(budget=budget)
+        logger.warning("Requête %s %s limitée (budget %s), Retry-After: %ss", request.method, request.path,
+                       budget, retry_after,
+                       extra={'event': 'rate_limited', 'budget': budget, 'retry_after': retry_after})
+        return web.Response(
+            text=json.dumps({"error": "Trop de requêtes, veuillez patienter", "retry_after": retry_after}),
+            status=429,
+            headers={'Retry-After': str(retry_after)},
+            content_type='application/json'
+        )
+
+    def middleware(self):
+        @web.middleware
+        async def admission_middleware(request, handler):
+            resource = request.match_info.route.resource
+            route = resource.canonical if resource is not None else None
+            if route is None or route in EXEMPT_ROUTES:
+                return await handler(request)
+            budget = ROUTE_BUDGETS.get((request.method, route), DEFAULT)
+
+            limiter = self.limiters.get(budget)
+            address = self.client_address(request)
+            local = not address or _is_loopback(address)
+            # Les essais de mot de passe sont toujours limités, même sans adresse distincte par client
+            if limiter is not None and (not local or budget in PASSWORD_BUDGETS):
+                wait = limiter.consume(LOCAL_CLIENTS if local else address)
+                if wait:
+                    return self._reject(request, budget, wait)
+            if budget == LLM and self.session_limiter is not None:
+                session_id = await self._session_id(request)
+                if session_id:
+                    wait = self.session_limiter.consume(session_id)
+                    if wait:
+                        return self._reject(request, budget, wait)
+            return await handler(request)
+
+        return admission_middleware
+
+    def to_dict(self) -> dict:
+        limiters = dict(self.limiters)
+        if self.session_limiter is not None:
+            limiters['llm_session'] = self.session_limiter
+        return {budget: {'rate_per_second': round(limiter.rate, 4), 'burst': limiter.capacity,
+                         'clients': len(limiter), 'rejected': limiter.rejected}
+                for budget, limiter in limiters.items()}
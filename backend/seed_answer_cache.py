@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Précalcule hors ligne les réponses aux questions fréquentes pour chaque mot.
+
+Le fichier produit se charge au démarrage du serveur avec
+`--answer-cache-file`. Exemple :
+    python backend/seed_answer_cache.py --words-file data/mots.txt \
+        --questions data/questions_frequentes.txt --output data/answer_cache.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+import ollama
+
+from answer_cache import normalize_question
+from context import ChatContext
+from matcher import WordMatcher
+from words import WordPool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def seed(args) -> list:
+    client = ollama.AsyncClient()
+    words = list(WordPool(args.words_file))
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    entries = []
+
+    async def answer(word: str, question: str) -> None:
+        # Même prompt système et mêmes options que pendant une partie
+        context = ChatContext(word)
+        context.add_user(question)
+        async with semaphore:
+            try:
+                response = await client.chat(model=args.model, messages=context.messages(),
+                                             options={'num_ctx': args.num_ctx}, keep_alive=-1)
+            except Exception as e:
+                logger.error(f"Échec pour '{word}' / '{question}': {e}")
+                return
+        content = response.message.content.strip()
+        # Une réponse qui révèle le mot ne doit jamais être resservie
+        if content and not WordMatcher(word).matches(content):
+            entries.append({'word': word, 'question': normalize_question(question), 'answer': content})
+
+    for word in words:
+        await asyncio.gather(*(answer(word, question) for question in questions))
+        logger.info(f"Mot '{word}' traité ({len(entries)} réponses au total)")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Précalcul du cache de réponses')
+    parser.add_argument('--words-file', required=True, help='Fichier contenant la liste des mots à deviner')
+    parser.add_argument('--questions', default='data/questions_frequentes.txt',
+                        help='Questions fréquentes, une par ligne (par défaut: data/questions_frequentes.txt)')
+    parser.add_argument('--output', required=True, help='Fichier JSON des réponses précalculées')
+    parser.add_argument('--model', default='llama3.2:3b', help='Nom du modèle LLM à utiliser (par défaut: llama3.2:3b)')
+    parser.add_argument('--num-ctx', type=int, default=2048, help='Taille du contexte, identique au serveur (par défaut: 2048)')
+    parser.add_argument('--concurrency', type=int, default=1, help='Requêtes simultanées vers Ollama (par défaut: 1)')
+    args = parser.parse_args()
+
+    entries = asyncio.run(seed(args))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'model': args.model, 'entries': entries}, f, ensure_ascii=False, indent=1)
+    logger.info(f"{len(entries)} réponses enregistrées dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""Gestion des sessions de jeu pour permettre plusieurs parties simultanées."""
+import asyncio
+import itertools
+import json
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+from context import ChatContext
+from matcher import WordMatcher
+
+# Une session partagée lue plus de TOUCH_INTERVAL secondes après sa dernière
+# activité enregistrée est de nouveau marquée active dans la base
+TOUCH_INTERVAL = 60
+
+
+class SessionConflict(Exception):
+    """La partie a été modifiée ou terminée par un autre processus depuis sa lecture."""
+
+
+class GameSession:
+    """État d'une partie en cours pour un joueur."""
+
+    def __init__(self, session_id: str, pseudo: str, telephone: str, hidden_word: str,
+                 context_tokens: int = 1536):
+        self.session_id = session_id
+        self.pseudo = pseudo
+        self.telephone = telephone
+        self.hidden_word = hidden_word
+        # Détection du mot caché, compilée une fois pour la partie
+        self.matcher = WordMatcher(hidden_word)
+        # Identifiant de la partie dans le stockage des résultats
+        self.game_id = None
+        # Prompt système et historique envoyés au modèle
+        self.context = ChatContext(hidden_word, max_tokens=context_tokens)
+        # Serveur Ollama qui a le contexte de la partie en cache
+        self.backend = None
+        self.start_time = datetime.now()
+        self.last_activity = time.monotonic()
+        # Connexion SSE ouverte par le navigateur du joueur (GET /stream)
+        self.event_stream = None
+        # Processus qui détient cette connexion, et version de l'état enregistré (mode multi-processus)
+        self.stream_worker = None
+        self.version = 0
+        # Sérialise les requêtes d'un même joueur (questions, abandon)
+        self.lock = asyncio.Lock()
+
+    def touch(self) -> None:
+        """Marque la session comme active."""
+        self.last_activity = time.monotonic()
+
+
+class SessionStore:
+    """Table des sessions en mémoire avec expiration et limite de taille.
+
+    Les sessions sont conservées dans l'ordre d'activité (la moins récente
+    en tête), ce qui permet d'expirer et d'évincer sans parcours complet.
+    Les méthodes sont asynchrones pour partager leur interface avec
+    `SharedSessionStore`.
+    """
+
+    def __init__(self, idle_timeout: float = 1800, max_sessions: int = 500, context_tokens: int = 1536):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.context_tokens = context_tokens
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def create(self, pseudo: str, telephone: str, hidden_word: str) -> GameSession:
+        """Crée une nouvelle session et retourne son état."""
+        session_id = secrets.token_urlsafe(16)
+        session = GameSession(session_id, pseudo, telephone, hidden_word, self.context_tokens)
+        self._sessions[session_id] = session
+        return session
+
+    def peek(self, session_id: str) -> Optional[GameSession]:
+        """Retourne la session présente en mémoire, sans la marquer active."""
+        return self._sessions.get(session_id)
+
+    async def get(self, session_id: Optional[str]) -> Optional[GameSession]:
+        """Retourne la session active correspondant à l'identifiant."""
+        if not session_id:
+            return None
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if self._is_expired(session, time.monotonic()):
+            return None
+        session.touch()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def save(self, session: GameSession) -> None:
+        """Enregistre l'état de la partie après une modification (rien à faire en mémoire)."""
+
+    async def attach_stream(self, session: GameSession, stream) -> None:
+        session.event_stream = stream
+
+    async def detach_stream(self, session: GameSession, stream) -> None:
+        if session.event_stream is stream:
+            session.event_stream = None
+
+    async def remove(self, session_id: str) -> Optional[GameSession]:
+        """Supprime une session et la retourne si elle existait."""
+        return self._sessions.pop(session_id, None)
+
+    async def purge_expired(self) -> List[GameSession]:
+        """Retire les sessions inactives depuis plus de `idle_timeout` secondes."""
+        now = time.monotonic()
+        expired = []
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if not self._is_expired(session, now):
+                break
+            expired.append(self._sessions.popitem(last=False)[1])
+        return expired
+
+    async def evict_overflow(self) -> List[GameSession]:
+        """Libère une place en évinçant les sessions les moins récemment actives."""
+        evicted = []
+        while len(self._sessions) >= self.max_sessions:
+            evicted.append(self._sessions.popitem(last=False)[1])
+        return evicted
+
+    def _is_expired(self, session: GameSession, now: float) -> bool:
+        # Une session verrouillée traite une requête : elle n'est pas inactive
+        return not session.lock.locked() and now - session.last_activity > self.idle_timeout
+
+
+class SharedSessionStore(SessionStore):
+    """Sessions enregistrées dans la base SQLite partagée par les processus de travail.
+
+    Les requêtes d'un joueur peuvent arriver sur n'importe quel processus : la
+    session est relue dans la base à chaque accès. Les `GameSession` gardées
+    en mémoire (verrou, connexion SSE, détecteur compilé) servent de cache et
+    sont mises à jour sur place quand un autre processus a modifié la partie.
+    L'activité est datée en temps Unix pour être comparable entre processus.
+    """
+
+    def __init__(self, persistence, store, worker: int, idle_timeout: float = 1800, max_sessions: int = 500,
+                 context_tokens: int = 1536):
+        super().__init__(idle_timeout=idle_timeout, max_sessions=max_sessions, context_tokens=context_tokens)
+        self.persistence = persistence
+        self.store = store
+        self.worker = worker
+
+    async def create(self, pseudo: str, telephone: str, hidden_word: str) -> GameSession:
+        """Crée la session ; elle est enregistrée dans la base au premier `save()`."""
+        session = GameSession(secrets.token_urlsafe(16), pseudo, telephone, hidden_word, self.context_tokens)
+        self._cache(session)
+        return session
+
+    async def get(self, session_id: Optional[str]) -> Optional[GameSession]:
+        if not session_id:
+            return None
+        row = await self.persistence.read(self.store.load_session, session_id)
+        if row is None:
+            self._sessions.pop(session_id, None)
+            return None
+        session = self._sessions.get(session_id)
+        now = time.time()
+        if now - row['last_activity'] > self.idle_timeout and not (session and session.lock.locked()):
+            # Le processus qui la purgera enregistrera l'abandon
+            return None
+        if session is None:
+            session = self._from_row(row)
+        elif session.version != row['version']:
+            self._refresh(session, row)
+        session.stream_worker = row['stream_worker']
+        session.last_activity = row['last_activity']
+        self._cache(session)
+        if now - session.last_activity > TOUCH_INTERVAL:
+            session.last_activity = now
+            await self.persistence.write(self.store.touch_session, session_id, now)
+        return session
+
+    async def save(self, session: GameSession) -> None:
+        session.last_activity = time.time()
+        if session.version == 0:
+            session.version = 1
+            await self.persistence.write(self.store.add_session, self._to_row(session))
+            return
+        version = await self.persistence.write(
+            self.store.save_session, session.session_id, session.version, session.game_id,
+            json.dumps(session.context.history), session.context.dropped_messages, session.backend,
+            session.last_activity)
+        if version is None:
+            # Une autre question de la partie a été enregistrée entre-temps : son état est repris
+            row = await self.persistence.read(self.store.load_session, session.session_id)
+            if row is not None:
+                self._refresh(session, row)
+            else:
+                self._sessions.pop(session.session_id, None)
+            raise SessionConflict(f"Partie {session.session_id} modifiée par un autre processus")
+        session.version = version
+
+    async def attach_stream(self, session: GameSession, stream) -> None:
+        session.event_stream = stream
+        session.stream_worker = self.worker
+        await self.persistence.write(self.store.set_session_stream, session.session_id, self.worker)
+
+    async def detach_stream(self, session: GameSession, stream) -> None:
+        if session.event_stream is not stream:
+            return
+        session.event_stream = None
+        # Le joueur a pu se reconnecter entre-temps sur un autre processus
+        await self.persistence.write(self.store.clear_session_stream, session.session_id, self.worker)
+
+    async def remove(self, session_id: str) -> Optional[GameSession]:
+        session = self._sessions.pop(session_id, None)
+        await self.persistence.write(self.store.delete_session, session_id)
+        return session
+
+    async def purge_expired(self) -> List[GameSession]:
+        before = time.time() - self.idle_timeout
+        # Lecture d'abord : la suppression prend le verrou d'écriture partagé par tous les processus
+        _, expired = await self.persistence.read(self.store.session_stats, before)
+        if not expired:
+            return []
+        rows = await self.persistence.write(self.store.claim_expired_sessions, before)
+        return [self._claimed(row) for row in rows]
+
+    async def evict_overflow(self) -> List[GameSession]:
+        count, _ = await self.persistence.read(self.store.session_stats, 0)
+        if count < self.max_sessions:
+            return []
+        rows = await self.persistence.write(self.store.claim_overflow_sessions, self.max_sessions)
+        return [self._claimed(row) for row in rows]
+
+    def _cache(self, session: GameSession) -> None:
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        # La base reste la référence : le cache oublie les sessions les plus anciennes sans connexion SSE
+        excess = len(self._sessions) - self.max_sessions
+        if excess > 0:
+            for session_id, cached in list(itertools.islice(self._sessions.items(), excess)):
+                if cached.event_stream is None and not cached.lock.locked():
+                    del self._sessions[session_id]
+
+    def _claimed(self, row: dict) -> GameSession:
+        """Session retirée de la base par ce processus."""
+        return self._sessions.pop(row['session_id'], None) or self._from_row(row)
+
+    def _to_row(self, session: GameSession) -> dict:
+        return {
+            'session_id': session.session_id,
+            'pseudo': session.pseudo,
+            'telephone': session.telephone,
+            'hidden_word': session.hidden_word,
+            'game_id': session.game_id,
+            'start_time': session.start_time.isoformat(),
+            'last_activity': session.last_activity,
+            'history': json.dumps(session.context.history),
+            'window_start': session.context.dropped_messages,
+            'backend': session.backend,
+            'stream_worker': session.stream_worker,
+            'version': session.version,
+        }
+
+    def _from_row(self, row: dict) -> GameSession:
+        session = GameSession(row['session_id'], row['pseudo'], row['telephone'], row['hidden_word'],
+                              self.context_tokens)
+        session.start_time = datetime.fromisoformat(row['start_time'])
+        session.last_activity = row['last_activity']
+        self._refresh(session, row)
+        return session
+
+    @staticmethod
+    def _refresh(session: GameSession, row: dict) -> None:
+        """Reprend l'état enregistré par un autre processus."""
+        session.game_id = row['game_id']
+        session.context.restore(json.loads(row['history']), row['window_start'])
+        session.backend = row['backend']
+        session.stream_worker = row['stream_worker']
+        session.version = row['version']
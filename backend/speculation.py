@@ -0,0 +1,204 @@
+"""Travail spéculatif au début d'une partie, pendant que le joueur lit les consignes.
+
+Quand une partie commence, le modèle reste inactif jusqu'à la première
+question. `Speculator` met ce temps à profit :
+1. préchauffage : le prompt système de la partie est évalué sur le serveur
+   Ollama qui la servira, pour que son cache de préfixe soit prêt ;
+2. précalcul : les questions d'ouverture les plus fréquentes sont posées
+   pour ce mot, et les réponses rangées dans le cache de réponses.
+
+Ce travail ne retarde jamais une vraie question : il ne prend une place de
+génération que si la file d'inférence est vide, et il est annulé dès qu'une
+question arrive (voir `InferenceQueue.speculative_slot`).
+"""
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from answer_cache import is_cacheable, normalize_question
+from inference import InferenceQueueBusy
+from llm_pool import BACKEND_ERRORS
+
+logger = logging.getLogger(__name__)
+
+MAX_OPENING_QUESTIONS = 500  # questions d'ouverture distinctes suivies
+
+
+class OpeningQuestions:
+    """Premières questions des parties, par fréquence.
+
+    La liste initiale (fichier des questions fréquentes) compte pour une
+    occurrence chacune, puis chaque première question posée par un joueur
+    s'ajoute au décompte.
+    """
+
+    def __init__(self, max_entries: int = MAX_OPENING_QUESTIONS):
+        self.max_entries = max_entries
+        self._counts = Counter()
+        # Question normalisée -> texte posé au modèle (première forme rencontrée)
+        self._texts = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def load(self, path: Path) -> int:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    self.record(line.strip())
+        logger.info(f"{len(self)} questions d'ouverture chargées depuis {path}")
+        return len(self)
+
+    def record(self, question: str) -> None:
+        normalized = normalize_question(question)
+        if not is_cacheable(normalized, True):
+            return
+        self._counts[normalized] += 1
+        self._texts.setdefault(normalized, question)
+        if len(self._counts) > self.max_entries:
+            # Les questions les plus rares sont oubliées
+            kept = dict(self._counts.most_common(self.max_entries))
+            self._counts = Counter(kept)
+            self._texts = {normalized: self._texts[normalized] for normalized in kept}
+
+    def top(self, count: int) -> List[tuple]:
+        """Les `count` questions les plus fréquentes : (normalisée, texte)."""
+        return [(normalized, self._texts[normalized]) for normalized, _ in self._counts.most_common(count)]
+
+
+class Speculator:
+    """Préchauffe le modèle et précalcule les réponses d'ouverture de chaque partie."""
+
+    def __init__(self, llm_pool, inference_queue, answer_cache, questions: OpeningQuestions,
+                 model_name: str, options: dict, keep_alive, max_questions: int = 3, metrics=None):
+        self.llm_pool = llm_pool
+        self.inference_queue = inference_queue
+        self.answer_cache = answer_cache
+        self.questions = questions
+        self.model_name = model_name
+        self.options = options
+        self.keep_alive = keep_alive
+        self.max_questions = max_questions if answer_cache is not None else 0
+        self.metrics = metrics
+        self.outcomes = Counter()
+        # Session -> tâche spéculative en cours
+        self._tasks = {}
+        # (mot, question) -> réponse attendue par un joueur ayant posé la même question
+        self._inflight = {}
+        # Entrées du cache produites par spéculation, pour compter celles qui servent
+        self._produced: "OrderedDict[tuple, None]" = OrderedDict()
+
+    def _record(self, outcome: str) -> None:
+        self.outcomes[outcome] += 1
+        if self.metrics:
+            self.metrics.llm_speculation.inc(outcome=outcome)
+
+    def start(self, session) -> None:
+        """Lance le travail spéculatif d'une partie qui commence.
+
+        Le serveur Ollama de la partie est choisi tout de suite : les
+        questions du joueur y trouveront le prompt système déjà évalué.
+        """
+        backend = self.llm_pool.choose(affinity=session.backend)
+        if backend is None:
+            return
+        session.backend = backend.name
+        task = asyncio.create_task(self._run(session))
+        self._tasks[session.session_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session.session_id, None))
+
+    def cancel(self, session_id: str) -> None:
+        """Arrête le travail spéculatif d'une partie (le joueur pose sa question)."""
+        task = self._tasks.get(session_id)
+        if task is not None:
+            task.cancel()
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def join(self, word: str, normalized: str) -> Optional[str]:
+        """Réponse à une question en cours de précalcul pour ce mot, attendue plutôt que regénérée.
+
+        Retourne None si rien n'est en cours, ou si le précalcul échoue ou est
+        interrompu : la question suit alors le chemin normal.
+        """
+        future = self._inflight.get((word, normalized))
+        if future is None:
+            return None
+        answer = await asyncio.shield(future)
+        if answer is not None:
+            self._record('joined')
+        return answer
+
+    def record_hit(self, word: str, normalized: str) -> None:
+        """Une réponse servie depuis le cache : comptée si elle venait d'un précalcul."""
+        if (word, normalized) in self._produced:
+            self._record('served')
+
+    async def _run(self, session) -> None:
+        word = session.hidden_word
+        try:
+            backend = self.llm_pool.choose(affinity=session.backend)
+            if backend is None:
+                return
+            system_message = session.context.system_message
+            async with self.inference_queue.speculative_slot():
+                async with backend.track():
+                    # num_predict n'est pas une option de chargement : le modèle n'est pas rechargé
+                    await backend.client.chat(model=self.model_name, messages=[system_message],
+                                              options={**self.options, 'num_predict': 1},
+                                              keep_alive=self.keep_alive)
+            self._record('primed')
+
+            for normalized, question in self.questions.top(self.max_questions):
+                key = (word, normalized)
+                if self.answer_cache.peek(word, normalized) or key in self._inflight:
+                    continue
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                try:
+                    async with self.inference_queue.speculative_slot():
+                        async with backend.track():
+                            response = await backend.client.chat(
+                                model=self.model_name,
+                                messages=[system_message, {'role': 'user', 'content': question}],
+                                options=self.options, keep_alive=self.keep_alive)
+                    answer = response.message.content.strip()
+                    # Une réponse qui révèle le mot ne doit jamais être resservie
+                    if answer and not session.matcher.matches(answer):
+                        self.answer_cache.put(word, normalized, answer)
+                        self._produced[key] = None
+                        while len(self._produced) > self.answer_cache.max_entries:
+                            self._produced.popitem(last=False)
+                        future.set_result(answer)
+                        self._record('answered')
+                finally:
+                    del self._inflight[key]
+                    if not future.done():
+                        future.set_result(None)
+        except InferenceQueueBusy:
+            # Des questions attendent : le reste du travail est abandonné
+            self._record('skipped')
+        except asyncio.CancelledError:
+            self._record('cancelled')
+        except BACKEND_ERRORS as e:
+            self._record('failed')
+            logger.debug("Travail spéculatif interrompu pour %s: %s", session.pseudo, e)
+        except Exception as e:
+            # Tâche lancée sans attente : une erreur inattendue serait sinon perdue
+            self._record('failed')
+            logger.error("Erreur inattendue du travail spéculatif pour %s: %s", session.pseudo, e, exc_info=True)
+
+    def to_dict(self) -> dict:
+        return {
+            'opening_questions': len(self.questions),
+            'max_questions': self.max_questions,
+            'running': len(self._tasks),
+            **{outcome: self.outcomes[outcome]
+               for outcome in ('primed', 'answered', 'served', 'joined', 'skipped', 'cancelled', 'failed')},
+        }
@@ -0,0 +1,817 @@
+"""Stockage des résultats de parties et des distributions de cadeaux.
+
+Deux implémentations partagent la même interface :
+- `CsvResultsStore` : format historique (game_results.csv, distributions.csv,
+  cadeaux_recus.csv), conservé pour la compatibilité et l'import/export.
+- `SqliteResultsStore` : base SQLite embarquée en mode WAL, avec mises à jour
+  indexées par identifiant de partie. Elle peut être partagée par plusieurs
+  processus de travail (sessions et journal des changements, voir cluster.py).
+"""
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+RESULTS_HEADER = ['date', 'pseudo', 'telephone', 'mot_cache', 'resultat', 'temps_partie']
+DISTRIBUTIONS_HEADER = ['date_distribution',
+                        'gagnant1_pseudo', 'gagnant1_telephone',
+                        'gagnant2_pseudo', 'gagnant2_telephone',
+                        'gagnant3_pseudo', 'gagnant3_telephone']
+CADEAUX_HEADER = ['pseudo', 'date_reception']
+RESULTATS = ('en_cours', 'victoire', 'abandon')
+SESSION_COLUMNS = ['session_id', 'pseudo', 'telephone', 'hidden_word', 'game_id', 'start_time',
+                   'last_activity', 'history', 'window_start', 'backend', 'stream_worker', 'version']
+
+
+class DistributionConflict(Exception):
+    """Une autre distribution a été enregistrée depuis la sélection des gagnants."""
+
+
+class ResultsStore(ABC):
+    """Interface commune des stockages de résultats.
+
+    Les parties sont retournées sous forme de dictionnaires dont les clés sont
+    les colonnes de `RESULTS_HEADER` plus `id`. Les distributions sont
+    retournées sous forme de lignes au format CSV historique :
+    `[date, pseudo1, telephone1, pseudo2, telephone2, pseudo3, telephone3]`.
+
+    Les écritures ne sont durables et visibles des lectures qu'après
+    `commit()`, ce qui permet de les regrouper (voir persistence.py).
+    Les méthodes abstraites sont à fournir par chaque implémentation ; les
+    autres ont une version par défaut fondée sur elles.
+    """
+
+    # Les lectures peuvent-elles s'exécuter en parallèle des écritures ?
+    concurrent_reads = False
+
+    @abstractmethod
+    def add_game(self, date: str, pseudo: str, telephone: str, mot_cache: str):
+        """Enregistre une partie 'en_cours' et retourne son identifiant."""
+
+    @abstractmethod
+    def update_game(self, game_id, resultat: str, temps_partie: int) -> None:
+        """Enregistre le résultat et la durée d'une partie."""
+
+    @abstractmethod
+    def iter_games(self) -> Iterator[dict]:
+        """Parcourt toutes les parties dans l'ordre d'enregistrement."""
+
+    def iter_victories(self) -> Iterator[dict]:
+        """Parcourt les parties gagnées."""
+        return (game for game in self.iter_games() if game['resultat'] == 'victoire')
+
+    def games_since(self, since: str) -> List[dict]:
+        """Retourne les parties commencées à partir de la date ISO donnée."""
+        return [game for game in self.iter_games() if game['date'] >= since]
+
+    def word_stats(self) -> List[list]:
+        """Agrégats par mot caché, en un seul parcours des parties.
+
+        Chaque ligne : `[mot_cache, parties, victoires, abandons,
+        temps_victoires, temps_total]` (temps cumulés en secondes).
+        """
+        stats = {}
+        for game in self.iter_games():
+            row = stats.get(game['mot_cache'])
+            if row is None:
+                row = stats[game['mot_cache']] = [game['mot_cache'], 0, 0, 0, 0, 0]
+            row[1] += 1
+            if game['resultat'] == 'victoire':
+                row[2] += 1
+                row[4] += game['temps_partie']
+            elif game['resultat'] == 'abandon':
+                row[3] += 1
+            row[5] += game['temps_partie']
+        return list(stats.values())
+
+    def games_pages(self, since: Optional[str] = None, until: Optional[str] = None,
+                    resultat: Optional[str] = None, mot_cache: Optional[str] = None,
+                    page_size: int = 500) -> Iterator[List[dict]]:
+        """Parcourt les parties filtrées par pages de `page_size` au plus.
+
+        Chaque page n'est lue qu'au moment où elle est demandée : un export
+        ne charge jamais toutes les parties en mémoire. `since` (inclus) et
+        `until` (exclu) sont des dates ISO, éventuellement partielles.
+        """
+        page = []
+        for game in self.iter_games():
+            if _game_matches(game, since, until, resultat, mot_cache):
+                page.append(game)
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+    @abstractmethod
+    def add_distribution(self, date: str, winners: List[dict], after: Optional[str] = None) -> None:
+        """Enregistre une distribution et les cadeaux reçus par les gagnants.
+
+        `after` est la date de la dernière distribution connue de l'appelant
+        ('' s'il n'y en a pas encore) : si une autre distribution a été
+        enregistrée entre-temps, `DistributionConflict` est levée.
+        """
+
+    def _check_last_distribution(self, after: Optional[str]) -> None:
+        if after is None:
+            return
+        last = self.last_distribution()
+        _check_distribution_date(last[0] if last else '', after)
+
+    @abstractmethod
+    def iter_distributions(self) -> Iterator[list]:
+        """Parcourt les distributions dans l'ordre d'enregistrement."""
+
+    def last_distribution(self) -> Optional[list]:
+        """Retourne la dernière distribution enregistrée."""
+        last = None
+        for row in self.iter_distributions():
+            last = row
+        return last
+
+    def count_distributions(self) -> int:
+        return sum(1 for _ in self.iter_distributions())
+
+    def distributions_page(self, limit: int, offset: int = 0, before: Optional[str] = None) -> List[list]:
+        """Retourne une page de distributions, de la plus récente à la plus ancienne.
+
+        Avec `before`, seules les distributions antérieures à cette date ISO
+        sont retenues (pagination par curseur) ; `offset` s'applique ensuite.
+        """
+        rows = [row for row in self.iter_distributions() if before is None or row[0] < before]
+        rows.reverse()
+        return rows[offset:offset + limit]
+
+    @abstractmethod
+    def gift_recipients(self) -> set:
+        """Retourne l'ensemble des pseudos ayant déjà reçu un cadeau."""
+
+    @abstractmethod
+    def iter_gifts(self) -> Iterator[list]:
+        """Parcourt les cadeaux reçus (`[pseudo, date_reception]`)."""
+
+    def snapshot(self):
+        """Contexte dans lequel les lectures du thread courant voient un même état validé."""
+        return nullcontext()
+
+    def commit(self) -> None:
+        """Rend durables (fsync) les écritures effectuées depuis le dernier commit."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _check_distribution_date(current: str, after: str) -> None:
+    """Lève `DistributionConflict` si la dernière distribution n'est plus celle attendue ('' : aucune)."""
+    if current != after:
+        raise DistributionConflict(f"Dernière distribution changée entre-temps "
+                                   f"(attendue: {after or 'aucune'}, enregistrée: {current or 'aucune'})")
+
+
+def _fsync(f) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _game_from_row(game_id, row: list) -> dict:
+    game = dict(zip(RESULTS_HEADER, row))
+    game['id'] = game_id
+    game['temps_partie'] = int(game['temps_partie'] or 0)
+    return game
+
+
+def _game_matches(game: dict, since, until, resultat, mot_cache) -> bool:
+    return ((since is None or game['date'] >= since) and (until is None or game['date'] < until)
+            and (resultat is None or game['resultat'] == resultat)
+            and (mot_cache is None or game['mot_cache'] == mot_cache))
+
+
+def _distribution_row(date: str, winners: List[dict]) -> list:
+    row = [date]
+    for winner in winners:
+        row.extend([winner['pseudo'], winner['telephone']])
+    return row
+
+
+class CsvResultsStore(ResultsStore):
+    """Stockage historique dans des fichiers CSV.
+
+    L'identifiant d'une partie est sa date de début (ISO), unique en pratique.
+    Les ajouts sont écrits en fin de fichier ; les mises à jour de résultats
+    sont accumulées puis appliquées au commit en une seule réécriture
+    atomique du fichier (fichier temporaire puis renommage).
+    """
+
+    def __init__(self, results_file: Path, distributions_file: Path, cadeaux_file: Path):
+        self.results_file = Path(results_file)
+        self.distributions_file = Path(distributions_file)
+        self.cadeaux_file = Path(cadeaux_file)
+        for path, header in ((self.results_file, RESULTS_HEADER),
+                             (self.distributions_file, DISTRIBUTIONS_HEADER),
+                             (self.cadeaux_file, CADEAUX_HEADER)):
+            # Créer le répertoire parent et le fichier avec son en-tête si nécessaire
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if not path.exists():
+                with open(path, 'w', newline='') as f:
+                    csv.writer(f).writerow(header)
+        self._open_files = {}
+        self._pending_updates = {}
+        # Index des distributions : position de chaque ligne dans le fichier
+        self.distributions_index = self.distributions_file.with_name(self.distributions_file.name + '.idx')
+        self._distribution_offsets = self._load_distribution_offsets()
+
+    def _handle(self, path: Path, binary: bool = False):
+        f = self._open_files.get(path)
+        if f is None:
+            f = self._open_files[path] = open(path, 'ab') if binary else open(path, 'a', newline='')
+        return f
+
+    def _append(self, path: Path, rows: List[list]) -> None:
+        csv.writer(self._handle(path)).writerows(rows)
+
+    def add_game(self, date, pseudo, telephone, mot_cache):
+        self._append(self.results_file, [[date, pseudo, telephone, mot_cache, 'en_cours', '0']])
+        return date
+
+    def update_game(self, game_id, resultat, temps_partie):
+        self._pending_updates[game_id] = (resultat, temps_partie)
+
+    def commit(self):
+        for f in self._open_files.values():
+            _fsync(f)
+            f.close()
+        self._open_files = {}
+        if self._pending_updates:
+            self._rewrite_results(self._pending_updates)
+            self._pending_updates = {}
+
+    def _rewrite_results(self, updates: dict) -> None:
+        with open(self.results_file, 'r', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = list(reader)
+
+        # Les parties recherchées sont presque toujours parmi les dernières lignes
+        remaining = dict(updates)
+        for i in reversed(range(len(rows))):
+            if not remaining:
+                break
+            update = remaining.get(rows[i][0])
+            if update is not None and rows[i][4] == 'en_cours':
+                rows[i][4] = update[0]
+                rows[i][5] = str(update[1])
+                del remaining[rows[i][0]]
+
+        tmp_file = self.results_file.with_name(self.results_file.name + '.tmp')
+        with open(tmp_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+            _fsync(f)
+        os.replace(tmp_file, self.results_file)
+
+    def iter_games(self):
+        with open(self.results_file, 'r', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                yield _game_from_row(row[0], row)
+
+    def add_distribution(self, date, winners, after=None):
+        self._check_last_distribution(after)
+        f = self._handle(self.distributions_file)
+        f.flush()
+        offset = f.tell()
+        self._append(self.distributions_file, [_distribution_row(date, winners)])
+        self._append(self.cadeaux_file, [[winner['pseudo'], date] for winner in winners])
+        self._handle(self.distributions_index, binary=True).write(array('q', [offset]).tobytes())
+        self._distribution_offsets.append(offset)
+
+    def iter_distributions(self):
+        yield from _read_csv_rows(self.distributions_file, DISTRIBUTIONS_HEADER[0])
+
+    def _load_distribution_offsets(self) -> array:
+        """Charge l'index des distributions, ou le reconstruit s'il ne correspond pas au fichier."""
+        if self.distributions_index.exists():
+            offsets = array('q')
+            with open(self.distributions_index, 'rb') as f:
+                data = f.read()
+            offsets.frombytes(data[:len(data) - len(data) % offsets.itemsize])
+            if self._index_matches(offsets):
+                return offsets
+        offsets = self._scan_distribution_offsets()
+        with open(self.distributions_index, 'wb') as f:
+            f.write(offsets.tobytes())
+            _fsync(f)
+        return offsets
+
+    def _index_matches(self, offsets: array) -> bool:
+        """Vérifie que la dernière entrée de l'index désigne la dernière ligne du fichier.
+
+        Après un arrêt brutal ou une modification manuelle du CSV, l'index et
+        le fichier peuvent diverger : l'index est alors reconstruit.
+        """
+        if not offsets:
+            return not self._scan_distribution_offsets()
+        size = self.distributions_file.stat().st_size
+        return offsets[-1] < size and len(self._read_distribution_rows(offsets[-1], size)) == 1
+
+    def _scan_distribution_offsets(self) -> array:
+        """Parcourt distributions.csv pour retrouver le début de chaque ligne."""
+        offsets = array('q')
+        position = 0
+        with open(self.distributions_file, 'rb') as f:
+            for i, line in enumerate(f):
+                if line.strip() and not (i == 0 and line.startswith(DISTRIBUTIONS_HEADER[0].encode())):
+                    offsets.append(position)
+                position += len(line)
+        return offsets
+
+    def _read_distribution_rows(self, start: int, end: int) -> List[list]:
+        """Lit les lignes comprises entre deux positions du fichier."""
+        with open(self.distributions_file, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        return [row for row in csv.reader(io.StringIO(data.decode(), newline='')) if row]
+
+    def _distribution_span(self, first: int, last: int) -> List[list]:
+        """Lignes d'indices `first` à `last` (exclus), lues d'un seul bloc."""
+        if first >= last:
+            return []
+        offsets = self._distribution_offsets
+        end = offsets[last] if last < len(offsets) else self.distributions_file.stat().st_size
+        return self._read_distribution_rows(offsets[first], end)
+
+    def last_distribution(self):
+        count = len(self._distribution_offsets)
+        rows = self._distribution_span(max(count - 1, 0), count)
+        return rows[0] if rows else None
+
+    def count_distributions(self):
+        return len(self._distribution_offsets)
+
+    def distributions_page(self, limit, offset=0, before=None):
+        # Les distributions sont ajoutées dans l'ordre chronologique
+        last = len(self._distribution_offsets)
+        if before is not None:
+            # Recherche dichotomique de la première distribution >= before
+            low, high = 0, last
+            while low < high:
+                middle = (low + high) // 2
+                if self._distribution_span(middle, middle + 1)[0][0] < before:
+                    low = middle + 1
+                else:
+                    high = middle
+            last = low
+        last = max(last - offset, 0)
+        rows = self._distribution_span(max(last - limit, 0), last)
+        rows.reverse()
+        return rows
+
+    def gift_recipients(self):
+        return {row[0] for row in self.iter_gifts()}
+
+    def iter_gifts(self):
+        yield from _read_csv_rows(self.cadeaux_file, CADEAUX_HEADER[0])
+
+    def close(self):
+        self.commit()
+
+
+class SqliteResultsStore(ResultsStore):
+    """Stockage dans une base SQLite embarquée (mode WAL).
+
+    L'identifiant d'une partie est sa clé primaire : la mise à jour d'un
+    résultat est une recherche dans l'index, sans réécriture de l'historique.
+    Les écritures passent par une connexion unique ; chaque thread lecteur a
+    sa propre connexion et lit le dernier état validé.
+
+    Avec `worker`, la base est partagée par plusieurs processus : chaque
+    partie commencée, victoire et distribution est aussi ajoutée au journal
+    `events`, que les autres processus relisent pour tenir à jour leurs
+    classements en mémoire.
+    """
+
+    concurrent_reads = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            pseudo TEXT NOT NULL,
+            telephone TEXT NOT NULL,
+            mot_cache TEXT NOT NULL,
+            resultat TEXT NOT NULL DEFAULT 'en_cours',
+            temps_partie INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_games_date ON games(date);
+        CREATE INDEX IF NOT EXISTS idx_games_resultat_temps ON games(resultat, temps_partie);
+
+        CREATE TABLE IF NOT EXISTS distributions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            gagnant1_pseudo TEXT, gagnant1_telephone TEXT,
+            gagnant2_pseudo TEXT, gagnant2_telephone TEXT,
+            gagnant3_pseudo TEXT, gagnant3_telephone TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_distributions_date ON distributions(date);
+
+        CREATE TABLE IF NOT EXISTS cadeaux (
+            pseudo TEXT NOT NULL,
+            date_reception TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_cadeaux_pseudo ON cadeaux(pseudo);
+
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            worker INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created REAL NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            pseudo TEXT NOT NULL,
+            telephone TEXT NOT NULL,
+            hidden_word TEXT NOT NULL,
+            game_id INTEGER,
+            start_time TEXT NOT NULL,
+            last_activity REAL NOT NULL,
+            history TEXT NOT NULL DEFAULT '[]',
+            window_start INTEGER NOT NULL DEFAULT 0,
+            backend TEXT,
+            stream_worker INTEGER,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_activity ON sessions(last_activity);
+    """
+
+    # Attente maximale du verrou d'écriture détenu par un autre processus
+    BUSY_TIMEOUT = 30
+
+    def __init__(self, database: Path, worker: Optional[int] = None):
+        self.database = Path(database)
+        self.database.parent.mkdir(parents=True, exist_ok=True)
+        self.worker = worker
+        self.conn = sqlite3.connect(str(self.database), timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+        # WAL : les lecteurs ne bloquent pas l'écrivain et inversement
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # FULL : chaque commit est synchronisé sur disque (les commits sont groupés)
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+
+    def _reader(self) -> sqlite3.Connection:
+        """Connexion de lecture propre au thread courant."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.database), timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _log_event(self, kind: str, payload: dict) -> None:
+        if self.worker is not None:
+            self.conn.execute('INSERT INTO events (worker, kind, payload, created) VALUES (?, ?, ?, ?)',
+                              (self.worker, kind, json.dumps(payload), time.time()))
+
+    def _lock_for_write(self) -> None:
+        """Prend le verrou d'écriture avant une lecture dont dépend l'écriture qui suit."""
+        if not self.conn.in_transaction:
+            self.conn.execute('BEGIN IMMEDIATE')
+
+    def add_game(self, date, pseudo, telephone, mot_cache):
+        cursor = self.conn.execute(
+            'INSERT INTO games (date, pseudo, telephone, mot_cache) VALUES (?, ?, ?, ?)',
+            (date, pseudo, telephone, mot_cache))
+        self._log_event('game', {'pseudo': pseudo, 'telephone': telephone, 'date': date})
+        return cursor.lastrowid
+
+    def update_game(self, game_id, resultat, temps_partie):
+        cursor = self.conn.execute(
+            "UPDATE games SET resultat = ?, temps_partie = ? WHERE id = ? AND resultat = 'en_cours'",
+            (resultat, temps_partie, game_id))
+        if resultat == 'victoire' and cursor.rowcount and self.worker is not None:
+            pseudo, telephone, date = self.conn.execute(
+                'SELECT pseudo, telephone, date FROM games WHERE id = ?', (game_id,)).fetchone()
+            self._log_event('victory', {'pseudo': pseudo, 'telephone': telephone, 'date': date,
+                                        'temps_partie': temps_partie})
+        elif resultat == 'abandon' and cursor.rowcount:
+            # Sans effet sur les classements, mais les statistiques des autres processus changent
+            self._log_event('abandon', {'game_id': game_id})
+
+    def commit(self):
+        self.conn.commit()
+
+    @contextmanager
+    def snapshot(self):
+        # Transaction de lecture : toutes les requêtes voient le même instantané WAL
+        conn = self._reader()
+        conn.execute('BEGIN')
+        try:
+            yield
+        finally:
+            conn.execute('COMMIT')
+
+    def _games(self, query: str, params=()) -> Iterator[dict]:
+        cursor = self._reader().execute(
+            'SELECT id, date, pseudo, telephone, mot_cache, resultat, temps_partie FROM games ' + query,
+            params)
+        for row in cursor:
+            yield _game_from_row(row[0], row[1:])
+
+    def iter_games(self):
+        return self._games('ORDER BY id')
+
+    def iter_victories(self):
+        return self._games("WHERE resultat = 'victoire' ORDER BY id")
+
+    def games_since(self, since):
+        return list(self._games('WHERE date >= ? ORDER BY id', (since,)))
+
+    def word_stats(self):
+        # Agrégation faite par SQLite, sans convertir chaque partie en objet Python
+        cursor = self._reader().execute(
+            "SELECT mot_cache, COUNT(*), SUM(resultat = 'victoire'), SUM(resultat = 'abandon'), "
+            "SUM(CASE WHEN resultat = 'victoire' THEN temps_partie ELSE 0 END), SUM(temps_partie) "
+            "FROM games GROUP BY mot_cache")
+        return [list(row) for row in cursor]
+
+    def games_pages(self, since=None, until=None, resultat=None, mot_cache=None, page_size=500):
+        conditions, params = ['id > ?'], []
+        for clause, value in (('date >= ?', since), ('date < ?', until),
+                              ('resultat = ?', resultat), ('mot_cache = ?', mot_cache)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        query = 'WHERE ' + ' AND '.join(conditions) + ' ORDER BY id LIMIT ?'
+        # Pagination par identifiant : chaque page est une lecture courte, qui
+        # ne garde pas de transaction ouverte entre deux pages
+        last_id = 0
+        while True:
+            page = list(self._games(query, [last_id, *params, page_size]))
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_id = page[-1]['id']
+
+    def add_distribution(self, date, winners, after=None):
+        if after is not None:
+            # Vérification et insertion sous le même verrou : un autre processus
+            # ne peut pas enregistrer de distribution entre les deux
+            self._lock_for_write()
+            row = self.conn.execute('SELECT date FROM distributions ORDER BY id DESC LIMIT 1').fetchone()
+            _check_distribution_date(row[0] if row else '', after)
+        row = _distribution_row(date, winners)
+        row += [None] * (len(DISTRIBUTIONS_HEADER) - len(row))
+        self.conn.execute(
+            'INSERT INTO distributions (date, gagnant1_pseudo, gagnant1_telephone, '
+            'gagnant2_pseudo, gagnant2_telephone, gagnant3_pseudo, gagnant3_telephone) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', row)
+        self.conn.executemany(
+            'INSERT INTO cadeaux (pseudo, date_reception) VALUES (?, ?)',
+            [(winner['pseudo'], date) for winner in winners])
+        self._log_event('distribution', {'date': date, 'winners': winners})
+
+    @staticmethod
+    def _distribution_from_row(row) -> list:
+        # Même forme que les lignes CSV : on retire les gagnants absents
+        values = list(row)
+        while values and values[-1] is None:
+            values.pop()
+        return values
+
+    def iter_distributions(self):
+        cursor = self._reader().execute(
+            'SELECT date, gagnant1_pseudo, gagnant1_telephone, gagnant2_pseudo, gagnant2_telephone, '
+            'gagnant3_pseudo, gagnant3_telephone FROM distributions ORDER BY id')
+        for row in cursor:
+            yield self._distribution_from_row(row)
+
+    def last_distribution(self):
+        row = self._reader().execute(
+            'SELECT date, gagnant1_pseudo, gagnant1_telephone, gagnant2_pseudo, gagnant2_telephone, '
+            'gagnant3_pseudo, gagnant3_telephone FROM distributions ORDER BY id DESC LIMIT 1').fetchone()
+        return self._distribution_from_row(row) if row else None
+
+    def count_distributions(self):
+        return self._reader().execute('SELECT COUNT(*) FROM distributions').fetchone()[0]
+
+    def distributions_page(self, limit, offset=0, before=None):
+        # Parcours de l'index sur la date, du plus récent au plus ancien
+        where, params = ('WHERE date < ?', [before]) if before is not None else ('', [])
+        cursor = self._reader().execute(
+            'SELECT date, gagnant1_pseudo, gagnant1_telephone, gagnant2_pseudo, gagnant2_telephone, '
+            'gagnant3_pseudo, gagnant3_telephone FROM distributions ' + where +
+            ' ORDER BY date DESC, id DESC LIMIT ? OFFSET ?', params + [limit, offset])
+        return [self._distribution_from_row(row) for row in cursor]
+
+    def gift_recipients(self):
+        return {row[0] for row in self._reader().execute('SELECT DISTINCT pseudo FROM cadeaux')}
+
+    def iter_gifts(self):
+        for row in self._reader().execute('SELECT pseudo, date_reception FROM cadeaux ORDER BY rowid'):
+            yield list(row)
+
+    # Journal des changements (mode multi-processus)
+
+    def last_event_id(self) -> int:
+        return self._reader().execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def events_since(self, event_id: int, limit: int = 1000) -> List[tuple]:
+        """Événements postérieurs à `event_id` : (id, worker, kind, payload)."""
+        cursor = self._reader().execute(
+            'SELECT id, worker, kind, payload FROM events WHERE id > ? ORDER BY id LIMIT ?', (event_id, limit))
+        return [(row[0], row[1], row[2], json.loads(row[3])) for row in cursor]
+
+    def prune_events(self, before: float) -> None:
+        """Supprime les événements antérieurs à `before` (horodatage Unix)."""
+        self.conn.execute('DELETE FROM events WHERE created < ?', (before,))
+
+    # Sessions de jeu partagées (mode multi-processus)
+
+    def _session_rows(self, cursor) -> List[dict]:
+        return [dict(zip(SESSION_COLUMNS, row)) for row in cursor]
+
+    def add_session(self, session: dict) -> None:
+        self.conn.execute(
+            f"INSERT INTO sessions ({', '.join(SESSION_COLUMNS)}) VALUES ({', '.join('?' * len(SESSION_COLUMNS))})",
+            [session[column] for column in SESSION_COLUMNS])
+
+    def load_session(self, session_id: str) -> Optional[dict]:
+        rows = self._session_rows(self._reader().execute(
+            f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions WHERE session_id = ?", (session_id,)))
+        return rows[0] if rows else None
+
+    def save_session(self, session_id: str, version: int, game_id, history: str, window_start: int,
+                     backend: Optional[str], last_activity: float) -> Optional[int]:
+        """Enregistre l'état de la partie lue en `version` et retourne sa nouvelle version.
+
+        Retourne None si la partie n'existe plus ou a été modifiée depuis
+        (par un autre processus) : rien n'est écrit.
+        """
+        row = self.conn.execute(
+            'UPDATE sessions SET game_id = ?, history = ?, window_start = ?, backend = ?, last_activity = ?, '
+            'version = version + 1 WHERE session_id = ? AND version = ? RETURNING version',
+            (game_id, history, window_start, backend, last_activity, session_id, version)).fetchone()
+        return row[0] if row else None
+
+    def touch_session(self, session_id: str, last_activity: float) -> None:
+        self.conn.execute('UPDATE sessions SET last_activity = ? WHERE session_id = ?', (last_activity, session_id))
+
+    def set_session_stream(self, session_id: str, worker: int) -> None:
+        """Indique quel processus détient la connexion SSE du joueur."""
+        self.conn.execute('UPDATE sessions SET stream_worker = ? WHERE session_id = ?', (worker, session_id))
+
+    def clear_session_stream(self, session_id: str, worker: int) -> None:
+        self.conn.execute('UPDATE sessions SET stream_worker = NULL WHERE session_id = ? AND stream_worker = ?',
+                          (session_id, worker))
+
+    def session_stats(self, before: float) -> tuple:
+        """Nombre de sessions et présence de sessions inactives depuis `before`."""
+        count, oldest = self._reader().execute('SELECT COUNT(*), MIN(last_activity) FROM sessions').fetchone()
+        return count, oldest is not None and oldest < before
+
+    def delete_session(self, session_id: str) -> bool:
+        return self.conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,)).rowcount > 0
+
+    def claim_expired_sessions(self, before: float) -> List[dict]:
+        """Retire et retourne les sessions inactives depuis `before`.
+
+        Suppression et lecture en une seule requête : deux processus qui
+        purgent en même temps ne récupèrent jamais la même session.
+        """
+        return self._session_rows(self.conn.execute(
+            f"DELETE FROM sessions WHERE last_activity < ? RETURNING {', '.join(SESSION_COLUMNS)}", (before,)))
+
+    def claim_overflow_sessions(self, max_sessions: int) -> List[dict]:
+        """Retire les sessions les moins récemment actives pour n'en garder que `max_sessions - 1`."""
+        return self._session_rows(self.conn.execute(
+            f"DELETE FROM sessions WHERE session_id IN (SELECT session_id FROM sessions ORDER BY last_activity "
+            f"LIMIT MAX(0, (SELECT COUNT(*) FROM sessions) - ?)) RETURNING {', '.join(SESSION_COLUMNS)}",
+            (max_sessions - 1,)))
+
+    def import_csv(self, results_file: Path = None, distributions_file: Path = None,
+                   cadeaux_file: Path = None) -> dict:
+        """Importe des fichiers CSV au format historique dans la base."""
+        counts = {'games': 0, 'distributions': 0, 'cadeaux': 0}
+        with self.conn:
+            if results_file and Path(results_file).exists():
+                for row in _read_csv_rows(results_file, RESULTS_HEADER[0]):
+                    row = (row + ['', '', '', '', 'en_cours', '0'])[:len(RESULTS_HEADER)]
+                    row[5] = int(row[5] or 0)
+                    self.conn.execute(
+                        'INSERT INTO games (date, pseudo, telephone, mot_cache, resultat, temps_partie) '
+                        'VALUES (?, ?, ?, ?, ?, ?)', row)
+                    counts['games'] += 1
+            if distributions_file and Path(distributions_file).exists():
+                for row in _read_csv_rows(distributions_file, DISTRIBUTIONS_HEADER[0]):
+                    row = (row + [None] * len(DISTRIBUTIONS_HEADER))[:len(DISTRIBUTIONS_HEADER)]
+                    self.conn.execute(
+                        'INSERT INTO distributions (date, gagnant1_pseudo, gagnant1_telephone, '
+                        'gagnant2_pseudo, gagnant2_telephone, gagnant3_pseudo, gagnant3_telephone) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)', row)
+                    counts['distributions'] += 1
+            if cadeaux_file and Path(cadeaux_file).exists():
+                for row in _read_csv_rows(cadeaux_file, CADEAUX_HEADER[0]):
+                    self.conn.execute(
+                        'INSERT INTO cadeaux (pseudo, date_reception) VALUES (?, ?)', row[:2])
+                    counts['cadeaux'] += 1
+        return counts
+
+    def export_csv(self, results_file: Path = None, distributions_file: Path = None,
+                   cadeaux_file: Path = None) -> None:
+        """Exporte la base vers des fichiers CSV au format historique."""
+        exports = (
+            (results_file, RESULTS_HEADER,
+             ([g[column] for column in RESULTS_HEADER] for g in self.iter_games())),
+            (distributions_file, DISTRIBUTIONS_HEADER, self.iter_distributions()),
+            (cadeaux_file, CADEAUX_HEADER, self.iter_gifts()),
+        )
+        for path, header, rows in exports:
+            if not path:
+                continue
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+
+
+def _read_csv_rows(path: Path, first_column: str) -> Iterator[list]:
+    """Lit un CSV historique en ignorant l'en-tête s'il est présent.
+
+    Les anciens fichiers distributions.csv et cadeaux_recus.csv étaient créés
+    sans en-tête : la première ligne est alors une vraie donnée.
+    """
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        for i, row in enumerate(reader):
+            if not row or (i == 0 and row[0] == first_column):
+                continue
+            yield row
+
+
+def import_csv_history(database: Path, results_file: Path, distributions_file: Path,
+                       cadeaux_file: Path) -> Optional[dict]:
+    """Crée la base SQLite à partir des fichiers CSV existants, si elle n'existe pas encore.
+
+    Une installation en CSV passe ainsi au stockage SQLite sans perdre son
+    historique. La base est construite à côté puis renommée : un import
+    interrompu est repris au démarrage suivant. Retourne les nombres
+    importés, ou None si la base existe déjà ou s'il n'y a aucun CSV.
+    """
+    database = Path(database)
+    sources = (results_file, distributions_file, cadeaux_file)
+    if database.exists() or not any(Path(path).exists() for path in sources):
+        return None
+    tmp_database = database.with_name(database.name + '.import')
+    for leftover in (tmp_database, tmp_database.with_name(tmp_database.name + '-wal'),
+                     tmp_database.with_name(tmp_database.name + '-shm')):
+        leftover.unlink(missing_ok=True)
+    store = SqliteResultsStore(tmp_database)
+    try:
+        counts = store.import_csv(*sources)
+    finally:
+        store.close()
+    os.replace(tmp_database, database)
+    return counts
+
+
+def create_store(kind: str, results_file: Path, distributions_file: Path,
+                 cadeaux_file: Path, database: Path = None, worker: Optional[int] = None) -> ResultsStore:
+    """Construit le stockage demandé ('csv' ou 'sqlite').
+
+    `worker` identifie le processus courant quand plusieurs processus
+    partagent le stockage, ce que seul SQLite permet.
+    """
+    if kind == 'csv':
+        if worker is not None:
+            raise ValueError("Le stockage CSV ne peut pas être partagé entre plusieurs processus")
+        return CsvResultsStore(results_file, distributions_file, cadeaux_file)
+    if kind == 'sqlite':
+        return SqliteResultsStore(database or Path(results_file).with_suffix('.db'), worker=worker)
+    raise ValueError(f"Type de stockage inconnu: {kind}")
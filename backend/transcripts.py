@@ -0,0 +1,184 @@
+"""Journal des conversations des parties, pour l'analyse et le rejeu.
+
+Chaque partie produit des enregistrements JSON, une ligne chacun :
+- `start` : mot caché, modèle, processus ;
+- `turn` : question, réponse, provenance (modèle, cache, victoire), temps
+  d'attente et de génération, tokens comptés par Ollama ;
+- `end` : résultat et durée de la partie.
+
+Ils sont liés par l'identifiant de la partie dans le stockage des résultats
+(`game`). Le pseudo et le téléphone ne sont pas enregistrés.
+
+Les lignes sont ajoutées à des segments NDJSON compressés (gzip), jamais
+réécrits, changés au-delà d'une taille ou d'une durée. L'écriture se fait
+dans un thread dédié : un handler ne fait que mettre l'enregistrement en
+file. Un segment interrompu par un arrêt brutal reste lisible jusqu'au
+dernier lot écrit (voir `read_records`).
+"""
+import asyncio
+import gzip
+import json
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_BYTES = 64 * 1024 * 1024  # données non compressées par segment
+SEGMENT_SECONDS = 3600  # durée maximale d'un segment
+MAX_PENDING = 10000  # enregistrements en attente d'écriture ; au-delà ils sont perdus
+SEGMENT_PATTERN = 'transcripts-*.ndjson.gz'
+
+
+class TranscriptLog:
+    """Écrit les enregistrements de conversation dans des segments gzip successifs.
+
+    Avec `worker`, le numéro du processus figure dans le nom des segments :
+    chaque processus écrit les siens.
+    """
+
+    def __init__(self, directory: Path, worker: Optional[int] = None, segment_bytes: int = SEGMENT_BYTES,
+                 segment_seconds: float = SEGMENT_SECONDS, max_pending: int = MAX_PENDING):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.worker = worker
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+        self._queue = asyncio.Queue()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='transcripts-writer')
+        self._task = None
+        self._file = None
+        self._segment_size = 0
+        self._segment_opened = 0.0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Écrit les enregistrements en attente puis ferme le segment courant."""
+        if self._task:
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.get_running_loop().run_in_executor(self._writer, self._close_segment)
+        self._writer.shutdown(wait=True)
+
+    def record(self, record: dict) -> None:
+        """Met un enregistrement en file, sans jamais attendre le disque."""
+        if self._queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return
+        self._queue.put_nowait(record)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await loop.run_in_executor(self._writer, self._write, batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.error(f"Erreur lors de l'écriture du journal des conversations: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _segment_path(self) -> Path:
+        # Horodatage à la microseconde : l'ordre des noms est celui des segments
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        suffix = f'-w{self.worker}' if self.worker is not None else ''
+        return self.directory / f'transcripts-{stamp}{suffix}.ndjson.gz'
+
+    def _write(self, batch: List[dict]) -> None:
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in batch).encode('utf-8')
+        if self._file is not None and (self._segment_size >= self.segment_bytes
+                                       or time.monotonic() - self._segment_opened >= self.segment_seconds):
+            self._close_segment()
+        if self._file is None:
+            self._file = gzip.open(self._segment_path(), 'xb')
+            self._segment_size = 0
+            self._segment_opened = time.monotonic()
+            self.segments += 1
+        self._file.write(data)
+        # Lot lisible sur disque même si le processus s'arrête avant la fin du segment
+        self._file.flush(zlib.Z_SYNC_FLUSH)
+        self._segment_size += len(data)
+        self.written += len(batch)
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def to_dict(self) -> dict:
+        return {'written': self.written, 'pending': self.pending, 'dropped': self.dropped,
+                'segments': self.segments}
+
+
+def segment_paths(paths: Iterable) -> List[Path]:
+    """Segments désignés par des fichiers ou des répertoires, dans l'ordre chronologique."""
+    segments = []
+    for path in map(Path, paths):
+        segments.extend(sorted(path.glob(SEGMENT_PATTERN)) if path.is_dir() else [path])
+    return segments
+
+
+def read_records(path: Path) -> Iterator[dict]:
+    """Enregistrements d'un segment, y compris d'un segment interrompu.
+
+    Un segment en cours d'écriture, ou laissé par un arrêt brutal, n'a pas
+    de fin gzip : la lecture s'arrête au dernier lot complet.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.endswith('\n'):
+                    yield json.loads(line)
+        except EOFError:
+            return
+
+
+def load_games(paths: Iterable) -> List[dict]:
+    """Regroupe les enregistrements par partie, dans l'ordre de début.
+
+    Chaque partie : `{'game', 'word', 'started', 'turns': [...], 'resultat'}`.
+    Avec plusieurs processus, les tours d'une partie peuvent figurer dans
+    les segments de processus différents. Les parties dont le début n'est
+    pas enregistré (segment supprimé) sont ignorées.
+    """
+    games: "OrderedDict[str, dict]" = OrderedDict()
+    turns = {}
+    results = {}
+    for path in segment_paths(paths):
+        for record in read_records(path):
+            key = str(record.get('game'))
+            if record['type'] == 'start':
+                games[key] = {'game': record['game'], 'word': record['word'], 'started': record['time'],
+                              'turns': [], 'resultat': None}
+            elif record['type'] == 'turn':
+                turns.setdefault(key, []).append(record)
+            elif record['type'] == 'end':
+                results[key] = record['resultat']
+    ordered = sorted(games.items(), key=lambda item: item[1]['started'])
+    for key, game in ordered:
+        game['turns'] = sorted(turns.get(key, []), key=lambda turn: turn['turn'])
+        game['resultat'] = results.get(key)
+    return [game for _, game in ordered]
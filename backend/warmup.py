@@ -0,0 +1,96 @@
+"""Préparation du modèle en arrière-plan : vérification, téléchargement, préchauffage."""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# États successifs exposés par GET /ready
+CHECKING = 'checking'
+PULLING = 'pulling'
+WARMING = 'warming'
+READY = 'ready'
+ERROR = 'error'
+
+RETRY_DELAY = 10  # secondes entre deux tentatives après une erreur
+
+
+class ModelWarmup:
+    """Rend le modèle disponible sans bloquer le démarrage du serveur.
+
+    Le modèle est recherché parmi ceux présents sur le serveur Ollama et
+    téléchargé s'il manque (sauf avec `skip_pull`). Une génération vide le
+    charge ensuite en mémoire avec le `keep_alive` configuré, pour que le
+    premier joueur ne paie pas le temps de chargement.
+    """
+
+    def __init__(self, client, model_name: str, options: dict, keep_alive, skip_pull: bool = False):
+        self.client = client
+        self.model_name = model_name
+        self.options = options
+        self.keep_alive = keep_alive
+        self.skip_pull = skip_pull
+        self.state = CHECKING
+        self.error = None
+        self.ready_after = None
+        self._started_at = time.monotonic()
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _model_available(self) -> bool:
+        response = await self.client.list()
+        names = {model.model for model in response.models}
+        # "llama3.2" désigne implicitement "llama3.2:latest"
+        wanted = self.model_name if ':' in self.model_name else f"{self.model_name}:latest"
+        return wanted in names
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if not self.skip_pull:
+                    self.state = CHECKING
+                    if not await self._model_available():
+                        self.state = PULLING
+                        logger.info(f"Téléchargement du modèle {self.model_name}...")
+                        await self.client.pull(self.model_name)
+                        logger.info(f"Modèle {self.model_name} téléchargé avec succès")
+
+                self.state = WARMING
+                logger.info(f"Préchauffage du modèle {self.model_name}...")
+                # Un prompt vide charge le modèle sans rien générer
+                await self.client.generate(model=self.model_name, prompt='',
+                                           options=self.options, keep_alive=self.keep_alive)
+                self.state = READY
+                self.error = None
+                self.ready_after = round(time.monotonic() - self._started_at, 2)
+                logger.info(f"Modèle {self.model_name} prêt en {self.ready_after}s")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.state = ERROR
+                self.error = str(e)
+                logger.error(f"Préparation du modèle impossible, nouvelle tentative dans {RETRY_DELAY}s: {e}")
+                await asyncio.sleep(RETRY_DELAY)
+
+    def to_dict(self) -> dict:
+        return {
+            'status': self.state,
+            'model': self.model_name,
+            'error': self.error,
+            'ready_after_seconds': self.ready_after,
+        }
@@ -0,0 +1,162 @@
+"""Liste de mots chargée une seule fois et sélection sans accès disque."""
+import asyncio
+import bisect
+import logging
+import os
+import random
+from array import array
+from pathlib import Path
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# Politiques de sélection disponibles via --word-policy
+POLICIES = ('random', 'no_repeat', 'weighted')
+
+
+class WordPool:
+    """Mots à deviner, stockés de façon compacte et rechargés si le fichier change.
+
+    Format du fichier : un mot par ligne, éventuellement suivi d'un niveau de
+    difficulté entier (`mot;3`, 1 = facile par défaut). Les lignes vides et
+    celles commençant par `#` sont ignorées.
+
+    Les mots sont concaténés dans un unique bloc UTF-8 indexé par un tableau
+    d'offsets : une liste de 100 000 mots occupe environ 1 Mo au lieu
+    d'autant d'objets `str`.
+
+    Politiques :
+    - `random` : tirage uniforme ;
+    - `no_repeat` : aucun mot ne revient avant que tous aient été tirés ;
+    - `weighted` : les mots faciles sortent plus souvent (poids 1/difficulté).
+    """
+
+    def __init__(self, words_file: str, policy: str = 'random', check_interval: float = 5.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Politique de sélection inconnue: {policy}")
+        self.words_file = Path(words_file)
+        self.policy = policy
+        self.check_interval = check_interval
+        self._mtime = None
+        self._failed_mtime = None
+        self._blob = b''
+        self._offsets = array('I', [0])
+        self._cumulative = array('d')
+        self._bag = array('I')
+        self._bag_pos = 0
+        self._watcher = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self._blob[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def load(self) -> None:
+        """Charge le fichier de mots (au démarrage, avant la boucle d'événements)."""
+        self._install(_parse(self.words_file))
+
+    def _install(self, parsed: tuple) -> None:
+        """Met en service une liste lue par `_parse`, d'un seul coup."""
+        mtime, blob, offsets, cumulative = parsed
+        bag = array('I', range(len(offsets) - 1))
+        random.shuffle(bag)
+        self._blob, self._offsets, self._cumulative, self._bag, self._bag_pos, self._mtime = (
+            blob, offsets, cumulative, bag, 0, mtime)
+        logger.info(f"{len(self)} mots chargés depuis {self.words_file}")
+
+    def start(self) -> None:
+        """Surveille le fichier en arrière-plan pour recharger la liste quand il change."""
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watcher:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.reload_if_changed()
+
+    async def reload_if_changed(self) -> None:
+        """Recharge le fichier si sa date de modification a changé.
+
+        La date est consultée et le fichier lu hors de la boucle d'événements ;
+        la nouvelle liste remplace l'ancienne d'un seul coup. En cas d'erreur,
+        la liste précédente reste en service.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            mtime = (await loop.run_in_executor(None, os.stat, self.words_file)).st_mtime_ns
+            if mtime in (self._mtime, self._failed_mtime):
+                return
+            self._install(await loop.run_in_executor(None, _parse, self.words_file))
+        except (OSError, ValueError) as e:
+            if isinstance(e, ValueError):
+                # Version invalide du fichier : nouvel essai seulement à la prochaine modification
+                self._failed_mtime = mtime
+            logger.error(f"Rechargement du fichier de mots impossible, liste précédente conservée: {e}")
+
+    def choose(self) -> str:
+        """Sélectionne un mot selon la politique configurée."""
+        if self.policy == 'no_repeat':
+            if self._bag_pos >= len(self._bag):
+                random.shuffle(self._bag)
+                self._bag_pos = 0
+            index = self._bag[self._bag_pos]
+            self._bag_pos += 1
+        elif self.policy == 'weighted':
+            target = random.random() * self._cumulative[-1]
+            index = min(bisect.bisect_right(self._cumulative, target), len(self) - 1)
+        else:
+            index = random.randrange(len(self))
+        return self[index]
+
+
+def _parse(words_file: Path) -> tuple:
+    """Lit le fichier de mots : (date de modification, bloc, offsets, poids cumulés).
+
+    Une difficulté illisible est signalée et la ligne ignorée.
+    """
+    if not words_file.exists():
+        raise FileNotFoundError(f"Le fichier {words_file} n'existe pas")
+
+    mtime = os.stat(words_file).st_mtime_ns
+    chunks = []
+    offsets = array('I', [0])
+    cumulative = array('d')
+    total_weight = 0.0
+    seen = set()
+    with open(words_file, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            word, _, difficulty = line.partition(';')
+            word = word.strip().lower()
+            if not word or word in seen:
+                continue
+            try:
+                weight = 1.0 / max(1, int(difficulty or 1))
+            except ValueError:
+                logger.warning(f"{words_file}:{line_number}: difficulté invalide '{difficulty}', ligne ignorée")
+                continue
+            seen.add(word)
+            encoded = word.encode('utf-8')
+            chunks.append(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+            total_weight += weight
+            cumulative.append(total_weight)
+
+    if not chunks:
+        raise ValueError("Le fichier de mots est vide")
+    return mtime, b''.join(chunks), offsets, cumulative